@@ -8,6 +8,7 @@ gi.require_version("GLib", "2.0")
 from fabric.utils import get_relative_path, monitor_file
 from fabric import Application
 from services.config import config
+from services.hub import hub  # Exposed to fabric-cli, e.g. 'hub.log_stats()'
 
 if __name__ == "__main__":
     setproctitle.setproctitle(config['APP_NAME'])
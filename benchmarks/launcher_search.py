@@ -0,0 +1,99 @@
+"""
+Measures the per-keystroke latency of the launcher search over a synthetic set
+of 5,000 apps, typing queries one character at a time, for the AppRanker the
+launcher uses (incremental subsequence filter, fuzzy scoring with frecency, best
+results selected with a heap) and for the former approach (build every haystack,
+filter, then sort the matches).
+
+The launcher module is imported, so fabric and GTK are required.
+
+Usage: python -m benchmarks.launcher_search
+"""
+import os
+import random
+import string
+import tempfile
+import time
+
+from modules.launcher import AppRanker, FrecencyStore
+from services.app_index import IndexedApp
+
+APP_COUNT = 5000
+QUERIES = ("firefox", "terminal", "code", "settings", "xyz")
+
+
+def make_apps(count: int) -> list[IndexedApp]:
+    words = [
+        "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9)))
+        for _ in range(600)
+    ] + [query for query in QUERIES if query != "xyz"]
+    apps = []
+    for i in range(count):
+        name = " ".join(random.choices(words, k=random.randint(1, 3))).title()
+        apps.append(
+            IndexedApp(
+                id=f"app{i}.desktop",
+                path=f"/usr/share/applications/app{i}.desktop",
+                name=name,
+                display_name=name,
+                generic_name=random.choice(words).title(),
+                description=None,
+                window_class=None,
+                executable=None,
+                command_line=None,
+                icon_name=None,
+                hidden=False,
+            ))
+    return sorted(apps, key=lambda app: app.sort_key)
+
+
+def previous_filter(apps: list[IndexedApp], query: str) -> list[IndexedApp]:
+    """What every keystroke used to do"""
+    return sorted(
+        [
+            app for app in apps if query.casefold() in
+            ((app.display_name or "") + (" " + app.name + " ") +
+             (app.generic_name or "")).casefold()
+        ],
+        key=lambda app: (app.display_name or "").casefold(),
+    )
+
+
+def make_frecency(directory: str, apps: list[IndexedApp]) -> FrecencyStore:
+    """Launch history where a few apps were launched a few times"""
+    frecency = FrecencyStore(os.path.join(directory, "frecency.json"))
+    for app in random.sample(apps, 50):
+        for _ in range(random.randint(1, 5)):
+            frecency.record(app.id)
+    return frecency
+
+
+def bench(apps: list[IndexedApp], frecency: FrecencyStore,
+          ranked: bool) -> tuple[float, float]:
+    """Return the mean and worst keystroke latency"""
+    latencies = []
+    for query in QUERIES:
+        ranker = AppRanker(apps, frecency)
+        for end in range(len(query) + 1):
+            start = time.perf_counter()
+            if ranked:
+                ranker.rank(query[:end])
+            else:
+                previous_filter(apps, query[:end])
+            latencies.append(time.perf_counter() - start)
+    return sum(latencies) / len(latencies), max(latencies)
+
+
+def main() -> None:
+    apps = make_apps(APP_COUNT)
+    print(f"{APP_COUNT} apps, {len(QUERIES)} queries typed one character at a time")
+    print(f"{'strategy':>12} {'mean (ms)':>10} {'worst (ms)':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        frecency = make_frecency(directory, apps)
+        for name, ranked in (("ranker", True), ("previous", False)):
+            mean, worst = bench(apps, frecency, ranked)
+            print(f"{name:>12} {mean * 1e3:>10.2f} {worst * 1e3:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Measures the cost of adding and deleting a notification history entry at several
+history sizes, for the incremental HistoryIndex and for the former full rebuild
+(sort every entry and recreate every date separator).
+
+Usage: python -m benchmarks.notification_history
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from services.notification_index import HistoryIndex
+
+SIZES = (50, 500, 5000)
+OPERATIONS = 200
+
+
+def make_arrivals(count: int) -> list[datetime]:
+    now = datetime.now()
+    return [
+        now - timedelta(seconds=random.randint(0, 60 * 60 * 24 * 30))
+        for _ in range(count)
+    ]
+
+
+def full_rebuild(arrivals: list[datetime]) -> list:
+    """What every add/delete used to do: sort everything and regroup by day"""
+    rows = []
+    current_day = None
+    for arrival in sorted(arrivals, reverse=True):
+        if arrival.date() != current_day:
+            current_day = arrival.date()
+            rows.append(("separator", current_day))
+        rows.append(("row", arrival))
+    return rows
+
+
+def bench_incremental(size: int) -> tuple[float, float]:
+    index = HistoryIndex()
+    items = list(enumerate(make_arrivals(size)))
+    for item, arrival in items:
+        index.insert(item, arrival)
+
+    new_items = [(size + i, arrival)
+                 for i, arrival in enumerate(make_arrivals(OPERATIONS))]
+    start = time.perf_counter()
+    for item, arrival in new_items:
+        index.insert(item, arrival)
+    add = (time.perf_counter() - start) / OPERATIONS
+
+    start = time.perf_counter()
+    for item, _ in new_items:
+        index.remove(item)
+    delete = (time.perf_counter() - start) / OPERATIONS
+    return add, delete
+
+
+def bench_full_rebuild(size: int) -> tuple[float, float]:
+    arrivals = make_arrivals(size)
+    new_arrivals = make_arrivals(OPERATIONS)
+    start = time.perf_counter()
+    for arrival in new_arrivals:
+        arrivals.append(arrival)
+        full_rebuild(arrivals)
+    add = (time.perf_counter() - start) / OPERATIONS
+
+    start = time.perf_counter()
+    for arrival in new_arrivals:
+        arrivals.remove(arrival)
+        full_rebuild(arrivals)
+    delete = (time.perf_counter() - start) / OPERATIONS
+    return add, delete
+
+
+def main() -> None:
+    print(f"{'entries':>8} {'strategy':>12} {'add (us)':>10} {'delete (us)':>12}")
+    for size in SIZES:
+        for name, bench in (("incremental", bench_incremental),
+                            ("full rebuild", bench_full_rebuild)):
+            add, delete = bench(size)
+            print(f"{size:>8} {name:>12} {add * 1e6:>10.1f} {delete * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Measures the latency of adding and deleting a notification in a large history,
+from the call until the list shows the change: SQLite write, index update and
+row binding in the virtual list, in an offscreen window.
+
+Usage: python -m benchmarks.notification_history_render [history size...]
+"""
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk  # type: ignore
+
+import modules.notification as notification
+from services.notification_store import NotificationStore
+
+SIZES = (1000, 10000, 20000)
+OPERATIONS = 100
+WINDOW_WIDTH = 400
+WINDOW_HEIGHT = 800
+
+
+def make_note(arrival: datetime) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "app_icon": None,
+        "summary": "Build finished",
+        "body": "All the checks passed" if random.random() < 0.5 else "",
+        "app_name": random.choice(("Firefox", "Slack", "Thunderbird")),
+        "timestamp": arrival.isoformat(),
+        "cached_image_path": None,
+    }
+
+
+def pump() -> None:
+    """Run the main loop until everything pending, including drawing, is done"""
+    while Gtk.events_pending():
+        Gtk.main_iteration_do(False)
+
+
+def build_history(directory: str, size: int):
+    database = f"{directory}/history-{size}.sqlite3"
+    store = NotificationStore(database, retention=size + OPERATIONS)
+    now = datetime.now()
+    for _ in range(size):
+        store.add(
+            make_note(now - timedelta(
+                seconds=random.randint(0, 60 * 60 * 24 * 90))))
+
+    # The page reads its database from the module, pointed at the one just filled
+    notification.HISTORY_DATABASE = database
+    notification.PERSISTENT_HISTORY_FILE = f"{directory}/missing.json"
+    history = notification.NotificationHistory(notification_server=None,
+                                               on_event=lambda *_: None)
+    history.store.retention = size + OPERATIONS
+    window = Gtk.OffscreenWindow()
+    window.set_default_size(WINDOW_WIDTH, WINDOW_HEIGHT)
+    window.add(history)
+    window.show_all()
+    pump()
+    return history, window
+
+
+def notification_box(note: dict) -> SimpleNamespace:
+    """The fields add_notification reads from a popup"""
+    return SimpleNamespace(
+        uuid=note["id"],
+        cached_image_path=None,
+        image_pending=False,
+        notification=SimpleNamespace(id=random.randint(1, 1 << 30),
+                                     app_icon=None,
+                                     summary=note["summary"],
+                                     body=note["body"],
+                                     app_name=note["app_name"]),
+    )
+
+
+def bench(directory: str, size: int) -> tuple[list[float], list[float]]:
+    history, window = build_history(directory, size)
+    added, deleted = [], []
+    notes = [make_note(datetime.now()) for _ in range(OPERATIONS)]
+    for note in notes:
+        start = time.perf_counter()
+        history.add_notification(notification_box(note))
+        pump()
+        added.append(time.perf_counter() - start)
+    for note in reversed(notes):
+        start = time.perf_counter()
+        history.delete_historical_notification(note["id"])
+        pump()
+        deleted.append(time.perf_counter() - start)
+    window.destroy()
+    return added, deleted
+
+
+def describe(durations: list[float]) -> str:
+    p95 = statistics.quantiles(durations, n=20)[-1]
+    return f"{statistics.mean(durations) * 1e3:>9.2f} {p95 * 1e3:>9.2f}"
+
+
+def main() -> None:
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    print(f"{'entries':>8} {'add mean':>9} {'add p95':>9} "
+          f"{'del mean':>9} {'del p95':>9}  (ms)")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            added, deleted = bench(directory, size)
+            print(f"{size:>8} {describe(added)} {describe(deleted)}")
+
+
+if __name__ == "__main__":
+    main()
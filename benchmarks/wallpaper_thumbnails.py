@@ -0,0 +1,125 @@
+"""
+Measures how long the wallpaper picker takes to show the previews of a folder of
+large images, for the former loader (one thread, full decode of every image in
+directory order) and for the ThumbnailLoader (worker pool, tiles in the viewport
+first), with an empty then a warm thumbnail cache.
+
+The viewport is assumed scrolled to the middle of the grid, "visible" is the time
+until its tiles are all loaded.
+
+Usage: python -m benchmarks.wallpaper_thumbnails [image count]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from gi.repository import GdkPixbuf, GLib  # type: ignore
+
+from services.thumbnail_loader import ThumbnailLoader
+from services.thumbnails import ThumbnailCache, scale_to_fit
+
+IMAGE_COUNT = 48
+IMAGE_WIDTH = 3840
+IMAGE_HEIGHT = 2160
+PREVIEW_WIDTH = 240
+PREVIEW_HEIGHT = 135
+COLUMNS = 2
+VISIBLE_ROWS = 3
+
+
+def make_images(directory: str, count: int) -> list[str]:
+    paths = []
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:IMAGE_HEIGHT, 0:IMAGE_WIDTH]
+    gradient = np.stack([x % 256, y % 256, (x + y) % 256],
+                        axis=-1).astype(np.uint8)
+    del x, y
+    for i in range(count):
+        # Gradients with noise, so the JPEGs are of a realistic size
+        pixels = gradient + np.uint8(i * 37 % 256) + rng.integers(
+            0, 32, gradient.shape, dtype=np.uint8)
+        pixbuf = GdkPixbuf.Pixbuf.new_from_bytes(
+            GLib.Bytes.new(pixels.tobytes()), GdkPixbuf.Colorspace.RGB,
+            False, 8, IMAGE_WIDTH, IMAGE_HEIGHT, IMAGE_WIDTH * 3)
+        path = os.path.join(directory, f"wallpaper-{i:03}.jpg")
+        pixbuf.savev(path, "jpeg", ["quality"], ["90"])
+        paths.append(path)
+    return paths
+
+
+def visible_paths(paths: list[str]) -> set[str]:
+    first_row = len(paths) // COLUMNS // 2
+    return set(paths[first_row * COLUMNS:(first_row + VISIBLE_ROWS) *
+                     COLUMNS])
+
+
+def bench_previous(paths: list[str]) -> tuple[float, float]:
+    """What the wallpaper picker used to do"""
+    visible = visible_paths(paths)
+    start = time.perf_counter()
+    visible_at = None
+    for path in paths:
+        GdkPixbuf.Pixbuf.new_from_file_at_scale(path, PREVIEW_WIDTH,
+                                                PREVIEW_HEIGHT, True)
+        visible.discard(path)
+        if not visible and visible_at is None:
+            visible_at = time.perf_counter() - start
+    return visible_at or 0, time.perf_counter() - start
+
+
+def bench_loader(paths: list[str],
+                 thumbnails: ThumbnailCache) -> tuple[float, float]:
+    visible = visible_paths(paths)
+    remaining = set(paths)
+    loop = GLib.MainLoop()
+    times = {}
+    start = time.perf_counter()
+
+    def load(path: str):
+        thumbnail = thumbnails.get(path)
+        return scale_to_fit(thumbnail, PREVIEW_WIDTH,
+                            PREVIEW_HEIGHT) if thumbnail else None
+
+    def on_loaded(previews) -> None:
+        for path, _ in previews:
+            visible.discard(path)
+            remaining.discard(path)
+        if not visible and "visible" not in times:
+            times["visible"] = time.perf_counter() - start
+        if not remaining:
+            times["all"] = time.perf_counter() - start
+            loop.quit()
+
+    loader = ThumbnailLoader(load, on_loaded)
+    first_row = len(paths) // COLUMNS // 2
+    for position, path in enumerate(paths):
+        # Distance to the viewport, in rows
+        row = position // COLUMNS
+        loader.request(
+            path, max(first_row - row, row - (first_row + VISIBLE_ROWS - 1),
+                      0))
+    loop.run()
+    return times["visible"], times["all"]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else IMAGE_COUNT
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Generating {count} {IMAGE_WIDTH}x{IMAGE_HEIGHT} images...")
+        paths = make_images(directory, count)
+        thumbnails = ThumbnailCache(
+            directory=os.path.join(directory, "thumbnails"))
+        print(f"{'strategy':>14} {'visible (s)':>12} {'all (s)':>9}")
+        for name, bench in (
+            ("previous", lambda: bench_previous(paths)),
+            ("loader cold", lambda: bench_loader(paths, thumbnails)),
+            ("loader warm", lambda: bench_loader(paths, thumbnails)),
+        ):
+            visible, total = bench()
+            print(f"{name:>14} {visible:>12.2f} {total:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import subprocess
 import sys
 from services.config import config
+from services.palettes import TEMPLATES, WALLPAPER_COMMAND
 import os
 from fabric.utils.helpers import exec_shell_command_async
 import toml
@@ -15,8 +16,8 @@ class MissingRequiredCommandException(Exception):
 
 commands_needed = [
     "hyprsunset", "fabric-cli", "matugen", "brightnessctl", "notify-send",
-    "tuned-adm", "hyprctl", "systemctl", "hyprshot", "pkill", "pgrep", "pactl",
-    "nmcli", "cliphist", "wl-copy", "tailscale", "whoami", "hostname"
+    "hyprctl", "systemctl", "hyprshot", "pkill", "pgrep", "pactl",
+    "nmcli", "cliphist", "wl-copy", "wl-paste", "tailscale", "whoami", "hostname"
 ]
 
 
@@ -52,22 +53,12 @@ def ensure_matugen_config() -> None:
     expected_config = {
         "config": {
             "reload_apps": True,
+            # The shell sets the wallpaper itself before theming, so a fallback
+            # to matugen doesn't play the transition a second time
             "wallpaper": {
-                "command": "swww",
-                "arguments": [
-                    "img",
-                    "--transition-type",
-                    "grow",
-                    "--transition-pos",
-                    "0.854,0.033",
-                    "--transition-step",
-                    "90",
-                    "--transition-fps",
-                    "60",
-                    "-f",
-                    "Nearest",
-                ],
-                "set": True,
+                "command": WALLPAPER_COMMAND[0],
+                "arguments": WALLPAPER_COMMAND[1:],
+                "set": False,
             },
             "custom_colors": {
                 "red": {
@@ -101,33 +92,15 @@ def ensure_matugen_config() -> None:
             },
         },
         "templates": {
-            "hyprland": {
-                "input_path":
-                    os.path.join(
-                        app_location,
-                        "config/matugen/templates/hyprland-colors.conf"),
-                "output_path":
-                    os.path.join(app_location, "config/hypr/colors.conf"),
-            },
-            f"{config['APP_NAME']}": {
-                "input_path":
-                    os.path.join(
-                        app_location,
-                        f"config/matugen/templates/{config['APP_NAME']}.css"),
-                "output_path":
-                    os.path.join(app_location, "styles/colors.mcss"),
-                "post_hook":
-                    f"fabric-cli exec {config['APP_NAME']} 'app.apply_stylesheet()' &",
-            },
-            "kitty": {
-                "input_path":
-                    os.path.join(app_location,
-                                 "config/matugen/templates/kitty.conf"),
-                "output_path":
-                    "~/.config/kitty/colors.conf",
-            },
+            name: {
+                "input_path": input_path,
+                "output_path": output_path,
+            } for name, (input_path, output_path) in TEMPLATES.items()
         },
     }
+    # Matugen reloads the shell itself, the palette cache relies on the styles monitor
+    expected_config["templates"][config['APP_NAME']]["post_hook"] = (
+        f"fabric-cli exec {config['APP_NAME']} 'app.apply_stylesheet()' &")
 
     config_path = os.path.expanduser("~/.config/matugen/config.toml")
     os.makedirs(os.path.dirname(config_path), exist_ok=True)
@@ -182,6 +155,7 @@ def ensure_matugen_config() -> None:
         if image_path and os.path.exists(image_path):
             print(f"Generating color theme from wallpaper: {image_path}")
             try:
+                exec_shell_command_async([*WALLPAPER_COMMAND, image_path])
                 matugen_cmd = f"matugen image '{image_path}'"
                 exec_shell_command_async(matugen_cmd)
                 print("Matugen color theme generation initiated.")
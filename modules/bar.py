@@ -7,7 +7,6 @@ from fabric.widgets.wayland import WaylandWindow
 from modules.language import Language
 from modules.metrics import Metrics
 from modules.power import PowerButton
-from modules.tailscale import Tailscale
 from modules.time import Time
 from modules.tray import SystemTray
 from modules.weather import WeatherButton
@@ -42,7 +41,6 @@ class Bar(WaylandWindow):
         self.metrics = Metrics()
         self.time = Time()
         self.system_tray = SystemTray()
-        self.tailscale = Tailscale()
         self.weather_button = (WeatherButton() if not os.environ.get("DEV_MODE")
                                else Box(visible=False))
         self.power_button = PowerButton()
@@ -71,7 +69,7 @@ class Bar(WaylandWindow):
         if config['BAR']['MODULES']['TRAY']:
             self.end_box.add(self.system_tray)
         # if config['BAR']['MODULES']['TAILSCALE']:
-        #     self.end_box.add(self.tailscale)
+        #     self.end_box.add(Tailscale())
         if config['BAR']['MODULES']['KEYBOARD_LAYOUT']:
             self.end_box.add(self.language)
         if config['BAR']['MODULES']['TIME']:
@@ -1,4 +1,3 @@
-from fabric.core.fabricator import Fabricator
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.circularprogressbar import CircularProgressBar
@@ -7,7 +6,7 @@ from fabric.widgets.revealer import Revealer
 from gi.repository import GLib  # type: ignore
 
 import modules.icons as icons
-from services.metrics import shared_provider
+from services.hub import hub
 
 
 class Battery(Button):
@@ -58,15 +57,15 @@ class Battery(Button):
         self.connect("enter-notify-event", self.on_mouse_enter)
         self.connect("leave-notify-event", self.on_mouse_leave)
 
-        self.batt_fabricator = Fabricator(
-            poll_from=lambda v: shared_provider.get_battery(),
-            on_changed=lambda f, v: self.update_battery,
-            interval=1000,
-            stream=False,
-            default_value=0,
+        self.provider = hub.get("metrics")
+        hub.subscribe(
+            "metrics",
+            "changed",
+            lambda provider: self.update_battery(provider,
+                                                 provider.get_battery()),
+            owner=self,
         )
-        self.batt_fabricator.connect("changed", self.update_battery)
-        GLib.idle_add(self.update_battery, None, shared_provider.get_battery())
+        GLib.idle_add(self.update_battery, None, self.provider.get_battery())
 
         self.hide_timer = None
         self.hover_counter = 0
@@ -1,13 +1,18 @@
-import subprocess
-
 from fabric.utils import exec_shell_command_async
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
+from fabric.widgets.image import Image
 from fabric.widgets.label import Label
 from fabric.widgets.scrolledwindow import ScrolledWindow
-from gi.repository import Gdk  # type: ignore
+from gi.repository import Gdk, GdkPixbuf  # type: ignore
 
+from services.clipboard import clipboard_thumbnails, is_image
+from services.hub import hub
 from services.interfaces import NotchWidgetInterface
+from services.pixbuf_cache import PixbufCache
+from services.thumbnail_loader import ThumbnailLoader
+
+THUMBNAIL_CACHE_SIZE = 8 * 1024 * 1024  # in bytes
 
 
 class ClipboardManager(Box, NotchWidgetInterface):
@@ -26,6 +31,12 @@ class ClipboardManager(Box, NotchWidgetInterface):
         )
         self.max_items_to_show = 50
         self.notch_inner = notch_inner
+        # Thumbnails of the image entries, decoded on worker threads
+        self.thumbnail_cache = PixbufCache(THUMBNAIL_CACHE_SIZE)
+        self.thumbnail_loader = ThumbnailLoader(clipboard_thumbnails.load,
+                                                self._on_thumbnails_loaded,
+                                                workers=2)
+        self._thumbnail_images: dict[str, Image] = {}
 
         # Create a grid that will adapt to its contents
         self.clipboard_items = Box(
@@ -52,11 +63,18 @@ class ClipboardManager(Box, NotchWidgetInterface):
         )
 
         self.add(self.scrollable_area)
+        self.history = hub.get("clipboard")
+        hub.subscribe("clipboard",
+                      "changed",
+                      self._on_history_changed,
+                      owner=self)
         self._build_list()
         self.connect("key-press-event", self.on_key_press)
 
     def on_show(self) -> None:
         """On widget show, rebuild the list of clipboard items."""
+        # Picks up the entries deleted or added by other cliphist clients
+        self.history.refresh()
         self._build_list()
 
     def on_key_press(self, widget, event: Gdk.EventKey) -> bool:
@@ -75,35 +93,27 @@ class ClipboardManager(Box, NotchWidgetInterface):
         for child in self.clipboard_items.get_children():
             self.clipboard_items.remove(child)
 
-    def _build_list(self, filter_text: str = "") -> None:
-        result = subprocess.run(["cliphist", "list"],
-                                capture_output=True,
-                                check=True)
-        # Decode stdout with error handling
-        stdout_str = result.stdout.decode("utf-8", errors="replace")
-        lines = stdout_str.strip().split("\n")
-        items = []
-        for line in lines:
-            if not line or "<meta http-equiv" in line:
-                continue
-            items.append(line)
-            if len(items) >= self.max_items_to_show:
-                break
-
-        filtered_items = []
-        for item in items:
-            content = item.split("\t", 1)[1] if "\t" in item else item
-            if filter_text.lower() in content.lower():
-                filtered_items.append(item)
+    def _on_history_changed(self, *_) -> None:
+        if self.get_mapped():
+            self._build_list()
 
+    def _build_list(self, filter_text: str = "") -> None:
+        """Render the most recent entries matching the filter, from memory"""
         self._clear_items()
-        for entry in filtered_items:
-            parts = entry.split("\t", 1)
-            item_id = parts[0] if len(parts) > 1 else "0"
-            content = parts[1] if len(parts) > 1 else entry
+        self._thumbnail_images = {}
+        for position, (item_id, content) in enumerate(
+                self.history.search(filter_text, self.max_items_to_show)):
+            label = Label(label=content, ellipsization="end", h_align="start")
+            child = label
+            if is_image(content):
+                child = Box(orientation="v",
+                            spacing=8,
+                            children=[
+                                self._thumbnail_image(str(item_id), position),
+                                label
+                            ])
             button = Button(
-                child=Label(label=content, ellipsization="end",
-                            h_align="start"),
+                child=child,
                 on_clicked=lambda btn, e=item_id: self._copy_entry(e),
                 style_classes=["clipboard-item-button"],
                 v_align="fill",
@@ -112,12 +122,38 @@ class ClipboardManager(Box, NotchWidgetInterface):
                 h_expand=True,
             )
             self.clipboard_items.add(button)
-
-    def _copy_entry(self, id: str) -> None:
-        result = subprocess.run(["cliphist", "decode", id],
-                                capture_output=True,
-                                check=True)
-        subprocess.run(["wl-copy"], input=result.stdout, check=True)
+        self.clipboard_items.show_all()
+        # Entries filtered out or gone are not decoded anymore
+        self.thumbnail_loader.retain(self._thumbnail_images)
+
+    def _thumbnail_image(self, item_id: str, position: int) -> Image:
+        image = Image(h_align="start")
+        pixbuf = self.thumbnail_cache.get(item_id)
+        if pixbuf is not None:
+            image.set_from_pixbuf(pixbuf)
+        else:
+            # Shown once the thumbnail is loaded
+            image.set_no_show_all(True)
+            self.thumbnail_loader.request(item_id, position)
+        self._thumbnail_images[item_id] = image
+        return image
+
+    def _on_thumbnails_loaded(
+            self, thumbnails: list[tuple[str, GdkPixbuf.Pixbuf | None]]) -> None:
+        for item_id, pixbuf in thumbnails:
+            if pixbuf is None:
+                continue
+            self.thumbnail_cache.put(item_id, pixbuf)
+            image = self._thumbnail_images.get(item_id)
+            if image is not None:
+                image.set_from_pixbuf(pixbuf)
+                image.show()
+
+    def _copy_entry(self, id: int) -> None:
+        self.history.copy(id, self._on_copied)
         self.notch_inner.show_widget(self.notch_inner.widgets_labels[0])
-        exec_shell_command_async(
-            "notify-send -e -t 2000 'Clipboard' 'Copied to clipboard!'")
+
+    def _on_copied(self, successful: bool) -> None:
+        if successful:
+            exec_shell_command_async(
+                "notify-send -e -t 2000 'Clipboard' 'Copied to clipboard!'")
@@ -1,25 +1,206 @@
+import bisect
+import heapq
 import json
 import math
 import os
 import re
 import subprocess
+import time
 from collections.abc import Iterator
 
-import numpy as np
-from fabric.utils import (DesktopApp, get_desktop_applications, idle_add,
-                          remove_handler)
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.entry import Entry
 from fabric.widgets.image import Image
 from fabric.widgets.label import Label
 from fabric.widgets.scrolledwindow import ScrolledWindow
-from gi.repository import Gdk, GLib  # type: ignore
+from gi.repository import Gdk, GLib, Gtk  # type: ignore
 
 import modules.icons as icons
+from services.app_index import AppFilter, IndexedApp
+from services.calculator import (PREVIEW_TIME_LIMIT, CalculatorError,
+                                 calculate, evaluate, format_result)
+from services.calculator_history import CalculatorHistory
 from services.config import config
+from services.fuzzy import fuzzy_score
+from services.hub import hub
 from services.interfaces import NotchWidgetInterface
 from services.logger import logger
+from services.search_providers import (PROVIDERS, ProviderSearch,
+                                       SearchResult)
+from services.search_scheduler import SearchScheduler
+
+# Number of ranked results shown for a query, the empty query lists every app
+MAX_RESULTS = 50
+# Number of calculator history entries shown
+MAX_CALC_ROWS = 30
+# Frecency points lose half their value every week
+FRECENCY_HALF_LIFE = 7 * 24 * 3600  # in seconds
+FRECENCY_WEIGHT = 4
+# Matches found only in the name or generic name rank below the display name ones
+SECONDARY_FIELD_PENALTY = 2
+
+
+def subsequence_matcher(query: str):
+    """Match the apps whose search key contains the characters of the query, in order"""
+    pattern = re.compile(".*?".join(map(re.escape, query)))
+    return lambda app: pattern.search(app.search_key) is not None
+
+
+class FrecencyStore:
+    """
+    Launch counts of the apps, decaying over time so recent launches weigh more
+    than old ones. Saved as JSON, with the time each score was last updated.
+    """
+
+    def __init__(self, path: str, half_life: float = FRECENCY_HALF_LIFE):
+        """
+        Parameters:
+          path (string): Where the scores are saved
+          half_life (float): Delay, in seconds, for a score to lose half its value
+        """
+        self.path = path
+        self.half_life = half_life
+        self._scores: dict[str, tuple[float, float]] = {}
+        try:
+            with open(path, "r") as f:
+                self._scores = {
+                    app_id: (entry["score"], entry["last"])
+                    for app_id, entry in json.load(f).items()
+                }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring the launcher frecency file: {e}")
+
+    def _decayed(self, app_id: str, now: float) -> float:
+        score, last = self._scores.get(app_id, (0, now))
+        return score * 0.5**((now - last) / self.half_life)
+
+    def value(self, app_id: str) -> float:
+        """Return the current score of an app"""
+        if app_id not in self._scores:
+            return 0
+        return self._decayed(app_id, time.time())
+
+    def record(self, app_id: str) -> None:
+        """Count a launch of an app"""
+        now = time.time()
+        self._scores[app_id] = (self._decayed(app_id, now) + 1, now)
+        self.save()
+
+    def save(self) -> None:
+        now = time.time()
+        # Forget the apps not launched for months
+        self._scores = {
+            app_id: entry
+            for app_id, entry in self._scores.items()
+            if self._decayed(app_id, now) >= 0.01
+        }
+        try:
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(
+                    {
+                        app_id: {
+                            "score": score,
+                            "last": last
+                        } for app_id, (score, last) in self._scores.items()
+                    }, f)
+            os.replace(temporary_path, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save the launcher frecency: {e}")
+
+
+class AppRanker:
+    """
+    Rank the apps matching a query by fuzzy score and frecency. The matches are
+    narrowed incrementally while typing, and only the best `limit` of them are
+    selected with a heap instead of sorting all of them.
+    """
+
+    def __init__(self,
+                 apps: list[IndexedApp],
+                 frecency: FrecencyStore,
+                 limit: int = MAX_RESULTS):
+        """
+        Parameters:
+          apps (list): The apps, sorted by display name
+          frecency (FrecencyStore): Launch history of the apps
+          limit (int): Number of apps returned for a query
+        """
+        self.apps = apps
+        self.frecency = frecency
+        self.limit = limit
+        self._filter = AppFilter(apps, matcher=subsequence_matcher)
+
+    def score(self, query: str, app: IndexedApp) -> float:
+        name_score = fuzzy_score(query, app.sort_key)
+        key_score = fuzzy_score(query, app.search_key)
+        scores = [score for score in (
+            name_score,
+            None if key_score is None else key_score - SECONDARY_FIELD_PENALTY,
+        ) if score is not None]
+        # The subsequence filter guarantees the search key matches
+        score = max(scores, default=0)
+        return score + FRECENCY_WEIGHT * math.log1p(
+            self.frecency.value(app.id))
+
+    def rank(self, query: str) -> list[tuple[float, IndexedApp]]:
+        """Return the apps matching the query with their score, best first"""
+        query = query.strip().casefold()
+        matches = self._filter.filter(query)
+        if not query:
+            return [(0, app) for app in matches]
+        # nlargest is stable, equal scores keep the shorter then alphabetical first
+        return heapq.nlargest(
+            self.limit,
+            ((self.score(query, app), app) for app in matches),
+            key=lambda scored: (scored[0], -len(scored[1].sort_key)),
+        )
+
+
+class ResultRow(Button):
+    """Result row of the launcher, rebound to another result instead of being rebuilt"""
+
+    def __init__(self, **kwargs):
+        self.result: SearchResult | None = None
+        self.icon = Image(name="app-icon", h_align="start")
+        self.name_label = Label(
+            name="app-label",
+            ellipsization="end",
+            v_align="center",
+            h_align="center",
+        )
+        self.description_label = Label(
+            name="app-desc",
+            ellipsization="end",
+            v_align="center",
+            h_align="start",
+            h_expand=True,
+        )
+        super().__init__(
+            name="app-button",
+            h_expand=True,
+            child=Box(
+                name="app-content-box",
+                orientation="h",
+                spacing=10,
+                h_expand=True,
+                children=[
+                    self.icon, self.name_label, self.description_label
+                ],
+            ),
+            on_clicked=lambda *_: self.result and self.result.activate(),
+            **kwargs,
+        )
+
+    def bind(self, result: SearchResult) -> None:
+        self.result = result
+        # Icons come from the shared icon cache, rebinding doesn't touch the icon theme
+        self.icon.set_from_pixbuf(result.get_icon_pixbuf(24))
+        self.name_label.set_label(result.title)
+        self.description_label.set_label(result.subtitle)
 
 
 class AppLauncher(Box, NotchWidgetInterface):
@@ -33,18 +214,44 @@ class AppLauncher(Box, NotchWidgetInterface):
         )
         self.selected_index = -1
 
-        self._arranger_handler: int = 0
-        self._all_apps = get_desktop_applications()
+        # Results of every provider, merged by score (negated in `_result_keys`, for bisect)
+        self._results: list[SearchResult] = []
+        self._result_keys: list[float] = []
+        self._result_limit: int | None = None
+        self._selection_moved = False
+        # Result rows are created once and rebound, the first `_shown_rows` are visible
+        self._row_pool: list[ResultRow] = []
+        self._shown_rows = 0
+        self._calc_buttons: list[Button] = []
+        # Results are ranked at most once per frame, the first screenful right away
+        self.search_scheduler = SearchScheduler(
+            search=self.search_apps,
+            render=self.add_result,
+            begin=self.begin_arrange,
+            finish=self.handle_arrange_complete,
+        )
+        self.provider_search = ProviderSearch(
+            [
+                PROVIDERS[name]()
+                for name in config.get("LAUNCHER", "PROVIDERS")
+                if name in PROVIDERS
+            ],
+            on_results=self.add_results,
+        )
+        self.app_index = hub.get("app_index")
 
         CACHE_DIR = str(GLib.get_user_cache_dir()) + f"/{config['APP_NAME']}"
         self.calc_history_path = f"{CACHE_DIR}/calc.json"
         if not os.path.exists(CACHE_DIR):
             os.makedirs(CACHE_DIR)
-        if os.path.exists(self.calc_history_path):
-            with open(self.calc_history_path, "r") as f:
-                self.calc_history = json.load(f)
-        else:
-            self.calc_history = []
+        self.frecency = FrecencyStore(f"{CACHE_DIR}/launcher_frecency.json")
+        self._all_apps = self.app_index.get_apps()
+        self._app_ranker = AppRanker(self._all_apps, self.frecency)
+        self.calc_history = CalculatorHistory(
+            self.calc_history_path,
+            max_size=config.get("LAUNCHER", "CALC_HISTORY_SIZE"))
+        # History version the calculator buttons show, None when they are not shown
+        self._calc_view_version: int | None = None
 
         self.viewport = Box(name="viewport", spacing=4, orientation="v")
         self.search_entry = Entry(
@@ -58,6 +265,13 @@ class AppLauncher(Box, NotchWidgetInterface):
             on_key_press_event=self.on_search_entry_key_press,
         )
         self.search_entry.props.xalign = 0.5  # type: ignore
+        self.calc_preview = Label(
+            name="calc-preview",
+            ellipsization="end",
+            h_align="center",
+        )
+        # Only shown while typing a valid calculator expression
+        self.calc_preview.set_no_show_all(True)
         self.scrolled_window = ScrolledWindow(
             name="notch-scrolled-window",
             spacing=10,
@@ -71,6 +285,7 @@ class AppLauncher(Box, NotchWidgetInterface):
         )
 
         self.add(self.search_entry)
+        self.add(self.calc_preview)
         self.add(self.scrolled_window)
 
     def on_show(self) -> None:
@@ -79,7 +294,8 @@ class AppLauncher(Box, NotchWidgetInterface):
 
     def open_launcher(self) -> None:
         """Open the application launcher and initialize it with the list of applications."""
-        self._all_apps = get_desktop_applications()
+        self._all_apps = self.app_index.get_apps()
+        self._app_ranker = AppRanker(self._all_apps, self.frecency)
         self.arrange_viewport()
 
         def clear_selection():
@@ -102,104 +318,121 @@ class AppLauncher(Box, NotchWidgetInterface):
         """Make sure the launcher is initialized with apps list before opening"""
         if not hasattr(self, "_initialized"):
 
-            self._all_apps = get_desktop_applications()
+            self._all_apps = self.app_index.get_apps()
+            self._app_ranker = AppRanker(self._all_apps, self.frecency)
             self._initialized = True
             return True
         return False
 
     def arrange_viewport(self, query: str = "") -> None:
+        """Show the results of a query right away"""
         if query.startswith("="):
             self.update_calculator_viewport()
             return
-        remove_handler(
-            self._arranger_handler) if self._arranger_handler else None
-        self.viewport.children = []
-        self.selected_index = -1
+        self.search_scheduler.run(query)
 
-        filtered_apps_iter = iter(
-            sorted(
-                [
-                    app for app in self._all_apps if query.casefold() in (
-                        (app.display_name or "") + (" " + app.name + " ") +
-                        (app.generic_name or "")).casefold()
-                ],
-                key=lambda app: (app.display_name or "").casefold(),
-            ))
-
-        self._arranger_handler = idle_add(
-            lambda apps_iter: self.add_next_application(apps_iter) or self.
-            handle_arrange_complete(query),
-            filtered_apps_iter,
-            pin=True,
-        )
+    def search_apps(self, query: str) -> Iterator[SearchResult]:
+        """Yield the ranked apps as results, unless a prefixed provider handles the query"""
+        if self.provider_search.claims(query):
+            return
+        for score, app in self._app_ranker.rank(query):
+            yield SearchResult(
+                title=app.display_name or "Unknown",
+                subtitle=app.description or "",
+                score=score,
+                get_icon=app.get_icon_pixbuf,
+                activate=lambda app=app: self.launch_app(app),
+            )
 
-    def handle_arrange_complete(self, query: str) -> bool:
+    def begin_arrange(self, query: str) -> None:
+        """Clear the viewport before the results of a query are shown"""
+        self.clear_calculator_buttons()
+        self.update_selection(-1)
+        self._results = []
+        self._result_keys = []
+        self._result_limit = MAX_RESULTS if query.strip() else None
+        self._selection_moved = False
+        self.sync_result_rows(0)
+        # The other providers search in the background, their results are merged as they come
+        self.provider_search.search(query)
+
+    def handle_arrange_complete(self, query: str) -> None:
         """Handle the completion of the viewport arrangement"""
-        if query.strip() != "" and self.viewport.get_children():
+        # Best match first, so Enter launches it
+        if query.strip() != "" and self.get_result_rows():
             self.update_selection(0)
-        return False
-
-    def add_next_application(self, apps_iter: Iterator[DesktopApp]) -> bool:
-        """Add the next application to the viewport"""
-        try:
-            app = next(apps_iter)
-            slot = self.bake_application_slot(app)
-            self.viewport.add(slot)
-            idle_add(self.add_next_application, apps_iter)
-            return True
-        except StopIteration:
-            return False
 
-    def bake_application_slot(self, app: DesktopApp, **kwargs) -> Box:
-        """Create a button for the application with pin functionality"""
+    def add_results(self, results: list[SearchResult]) -> None:
+        for result in results:
+            self.add_result(result)
 
-        # Create app button (without the pin button as a child)
-        app_button = Button(
-            name="app-button",
-            h_expand=True,
-            child=Box(
-                name="app-content-box",
-                orientation="h",
-                spacing=10,
-                h_expand=True,
-                children=[
-                    Image(
-                        name="app-icon",
-                        pixbuf=app.get_icon_pixbuf(size=24),
-                        h_align="start",
-                    ),
-                    Label(
-                        name="app-label",
-                        label=app.display_name or "Unknown",
-                        ellipsization="end",
-                        v_align="center",
-                        h_align="center",
-                    ),
-                    Label(
-                        name="app-desc",
-                        label=app.description or "",
-                        ellipsization="end",
-                        v_align="center",
-                        h_align="start",
-                        h_expand=True,
-                    ),
-                ],
-            ),
-            on_clicked=lambda *_: app.launch(),
-        )
+    def add_result(self, result: SearchResult) -> None:
+        """Insert a result at its rank, rebinding only the rows after it"""
+        position = bisect.bisect_right(self._result_keys, -result.score)
+        if self._result_limit is not None and position >= self._result_limit:
+            return
+        selected = (self._results[self.selected_index]
+                    if 0 <= self.selected_index < len(self._results) else None)
+        self._results.insert(position, result)
+        self._result_keys.insert(position, -result.score)
+        if (self._result_limit is not None and
+                len(self._results) > self._result_limit):
+            self._results.pop()
+            self._result_keys.pop()
+        self.sync_result_rows(position)
+        if selected is None:
+            return
+        # Keep the selection on the result the user picked, or on the best one
+        if self._selection_moved and selected in self._results:
+            self.update_selection(self._results.index(selected))
+        else:
+            self.update_selection(0)
 
-        return app_button
+    def sync_result_rows(self, start: int) -> None:
+        """Rebind the rows from start to the results, growing the pool when needed"""
+        while len(self._row_pool) < len(self._results):
+            row = ResultRow()
+            row.show_all()
+            # Unbound rows stay hidden even when the notch shows everything
+            row.set_no_show_all(True)
+            row.set_visible(False)
+            self.viewport.add(row)
+            self._row_pool.append(row)
+        for row, result in zip(self._row_pool[start:len(self._results)],
+                               self._results[start:]):
+            row.bind(result)
+            row.set_visible(True)
+        for row in self._row_pool[len(self._results):self._shown_rows]:
+            row.set_visible(False)
+        self._shown_rows = len(self._results)
+
+    def hide_result_rows(self) -> None:
+        self._results = []
+        self._result_keys = []
+        self.sync_result_rows(0)
+
+    def get_result_rows(self) -> list[Gtk.Widget]:
+        """Return the rows displayed in the viewport, in order"""
+        return [
+            child for child in self.viewport.get_children()
+            if child.get_visible()
+        ]
+
+    def launch_app(self, app: IndexedApp) -> None:
+        """Launch an application, counting it in the frecency of the apps"""
+        self.frecency.record(app.id)
+        app.launch()
 
     def update_selection(self, new_index: int) -> None:
         """Update the selected index and highlight the corresponding button"""
+        rows = self.get_result_rows()
 
-        if self.selected_index != -1 and self.selected_index < len(
-                self.viewport.get_children()):
-            current_button = self.viewport.get_children()[self.selected_index]
+        if self.selected_index != -1 and self.selected_index < len(rows):
+            current_button = rows[self.selected_index]
             current_button.get_style_context().remove_class("selected")
 
-        if new_index != -1 and new_index < len(self.viewport.get_children()):
-            new_button = self.viewport.get_children()[new_index]
+        if new_index != -1 and new_index < len(rows):
+            new_button = rows[new_index]
             new_button.get_style_context().add_class("selected")
             self.selected_index = new_index
             self.scroll_to_selected(new_button)
@@ -239,17 +472,12 @@ class AppLauncher(Box, NotchWidgetInterface):
         """Handle the activation of the search entry"""
         if text.startswith("="):
 
-            if self.selected_index == -1:
-                self.evaluate_calculator_expression(text)
-            return
-        if text.startswith(";"):
-            # If in calculator mode and no history item is selected, evaluate new expression.
             if self.selected_index == -1:
                 self.evaluate_calculator_expression(text)
             return
         match text:
             case _:
-                children = self.viewport.get_children()
+                children = self.get_result_rows()
                 if children:
 
                     if text.strip() == "" and self.selected_index == -1:
@@ -257,7 +485,7 @@ class AppLauncher(Box, NotchWidgetInterface):
                     selected_index = (self.selected_index
                                       if self.selected_index != -1 else 0)
                     if 0 <= selected_index < len(children):
-                        children[selected_index].get_children()[0].clicked()
+                        children[selected_index].clicked()
 
     def on_search_entry_key_press(self, widget: Entry,
                                   event: Gdk.EventKey) -> bool:
@@ -291,14 +519,6 @@ class AppLauncher(Box, NotchWidgetInterface):
                     self.evaluate_calculator_expression(text)
                 return True
             return False
-        if text.startswith(";"):
-            if event.keyval == Gdk.KEY_Down:
-                self.move_selection(1)
-                return True
-            elif event.keyval == Gdk.KEY_Up:
-                self.move_selection(-1)
-                return True
-            return False
         else:
 
             if event.keyval == Gdk.KEY_Down:
@@ -317,14 +537,16 @@ class AppLauncher(Box, NotchWidgetInterface):
         text = entry.get_text()
         if text.startswith("="):
             self.update_calculator_viewport()
+            self.update_calculator_preview(text)
 
             self.selected_index = -1
         else:
-            self.arrange_viewport(text)
+            self.calc_preview.set_visible(False)
+            self.search_scheduler.submit(text)
 
     def move_selection(self, delta: int) -> None:
         """Move the selection in the viewport by the specified delta"""
-        children = self.viewport.get_children()
+        children = self.get_result_rows()
         if not children:
             return
 
@@ -333,13 +555,9 @@ class AppLauncher(Box, NotchWidgetInterface):
         else:
             new_index = self.selected_index + delta
         new_index = max(0, min(new_index, len(children) - 1))
+        self._selection_moved = True
         self.update_selection(new_index)
 
-    def save_calc_history(self) -> None:
-        """Save the calculator history to a JSON file"""
-        with open(self.calc_history_path, "w") as f:
-            json.dump(self.calc_history, f)
-
     def evaluate_calculator_expression(self, text: str):
         """Evaluate a calculator expression and update the history"""
         logger.debug(f"Evaluating calculator expression: {text}")
@@ -348,75 +566,47 @@ class AppLauncher(Box, NotchWidgetInterface):
         if not expr:
             return
 
-        replacements = {
-            "^": "**",
-            "×": "*",
-            "÷": "/",
-            "π": "np.pi",
-            "pi": "np.pi",
-            "e": "np.e",
-            "sin(": "np.sin(",
-            "cos(": "np.cos(",
-            "tan(": "np.tan(",
-            "log(": "np.log10(",
-            "ln(": "np.log(",
-            "sqrt(": "np.sqrt(",
-            "abs(": "np.abs(",
-            "exp(": "np.exp(",
-        }
-
-        for old, new in replacements.items():
-            expr = expr.replace(old, new)
+        result_str = calculate(expr)
 
-        expr = re.sub(r"(\d+)!", r"np.factorial(\1)", expr)
-
-        for old, new in [("[", "("), ("]", ")"), ("{", "("), ("}", ")")]:
-            expr = expr.replace(old, new)
-
-        safe_dict = {
-            "np": np,
-            "math": math,
-            "arange": np.arange,
-            "linspace": np.linspace,
-            "array": np.array,
-        }
+        self.calc_history.add(f"{text} => {result_str}")
+        self.update_calculator_viewport()
 
+    def update_calculator_preview(self, text: str) -> None:
+        """Show the result of the expression being typed, without adding it to the history"""
         try:
-            result = eval(expr, {"__builtins__": None}, safe_dict)
-
-            if isinstance(result, np.ndarray):
-                if result.size > 10:
-                    result_str = f"Array of shape {result.shape}"
-                else:
-                    result_str = str(result)
-            elif isinstance(result, (int, float, np.number)):
-
-                if isinstance(result, (int, np.integer)):
-                    result_str = str(int(result))
-                elif isinstance(result, float) and result.is_integer():
-                    result_str = str(int(result))
-                else:
-                    result_str = f"{float(result):.10g}"
-            else:
-                result_str = str(result)
-
-        except Exception as e:
-            result_str = f"Error: {str(e)}"
-
-        self.calc_history.insert(0, f"{text} => {result_str}")
-        self.save_calc_history()
-        self.update_calculator_viewport()
+            result = format_result(evaluate(text, PREVIEW_TIME_LIMIT))
+        except CalculatorError:
+            # Incomplete expressions are expected while typing
+            self.calc_preview.set_visible(False)
+            return
+        self.calc_preview.set_label(f"= {result}")
+        self.calc_preview.set_visible(True)
 
     def update_calculator_viewport(self) -> None:
         """Update the calculator viewport with the current history"""
-        self.viewport.children = []
-        for item in self.calc_history:
-            btn = self.create_calc_history_button(item)
+        self.search_scheduler.cancel()
+        self.provider_search.cancel()
+        self.hide_result_rows()
+        # Typing an expression doesn't change the history, keep the buttons
+        if self._calc_view_version == self.calc_history.version:
+            return
+        self.clear_calculator_buttons()
+        # Only the most recent entries are shown
+        for index in range(min(len(self.calc_history), MAX_CALC_ROWS)):
+            btn = self.create_calc_history_button(self.calc_history[index])
             self.viewport.add(btn)
+            self._calc_buttons.append(btn)
+        self._calc_view_version = self.calc_history.version
 
-        if self.selected_index >= len(self.calc_history):
+        if self.selected_index >= len(self._calc_buttons):
             self.selected_index = -1
 
+    def clear_calculator_buttons(self) -> None:
+        for btn in self._calc_buttons:
+            btn.destroy()
+        self._calc_buttons = []
+        self._calc_view_version = None
+
     def create_calc_history_button(self, text: str) -> Button:
         """Create a button for a calculator history item"""
         if "=>" in text:
@@ -486,8 +676,7 @@ class AppLauncher(Box, NotchWidgetInterface):
 
             current_index = self.selected_index
 
-            del self.calc_history[current_index]
-            self.save_calc_history()
+            self.calc_history.remove(current_index)
 
             new_index = 0 if current_index == 0 else current_index - 1
 
@@ -495,6 +684,6 @@ class AppLauncher(Box, NotchWidgetInterface):
 
             self.update_calculator_viewport()
 
-            if len(self.calc_history) > 0:
+            if self._calc_buttons:
                 self.update_selection(min(new_index,
-                                          len(self.calc_history) - 1))
+                                          len(self._calc_buttons) - 1))
@@ -1,4 +1,3 @@
-from fabric.core.fabricator import Fabricator
 from fabric.widgets.box import Box
 from fabric.widgets.circularprogressbar import CircularProgressBar
 from fabric.widgets.label import Label
@@ -6,7 +5,7 @@ from gi.repository import GLib  # type: ignore
 
 import modules.icons as icons
 from services.config import config
-from services.metrics import shared_provider
+from services.hub import hub
 
 
 class Metrics(Box):
@@ -75,36 +74,44 @@ class Metrics(Box):
         self.add(self.ram)
         self.add(self.temp)
 
-        self.metrics_fabricator = Fabricator(
-            poll_from=lambda v: shared_provider.get_metrics(),
-            on_changed=lambda f, v: self.update_metrics,
-            interval=1000,
-            stream=False,
-            default_value=0,
+        self.provider = hub.get("metrics")
+        hub.subscribe(
+            "metrics",
+            "changed",
+            lambda provider: self.update_metrics(provider,
+                                                 provider.get_metrics()),
+            owner=self,
         )
-        self.metrics_fabricator.connect("changed", self.update_metrics)
-        GLib.idle_add(self.update_metrics, None, shared_provider.get_metrics())
+        GLib.idle_add(self.update_metrics, None, self.provider.get_metrics())
+
+    def _history_average(self, metric: str) -> float:
+        """Average of the metric over the history kept by the provider"""
+        history = self.provider.get_history(metric)
+        return float(history.mean()) if len(history) else 0.0
 
     def update_metrics(self, sender, metrics: tuple[float, float,
                                                     float]) -> None:
         cpu, ram, temp = metrics
 
         self.cpu.set_value(cpu / 100)
-        self.cpu.set_tooltip_text(f"{cpu:.1f}%")
+        self.cpu.set_tooltip_text(
+            f"{cpu:.1f}% (avg {self._history_average('cpu'):.1f}%)")
         self.cpu.add_style_class(
             "danger" if self.thresholds["cpu"]["danger"] <= cpu else (
                 "warning" if self.thresholds["cpu"]["warning"] <=
                 cpu else "normal"))
 
         self.ram.set_value(ram / 100)
-        self.ram.set_tooltip_text(f"{ram:.1f}%")
+        self.ram.set_tooltip_text(
+            f"{ram:.1f}% (avg {self._history_average('mem'):.1f}%)")
         self.ram.add_style_class(
             "danger" if self.thresholds["ram"]["danger"] <= ram else (
                 "warning" if self.thresholds["ram"]["warning"] <=
                 ram else "normal"))
 
         self.temp.set_value(temp / 100)
-        self.temp.set_tooltip_text(f"{temp:.0f}°C")
+        self.temp.set_tooltip_text(
+            f"{temp:.0f}°C (avg {self._history_average('temp'):.0f}°C)")
         self.temp.add_style_class(
             "danger" if self.thresholds["temp"]["danger"] <= temp else (
                 "warning" if self.thresholds["temp"]["warning"] <=
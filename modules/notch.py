@@ -1,11 +1,10 @@
 import json
 import subprocess
+import time
 from typing import Callable
 
 from fabric.hyprland.service import HyprlandEvent
 from fabric.hyprland.widgets import get_hyprland_connection
-from fabric.utils import DesktopApp
-from fabric.utils.helpers import get_desktop_applications
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.centerbox import CenterBox
@@ -37,7 +36,9 @@ from modules.volume import MicRow, VolumeRow
 from modules.wallpaper import WallpaperManager
 from modules.wifi import WifiModule
 from modules.wired import Wired
+from services.app_index import IndexedApp
 from services.config import config
+from services.hub import hub
 from services.interfaces import NotchWidgetInterface
 from services.logger import logger
 
@@ -109,9 +110,10 @@ class NotchWidgetPicker(Revealer):
         """Hide the widget picker and collapse the buttons"""
         self.revealer_2.set_reveal_child(False)
         self.set_reveal_child(False)
-        if hasattr(self.notch.inner._contents.get_visible_child(), "cleanup"):
+        visible_page = self.notch.inner.get_visible_page()
+        if hasattr(visible_page, "cleanup"):
             # If the visible child has a collapse_slots method, call it
-            self.notch.inner._contents.get_visible_child().cleanup()
+            visible_page.cleanup()
         self.notch.inner.show_widget("default")
 
     def set_active_index(self, index: int) -> None:
@@ -272,6 +274,7 @@ class NotchWidgetDefault(Box):
             name="notch-widget-default",
         )
         self.update_app_map()
+        hub.subscribe("app_index", "changed", self.update_app_map, owner=self)
         self.desktop_string = "Desktop"
         self.set_desktop_string()
 
@@ -399,7 +402,7 @@ class NotchWidgetDefault(Box):
             logger.error(f"Error getting window class: {e}")
         return ""
 
-    def find_app(self, app_identifier: str | dict | None) -> DesktopApp | None:
+    def find_app(self, app_identifier: str | dict | None) -> IndexedApp | None:
         """Find an application by its identifier, which can be a string or a dictionary."""
         if not app_identifier:
             return None
@@ -418,7 +421,7 @@ class NotchWidgetDefault(Box):
             return None
         return self.find_app_by_key(app_identifier)
 
-    def find_app_by_key(self, key_value: str) -> DesktopApp | None:
+    def find_app_by_key(self, key_value: str) -> IndexedApp | None:
         """Find an application by a specific key value (like name, class, etc.)."""
         normalized_id = str(key_value).lower()
         if normalized_id in self.app_identifiers:
@@ -436,14 +439,14 @@ class NotchWidgetDefault(Box):
                 return app
         return None
 
-    def update_app_map(self) -> None:
+    def update_app_map(self, *args) -> None:
         """Update the application map and identifiers from the desktop applications."""
-        self._all_apps = get_desktop_applications()
+        self._all_apps = hub.get("app_index").get_apps()
         self.app_map = {app.name: app for app in self._all_apps if app.name}
         self.app_identifiers = self._build_app_identifiers_map()
 
-    def _build_app_identifiers_map(self) -> dict[str, DesktopApp]:
-        """Build a map of application identifiers to their corresponding DesktopApp objects."""
+    def _build_app_identifiers_map(self) -> dict[str, IndexedApp]:
+        """Build a map of application identifiers to their corresponding IndexedApp objects."""
         identifiers = {}
         for app in self._all_apps:
             if app.name:
@@ -460,6 +463,32 @@ class NotchWidgetDefault(Box):
         return identifiers
 
 
+class LazyNotchPage(Box):
+    """Placeholder stack child that only builds its page the first time it is needed"""
+
+    def __init__(self, name: str, factory: Callable[[], Gtk.Widget], **kwargs):
+        super().__init__(orientation="v", **kwargs)
+        self.page_name = name
+        self._factory = factory
+        self._page: Gtk.Widget | None = None
+
+    @property
+    def is_materialized(self) -> bool:
+        """Whether the real page has already been built"""
+        return self._page is not None
+
+    def get_page(self) -> Gtk.Widget:
+        """Return the real page, building it on first access"""
+        if self._page is None:
+            start = time.monotonic()
+            self._page = self._factory()
+            self.add(self._page)
+            logger.debug(
+                f"Notch page '{self.page_name}' built in {(time.monotonic() - start) * 1000:.1f}ms"
+            )
+        return self._page
+
+
 class NotchInner(CornerContainer):
     """Container for the notch widgets, allowing switching between them"""
 
@@ -477,25 +506,26 @@ class NotchInner(CornerContainer):
         ]
         self.notch_widget_picker = notch_widget_picker
         self.notch_widget_default = NotchWidgetDefault()
-        self.notch_widget_default_expanded = NotchWidgetDefaultExpanded(
-            notification_history=notification_history, show_widget=show_widget
-        )
-        self.launcher = AppLauncher()
-        self.notch_widget_wallpaper = WallpaperManager()
-        self.power = PowerMenuActions()
-        self.clipboard = ClipboardManager(notch_inner=self)
+
+        # Every page but the default one is built on demand (or prewarmed once idle)
+        self._pages: dict[str, LazyNotchPage] = {
+            'default-expanded': LazyNotchPage(
+                'default-expanded',
+                lambda: NotchWidgetDefaultExpanded(
+                    notification_history=notification_history,
+                    show_widget=show_widget),
+            ),
+            'launcher': LazyNotchPage('launcher', AppLauncher),
+            'wallpaper': LazyNotchPage('wallpaper', WallpaperManager),
+            'power': LazyNotchPage('power', PowerMenuActions),
+            'clipboard': LazyNotchPage(
+                'clipboard', lambda: ClipboardManager(notch_inner=self)),
+        }
 
         self._contents = Stack(
             transition_type="slide-up-down",
             transition_duration=400,
-            children=[
-                self.notch_widget_default,
-                self.notch_widget_default_expanded,
-                self.launcher,
-                self.notch_widget_wallpaper,
-                self.power,
-                self.clipboard,
-            ],
+            children=[self.notch_widget_default, *self._pages.values()],
             interpolate_size=True,
             h_expand=False,
         )
@@ -513,6 +543,39 @@ class NotchInner(CornerContainer):
             orientation="v",
             children=[self.notch_widget_picker, self._contents],
         )
+        self._schedule_prewarm()
+
+    def _schedule_prewarm(self) -> None:
+        """Build the pages flagged for prewarming, one per idle iteration, once the shell is up"""
+        pending = [
+            name for name in self._pages
+            if config.get('NOTCH', 'PAGES', name.upper().replace('-', '_'),
+                          'PREWARM', default=False)
+        ]
+        if not pending:
+            return
+
+        def prewarm_next() -> bool:
+            page = self._pages[pending.pop(0)]
+            if not page.is_materialized:
+                page.get_page()
+            return len(pending) > 0
+
+        GLib.idle_add(prewarm_next, priority=GLib.PRIORITY_LOW)
+
+    def get_page(self, widget_name: str) -> Gtk.Widget | None:
+        """Return the real widget of a page, building it if needed."""
+        if widget_name == 'default':
+            return self.notch_widget_default
+        page = self._pages.get(widget_name)
+        return page.get_page() if page else None
+
+    def get_visible_page(self) -> Gtk.Widget | None:
+        """Return the real widget of the currently visible page."""
+        visible_child = self._contents.get_visible_child()
+        if isinstance(visible_child, LazyNotchPage):
+            return visible_child.get_page()
+        return visible_child
 
     def show_widget(self, widget_name: str, *_) -> bool:
         """Show a specific widget based on its name, updating the visible child of the contents stack."""
@@ -525,10 +588,12 @@ class NotchInner(CornerContainer):
         if self._contents.get_visible_child() is widgets[index]:
             index = 0
 
+        # Build the page before switching so the stack can size the transition
+        page = self.get_page(self.widgets_labels[index])
         self.notch_widget_picker.set_active_index(index - 2 if index > 0 else 0)
         self._contents.set_visible_child(widgets[index])
-        if isinstance(widgets[index], NotchWidgetInterface):
-            widgets[index].on_show()
+        if isinstance(page, NotchWidgetInterface):
+            page.on_show()
         return index == 0
 
 
@@ -1,4 +1,3 @@
-import json
 import locale
 import os
 import uuid
@@ -13,116 +12,27 @@ from fabric.widgets.centerbox import CenterBox
 from fabric.widgets.image import Image
 from fabric.widgets.label import Label
 from fabric.widgets.revealer import Revealer
-from fabric.widgets.scrolledwindow import ScrolledWindow
 from fabric.widgets.wayland import WaylandWindow
-from gi.repository import GdkPixbuf, GLib, Gtk  # type: ignore
+from gi.repository import GLib, Gtk  # type: ignore
 
 import modules.icons as icons
+from modules.virtual_list import VirtualList
 from services.config import config
 from services.logger import logger
-
-PERSISTENT_DIR = f"/tmp/{config['APP_NAME']}/notifications"
-PERSISTENT_HISTORY_FILE = os.path.join(PERSISTENT_DIR,
+from services.notification_images import (IMAGE_SIZE, LEGACY_CACHE_DIR,
+                                          app_icon_path, image_cache)
+from services.notification_index import HistoryIndex
+from services.notification_store import NotificationStore
+from services.notification_throttle import NotificationThrottle
+
+# Legacy whole-file history, imported into the database on first start
+PERSISTENT_HISTORY_FILE = os.path.join(LEGACY_CACHE_DIR,
                                        "notification_history.json")
+HISTORY_DATABASE = os.path.join(GLib.get_user_cache_dir(), config['APP_NAME'],
+                                "notifications", "history.sqlite3")
 MAX_VISIBLE_NOTIFICATIONS = 3
 
 
-def cache_notification_pixbuf(notification_box):
-    """
-    Saves a scaled pixbuf (48x48) in the cache directory and returns the cache file path.
-    """
-    notification = notification_box.notification
-    if notification.image_pixbuf:
-        os.makedirs(PERSISTENT_DIR, exist_ok=True)
-        cache_file = os.path.join(PERSISTENT_DIR,
-                                  f"notification_{notification_box.uuid}.png")
-        logger.debug(
-            f"Caching image for notification {notification.id} to: {cache_file}"
-        )
-        try:
-            scaled_pixbuf = notification.image_pixbuf.scale_simple(
-                48, 48, GdkPixbuf.InterpType.BILINEAR)
-            scaled_pixbuf.savev(cache_file, "png", [], [])
-            notification_box.cached_image_path = cache_file
-            return cache_file
-        except Exception as e:
-            logger.error(f"Failed to cache notification image: {e}")
-            return None
-    else:
-        logger.debug(
-            f"Notification {notification.id} has no image_pixbuf to cache.")
-        return None
-
-
-def load_scaled_pixbuf(notification_box, width, height):
-    """
-    Loads and scales a pixbuf for a notification_box, prioritizing cached images.
-    """
-    notification = notification_box.notification
-    if not hasattr(notification_box, "notification") or notification is None:
-        logger.error(
-            "load_scaled_pixbuf: notification_box.notification is None or not set!"
-        )
-        return None
-
-    pixbuf = None
-    if (hasattr(notification_box, "cached_image_path") and
-            notification_box.cached_image_path and
-            os.path.exists(notification_box.cached_image_path)):
-        try:
-            logger.debug(
-                f"Attempting to load cached image from: {notification_box.cached_image_path} for notification {notification.id}"
-            )
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file(
-                notification_box.cached_image_path)
-            if pixbuf:
-                pixbuf = pixbuf.scale_simple(width, height,
-                                             GdkPixbuf.InterpType.BILINEAR)
-                logger.info(
-                    f"Successfully loaded cached image from: {notification_box.cached_image_path} for notification {notification.id}"
-                )
-            return pixbuf
-        except Exception as e:
-            logger.error(
-                f"Error loading cached image from {notification_box.cached_image_path} for notification {notification.id}: {e}"
-            )
-            logger.warning(
-                f"Falling back to notification.image_pixbuf for notification {notification.id}"
-            )
-
-    if notification.image_pixbuf:
-        logger.debug(
-            f"Loading image directly from notification.image_pixbuf for notification {notification.id}"
-        )
-        pixbuf = notification.image_pixbuf.scale_simple(
-            width, height, GdkPixbuf.InterpType.BILINEAR)
-        return pixbuf
-
-    logger.debug(
-        f"No image_pixbuf or cached image found, trying app icon for notification {notification.id}"
-    )
-    return get_app_icon_pixbuf(notification.app_icon, width, height)
-
-
-def get_app_icon_pixbuf(icon_path, width, height):
-    """
-    Loads and scales a pixbuf from an app icon path.
-    """
-    if not icon_path:
-        return None
-    if icon_path.startswith("file://"):
-        icon_path = icon_path[7:]
-    if not os.path.exists(icon_path):
-        logger.warning(f"Icon path does not exist: {icon_path}")
-        return None
-    try:
-        pixbuf = GdkPixbuf.Pixbuf.new_from_file(icon_path)
-        return pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
-    except Exception as e:
-        logger.error(f"Failed to load or scale icon: {e}")
-        return None
-
-
 class ActionButton(Button):
 
     def __init__(self, action: NotificationAction, index: int, total: int,
@@ -174,6 +84,11 @@ class NotificationBox(Box):
         self._timeout_id = None
         self._container = None
         self.cached_image_path = None
+        # The image is cached in the background, see when_image_cached
+        self.image_pending = bool(notification.image_pixbuf)
+        self._image_callbacks = []
+        # Number of notifications collapsed into this box
+        self.count = 1
 
         # Add entry animation style class
         self.add_style_class("notification-entering")
@@ -185,12 +100,6 @@ class NotificationBox(Box):
             self._timeout_id = GLib.timeout_add(self.timeout_ms,
                                                 self.close_notification)
 
-        if self.notification.image_pixbuf:
-            cache_notification_pixbuf(self)
-        else:
-            logger.debug(
-                f"Notification {notification.id} has no image_pixbuf to cache.")
-
         content = self.create_content()
         action_buttons = self.create_action_buttons()
         self.add(content)
@@ -202,10 +111,43 @@ class NotificationBox(Box):
 
         self._destroyed = False
         self._is_history = False
+        if self.image_pending:
+            image_cache.store(self.notification.image_pixbuf,
+                              self._on_image_cached)
+        else:
+            logger.debug(
+                f"Notification {notification.id} has no image_pixbuf to cache.")
+            image_path = app_icon_path(notification.app_icon)
+            if image_path:
+                image_cache.load(image_path, IMAGE_SIZE, self._set_image)
         logger.debug(
             f"NotificationBox {self.uuid} created for notification {notification.id}"
         )
 
+    def when_image_cached(self, callback):
+        """Call back with the cached image path (None without image) once it has been stored."""
+        if self.image_pending:
+            self._image_callbacks.append(callback)
+        else:
+            callback(self.cached_image_path)
+
+    def _on_image_cached(self, path):
+        self.image_pending = False
+        self.cached_image_path = path
+        callbacks, self._image_callbacks = self._image_callbacks, []
+        for callback in callbacks:
+            callback(path)
+        if self._destroyed:
+            image_cache.release(path)
+        elif path:
+            image_cache.load(path, IMAGE_SIZE, self._set_image)
+
+    def _set_image(self, pixbuf):
+        if self._destroyed or pixbuf is None:
+            return
+        self.notification_image.set_from_pixbuf(pixbuf)
+        self.notification_image_box.show_all()
+
     def _animate_to_visible(self):
         self.remove_style_class("notification-entering")
         self.add_style_class("notification-visible")
@@ -235,18 +177,14 @@ class NotificationBox(Box):
             self.notification.close("expired")
         return False
 
-    def destroy(self, from_history_delete=False):
+    def destroy(self):
         logger.debug(
-            f"NotificationBox destroy called for notification: {self.notification.id}, from_history_delete: {from_history_delete}, is_history: {self._is_history}"
+            f"NotificationBox destroy called for notification: {self.notification.id}, is_history: {self._is_history}"
         )
-        if (hasattr(self, "cached_image_path") and self.cached_image_path and
-                os.path.exists(self.cached_image_path) and
-            (not self._is_history or from_history_delete)):
-            try:
-                os.unlink(self.cached_image_path)
-                logger.debug(f"Deleted cached image: {self.cached_image_path}")
-            except Exception as e:
-                logger.error(f"Failed to delete cached image: {e}")
+        if self._destroyed:
+            return
+        # The history takes its own reference on the image when it keeps it
+        image_cache.release(self.cached_image_path)
         self._destroyed = True
         self.stop_timeout()
         super().destroy()
@@ -283,13 +221,15 @@ class NotificationBox(Box):
 
     def create_content(self):
         notification = self.notification
-        pixbuf = load_scaled_pixbuf(self, 48, 48)
+        self.notification_image = Image()
         self.notification_image_box = Box(
             name="notification-image",
             orientation="v",
-            children=[Image(pixbuf=pixbuf),
+            children=[self.notification_image,
                       Box(v_expand=True)],
         )
+        # Shown once the image is loaded
+        self.notification_image_box.set_no_show_all(True)
         notification_text_labels = []
         for i, text in enumerate(notification.summary[0 + j:self.labels_length +
                                                       j]
@@ -315,6 +255,10 @@ class NotificationBox(Box):
             max_chars_width=25,
             ellipsization="end",
         )
+        self.counter_label = Label(name="notification-counter",
+                                   h_align="start")
+        # Only shown once a notification is collapsed into this one
+        self.counter_label.set_no_show_all(True)
         self.notification_body_label = (Label(
             markup=notification.body,
             h_align="start",
@@ -334,7 +278,13 @@ class NotificationBox(Box):
                     name="notification-summary-box",
                     orientation="v",
                     children=[
-                        self.notification.app_name_label_content,
+                        Box(
+                            spacing=4,
+                            children=[
+                                self.notification.app_name_label_content,
+                                self.counter_label,
+                            ],
+                        ),
                         self.notification_summary_label,
                         # Box(
                         #     name="notif-sep",
@@ -360,12 +310,21 @@ class NotificationBox(Box):
             name="notification-content",
             spacing=8,
             children=[
-                self.notification_image_box if pixbuf else Box(h_expand=False),
+                self.notification_image_box,
                 self.notification_text_box,
                 self.content_close_button_box,
             ],
         )
 
+    def increment_count(self):
+        """Collapse one more notification into this box, extending its display time."""
+        self.count += 1
+        self.counter_label.set_label(f"×{self.count}")
+        self.counter_label.set_visible(True)
+        # A paused timeout (hovered box) is resumed on leave
+        if self._timeout_id is not None:
+            self.start_timeout()
+
     def create_action_buttons(self):
         notification = self.notification
         if not notification.actions:
@@ -421,7 +380,11 @@ class NotificationBox(Box):
             self._container.resume_all_timeouts()
 
 
-class HistoricalNotification(object):
+class HistoryRecord(object):
+    """Lightweight model of a notification history entry, displayed by a recycled row when visible."""
+
+    __slots__ = ("id", "app_icon", "summary", "body", "app_name", "timestamp",
+                 "cached_image_path", "arrival_time", "notification_id")
 
     def __init__(self,
                  id,
@@ -430,17 +393,177 @@ class HistoricalNotification(object):
                  body,
                  app_name,
                  timestamp,
-                 cached_image_path=None):
-        self.id = id
+                 cached_image_path=None,
+                 notification_id=None):
+        self.id = str(id)
         self.app_icon = app_icon
         self.summary = summary
         self.body = body
         self.app_name = app_name
         self.timestamp = timestamp
         self.cached_image_path = cached_image_path
-        self.image_pixbuf = None
-        self.actions = []
-        self.cached_scaled_pixbuf = None
+        # Id given by the notification server, only known for this session's notifications
+        self.notification_id = notification_id
+        try:
+            self.arrival_time = datetime.fromisoformat(timestamp)
+        except Exception:
+            self.arrival_time = datetime.now()
+
+    @classmethod
+    def from_note(cls, note: dict) -> "HistoryRecord":
+        return cls(
+            id=note.get("id"),
+            app_icon=note.get("app_icon"),
+            summary=note.get("summary"),
+            body=note.get("body"),
+            app_name=note.get("app_name"),
+            timestamp=note.get("timestamp"),
+            cached_image_path=note.get("cached_image_path"),
+        )
+
+    def to_note(self) -> dict:
+        return {
+            "id": self.id,
+            "app_icon": self.app_icon,
+            "summary": self.summary,
+            "body": self.body,
+            "app_name": self.app_name,
+            "timestamp": self.timestamp,
+            "cached_image_path": self.cached_image_path,
+        }
+
+
+class NotificationHistoryRow(Box):
+    """Row of the notification history, built once and rebound to other entries while scrolling."""
+
+    def __init__(self, on_close: Callable, with_body: bool, **kwargs):
+        super().__init__(
+            name="notification-container",
+            orientation="v",
+            h_align="fill",
+            h_expand=True,
+            **kwargs,
+        )
+        self.record: HistoryRecord | None = None
+        self.image = Image()
+        # Keep the row layout stable while the image is loading
+        self.image.set_size_request(IMAGE_SIZE, IMAGE_SIZE)
+        self.image_box = Box(
+            name="notification-image",
+            orientation="v",
+            children=[
+                self.image,
+                Box(v_expand=True),
+            ],
+        )
+        self.summary_label = Label(
+            name="notification-summary",
+            h_align="start",
+            ellipsization="end",
+        )
+        self.app_name_label = Label(
+            name="notification-app-name",
+            h_align="start",
+            ellipsization="end",
+        )
+        self.time_label = Label(
+            name="notification-timestamp",
+            h_align="start",
+            ellipsization="end",
+        )
+        self.body_label = (Label(
+            name="notification-body",
+            h_align="start",
+            ellipsization="end",
+            line_wrap="word-char",
+        ) if with_body else Box())
+        (self.body_label.set_single_line_mode(True) if with_body else None)
+        self.summary_box = Box(
+            name="notification-summary-box",
+            orientation="h",
+            children=[
+                self.summary_label,
+                Box(
+                    name="notif-sep",
+                    h_expand=False,
+                    v_expand=False,
+                    h_align="center",
+                    v_align="center",
+                ),
+                self.app_name_label,
+                Box(
+                    name="notif-sep",
+                    h_expand=False,
+                    v_expand=False,
+                    h_align="center",
+                    v_align="center",
+                ),
+                self.time_label,
+            ],
+        )
+        self.text_box = Box(
+            name="notification-text",
+            orientation="v",
+            v_align="center",
+            h_expand=True,
+            children=[
+                self.summary_box,
+                self.body_label,
+            ],
+        )
+        self.close_button = Button(
+            name="notif-close-button",
+            child=Label(name="notif-close-label", markup=icons.cancel),
+            on_clicked=lambda *_: on_close(self.record),
+        )
+        self.close_button_box = Box(
+            orientation="v",
+            children=[
+                self.close_button,
+                Box(v_expand=True),
+            ],
+        )
+        self.add(
+            Box(
+                name="notification-box-hist",
+                spacing=8,
+                children=[
+                    self.image_box,
+                    self.text_box,
+                    self.close_button_box,
+                ],
+            ))
+
+    def bind(self, record: HistoryRecord) -> None:
+        """Display the given entry in this row."""
+        self.record = record
+        self.image.set_from_pixbuf(None)
+        self._load_image(
+            record,
+            [record.cached_image_path,
+             app_icon_path(record.app_icon)])
+        self.summary_label.set_markup(record.summary or "")
+        self.app_name_label.set_markup(f"{record.app_name}")
+        self.time_label.set_markup(record.arrival_time.strftime("%H:%M"))
+        if record.body:
+            self.body_label.set_markup(record.body)
+
+    def _load_image(self, record: HistoryRecord, sources: list) -> None:
+        """Display the first image of the sources that can be loaded, if the row still shows the record."""
+        sources = [source for source in sources if source]
+        self.image_box.set_visible(bool(sources))
+        if not sources:
+            return
+
+        def on_loaded(pixbuf):
+            if self.record is not record:
+                return
+            if pixbuf is None:
+                self._load_image(record, sources[1:])
+            else:
+                self.image.set_from_pixbuf(pixbuf)
+
+        image_cache.load(sources[0], IMAGE_SIZE, on_loaded)
 
 
 class NotificationHistory(Box):
@@ -455,7 +578,8 @@ class NotificationHistory(Box):
                          h_expand=True,
                          **kwargs)
 
-        self.containers = []
+        self.records: dict[str, HistoryRecord] = {}
+        self.history_index = HistoryIndex()
         self.header_label = Label(
             name="nhh",
             label="Notifications",
@@ -489,16 +613,12 @@ class NotificationHistory(Box):
             center_children=[self.header_label],
             end_children=[self.header_clean],
         )
-        self.notifications_list = Box(
-            name="notifications-list",
-            orientation="v",
-            spacing=4,
-            h_expand=True,
-            v_expand=True,
-            h_align="fill",
-            v_align="fill",
-        )
-        self.scrolled_window = ScrolledWindow(
+        # Only the rows around the viewport exist, bound to the records (and day
+        # separators) of the history
+        self.scrolled_window = VirtualList(
+            create_row=self.create_row,
+            bind_row=self.bind_row,
+            kind_of=self.get_row_kind,
             name="notification-history-scrolled-window",
             orientation="v",
             h_expand=True,
@@ -508,15 +628,16 @@ class NotificationHistory(Box):
             propagate_width=False,
             propagate_height=False,
         )
-        self.scrolled_window.add_with_viewport(self.notifications_list)
-        self.persistent_notifications = []
+        self.history_size = config.get('NOTIFICATION',
+                                       'HISTORY_SIZE',
+                                       default=50)
+        self.store = NotificationStore(HISTORY_DATABASE,
+                                       retention=self.history_size)
         self.add(self.history_header)
         self.add(self.scrolled_window)
         self._load_persistent_history()
-        self._cleanup_orphan_cached_images()
         self.schedule_midnight_update()
 
-        self.LIMITED_APPS_HISTORY = ["Spotify"]
         self._server = notification_server
 
     def on_event(self, func: Callable) -> None:
@@ -570,8 +691,8 @@ class NotificationHistory(Box):
         GLib.timeout_add_seconds(int(delta_seconds), self.on_midnight)
 
     def on_midnight(self) -> bool:
-        """Rebuild notifications with date separators at midnight."""
-        self.rebuild_with_separators()
+        """Update the date separators labels at midnight."""
+        self.refresh_date_separators()
         self.schedule_midnight_update()
         return GLib.SOURCE_REMOVE
 
@@ -589,36 +710,54 @@ class NotificationHistory(Box):
             ],
         )
 
-    def rebuild_with_separators(self) -> None:
-        """Rebuild the notification list with date separators."""
-        GLib.idle_add(self._do_rebuild_with_separators)
-
-    def _do_rebuild_with_separators(self) -> None:
-        """Perform the actual rebuilding of the notification list."""
-        children = list(self.notifications_list.get_children())
-        for child in children:
-            self.notifications_list.remove(child)
-
-        current_date_header = None
-        last_date_header = None
-        for container in sorted(self.containers,
-                                key=lambda x: x.arrival_time,
-                                reverse=True):
-            arrival_time = container.arrival_time
-            date_header = self.get_date_header(arrival_time)
-            if date_header != current_date_header:
-                sep = self.create_date_separator(date_header)
-                self.notifications_list.add(sep)
-                current_date_header = date_header
-                last_date_header = date_header
-            self.notifications_list.add(container)
-
-        if not self.containers and last_date_header:
-            for child in list(self.notifications_list.get_children()):
-                if child.get_name() == "notif-date-sep":
-                    self.notifications_list.remove(child)
-
-        self.notifications_list.show_all()
+    def get_row_kind(self, item: HistoryRecord | int) -> str:
+        """Return the kind of row displaying an item: a day separator or a record, with or without body."""
+        if isinstance(item, int):
+            return "separator"
+        return "record-with-body" if item.body else "record"
+
+    def create_row(self, kind: str) -> Box:
+        """Create a row that the history list recycles for the items of a kind."""
+        if kind == "separator":
+            return self.create_date_separator("")
+        return NotificationHistoryRow(
+            on_close=lambda record: self.delete_historical_notification(
+                record.id),
+            with_body=kind == "record-with-body",
+        )
+
+    def bind_row(self, row: Box, item: HistoryRecord | int) -> None:
+        """Display an item (a record or the bucket key of a day) in a recycled row."""
+        if isinstance(item, int):
+            row.get_children()[0].set_label(
+                self.get_date_header(datetime.fromordinal(-item)))
+        else:
+            row.bind(item)
+
+    def refresh_date_separators(self) -> None:
+        """Recompute the label of every date separator ("Today" becomes "Yesterday", etc.)."""
+        self.scrolled_window.refresh()
+
+    def _insert_record(self, record: HistoryRecord) -> None:
+        """Insert a record at its position, along with its day separator if needed."""
+        self.records[record.id] = record
+        image_cache.acquire(record.cached_image_path)
+        position, separator_position, day = self.history_index.insert(
+            record, record.arrival_time)
+        if separator_position is not None:
+            self.scrolled_window.insert(separator_position, day)
+        self.scrolled_window.insert(position, record)
+
+    def _remove_record(self, record: HistoryRecord) -> None:
+        """Remove a record, along with its day separator if it was the last of its day."""
+        if self.records.pop(record.id, None) is not None:
+            image_cache.release(record.cached_image_path)
+        if record not in self.history_index:
+            return
+        position, _, bucket_emptied = self.history_index.remove(record)
+        self.scrolled_window.remove(position)
+        if bucket_emptied:
+            self.scrolled_window.remove(position - 1)
 
     def on_do_not_disturb_changed(self) -> None:
         """Toggle Do Not Disturb mode and update the UI accordingly."""
@@ -635,42 +774,40 @@ class NotificationHistory(Box):
 
     def clear_history(self, *args: object) -> None:
         """Clear the notification history and remove all notifications."""
-        for child in self.notifications_list.get_children()[:]:
-            container = child
-            notif_box = (container.notification_box if hasattr(
-                container, "notification_box") else None)
-            if notif_box:
-                notif_box.destroy(from_history_delete=True)
-            self.notifications_list.remove(child)
-            child.destroy()
-
-        if os.path.exists(PERSISTENT_HISTORY_FILE):
-            try:
-                os.remove(PERSISTENT_HISTORY_FILE)
-                logger.info(
-                    "Notification history cleared and persistent file deleted.")
-            except Exception as e:
-                logger.error(f"Error deleting persistent history file: {e}")
-        self.persistent_notifications = []
-        self.containers = []
-        self.rebuild_with_separators()
+        for record in self.records.values():
+            image_cache.release(record.cached_image_path)
+        try:
+            self.store.clear()
+            logger.info("Notification history cleared.")
+        except Exception as e:
+            logger.error(f"Error clearing persistent history: {e}")
+        self.records = {}
+        self.history_index = HistoryIndex()
+        self.scrolled_window.set_items([])
         self.emit("notification-deleted")
 
     def _load_persistent_history(self) -> None:
-        """Load persistent notification history from file."""
-        if not os.path.exists(PERSISTENT_DIR):
-            os.makedirs(PERSISTENT_DIR, exist_ok=True)
+        """Load persistent notification history from the database."""
         if os.path.exists(PERSISTENT_HISTORY_FILE):
-            try:
-                with open(PERSISTENT_HISTORY_FILE, "r") as f:
-                    self.persistent_notifications = json.load(f)
-                for note in reversed(self.persistent_notifications):
-                    self._add_historical_notification(note)
-            except Exception as e:
-                logger.error(f"Error loading persistent history: {e}")
+            self.store.import_json(PERSISTENT_HISTORY_FILE)
+        try:
+            for note in reversed(self.store.all()):
+                self._insert_record(HistoryRecord.from_note(note))
+        except Exception as e:
+            logger.error(f"Error loading persistent history: {e}")
+
+    def get_notification_count(self) -> int:
+        """Return the number of notifications in the history."""
+        return self.store.count()
 
-    def delete_historical_notification(self, note_id: int,
-                                       container: Box) -> None:
+    def find_record(self, notification_id: int) -> HistoryRecord | None:
+        """Return the record of a notification of this session, by its server id."""
+        return next((record for record in self.records.values()
+                     if record.notification_id is not None and
+                     str(record.notification_id) == str(notification_id)),
+                    None)
+
+    def delete_historical_notification(self, note_id: str) -> None:
         """Delete a historical notification and remove it from persistent storage."""
         # Convert note_id to string for consistent comparison
         target_note_id_str = str(note_id)
@@ -678,443 +815,92 @@ class NotificationHistory(Box):
             f"Attempting to delete notification {target_note_id_str} from history"
         )
 
-        # First cleanup notification box resources
-        if hasattr(container, "notification_box"):
-            notif_box = container.notification_box
-            notif_box.destroy(from_history_delete=True)
-
-        # Create new list excluding the notification to delete
-        new_persistent_notifications = []
-        removed_from_list = False
+        record = self.records.get(target_note_id_str)
+        if record is not None:
+            self._remove_record(record)
 
-        for note_in_list in self.persistent_notifications:
-            current_note_id_str = str(note_in_list.get("id"))
-            if current_note_id_str == target_note_id_str:
-                removed_from_list = True
-                logger.debug(
-                    f"Found notification {target_note_id_str} in persistent list, removing"
+        try:
+            if self.store.delete(target_note_id_str):
+                logger.info(
+                    f"Notification {target_note_id_str} removed from persistent history"
                 )
-                continue
-            new_persistent_notifications.append(note_in_list)
-
-        # Update the list and save if changed
-        if removed_from_list:
-            self.persistent_notifications = new_persistent_notifications
-            logger.info(
-                f"Notification {target_note_id_str} removed from persistent_notifications list"
-            )
-
-            self._save_persistent_history()
-        else:
-            logger.warning(
-                f"Notification {target_note_id_str} NOT found in persistent_notifications list"
-            )
-
-        # Remove from containers list
-        self.containers = [c for c in self.containers if c != container]
-
-        # Ensure the container is removed from the UI
-        parent = container.get_parent()
-        if parent:
-            parent.remove(container)
-        container.destroy()
-
-        # Update UI
-        self.rebuild_with_separators()
+            else:
+                logger.warning(
+                    f"Notification {target_note_id_str} NOT found in persistent history"
+                )
+        except Exception as e:
+            logger.error(f"Error deleting from persistent history: {e}")
 
         # Notify about deletion for counter update
         self.emit("notification-deleted")
 
-    def _save_persistent_history(self) -> None:
-        try:
-            # Ensure directory exists
-            os.makedirs(PERSISTENT_DIR, exist_ok=True)
-
-            with open(PERSISTENT_HISTORY_FILE, "w") as f:
-                json.dump(self.persistent_notifications, f)
-
-            logger.debug("Persistent notification history saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving persistent history: {e}")
-
-    def _add_historical_notification(self, note):
-        hist_notif = HistoricalNotification(
-            id=note.get("id"),
-            app_icon=note.get("app_icon"),
-            summary=note.get("summary"),
-            body=note.get("body"),
-            app_name=note.get("app_name"),
-            timestamp=note.get("timestamp"),
-            cached_image_path=note.get("cached_image_path"),
-        )
-
-        hist_box = NotificationBox(hist_notif, timeout_ms=0)  # type: ignore
-        hist_box.uuid = hist_notif.id
-        hist_box.cached_image_path = hist_notif.cached_image_path
-        hist_box.set_is_history(True)
-        for child in hist_box.get_children():
-            if child.get_name() == "notification-action-buttons":
-                hist_box.remove(child)
-        container = Box(
-            name="notification-container",
-            orientation="v",
-            h_align="fill",
-            h_expand=True,
-        )
-        container.notification_box = hist_box
-        try:
-            arrival = datetime.fromisoformat(hist_notif.timestamp)
-        except Exception:
-            arrival = datetime.now()
-        container.arrival_time = arrival
-
-        def compute_time_label(arrival_time):
-            return arrival_time.strftime("%H:%M")
-
-        self.hist_time_label = Label(
-            name="notification-timestamp",
-            markup=compute_time_label(container.arrival_time),
-            h_align="start",
-            ellipsization="end",
-        )
-        pixbuf = load_scaled_pixbuf(hist_box, 48, 48)
-        self.hist_notif_image_box = Box(
-            name="notification-image",
-            orientation="v",
-            children=[
-                Image(pixbuf=pixbuf),
-                Box(v_expand=True),
-            ],
-        )
-        self.hist_notif_summary_label = Label(
-            name="notification-summary",
-            markup=hist_notif.summary,
-            h_align="start",
-            ellipsization="end",
-        )
-
-        self.hist_notif_app_name_label = Label(
-            name="notification-app-name",
-            markup=f"{hist_notif.app_name}",
-            h_align="start",
-            ellipsization="end",
-        )
-
-        self.hist_notif_body_label = (Label(
-            name="notification-body",
-            markup=hist_notif.body,
-            h_align="start",
-            ellipsization="end",
-            line_wrap="word-char",
-        ) if hist_notif.body else Box())
-        (self.hist_notif_body_label.set_single_line_mode(True)
-         if hist_notif.body else None)
-
-        self.hist_notif_summary_box = Box(
-            name="notification-summary-box",
-            orientation="h",
-            children=[
-                self.hist_notif_summary_label,
-                Box(
-                    name="notif-sep",
-                    h_expand=False,
-                    v_expand=False,
-                    h_align="center",
-                    v_align="center",
-                ),
-                self.hist_notif_app_name_label,
-                Box(
-                    name="notif-sep",
-                    h_expand=False,
-                    v_expand=False,
-                    h_align="center",
-                    v_align="center",
-                ),
-                self.hist_time_label,
-            ],
-        )
-        self.hist_notif_text_box = Box(
-            name="notification-text",
-            orientation="v",
-            v_align="center",
-            h_expand=True,
-            children=[
-                self.hist_notif_summary_box,
-                self.hist_notif_body_label,
-            ],
-        )
-        self.hist_notif_close_button = Button(
-            name="notif-close-button",
-            child=Label(name="notif-close-label", markup=icons.cancel),
-            on_clicked=lambda *_: self.delete_historical_notification(
-                hist_notif.id, container),
-        )
-        self.hist_notif_close_button_box = Box(
-            orientation="v",
-            children=[
-                self.hist_notif_close_button,
-                Box(v_expand=True),
-            ],
-        )
-        content_box = Box(
-            name="notification-box-hist",
-            spacing=8,
-            children=[
-                self.hist_notif_image_box if pixbuf else Box(h_expand=False),
-                self.hist_notif_text_box,
-                self.hist_notif_close_button_box,
-            ],
-        )
-        container.add(content_box)
-        self.containers.insert(0, container)
-        self.rebuild_with_separators()
-
-    def add_notification(self, notification_box):
-        app_name = notification_box.notification.app_name
-        if app_name in self.LIMITED_APPS_HISTORY:
+    def add_notification(self, notification_box, replace: bool = False):
+        """
+        Add a notification to the history, the notification box itself is not kept.
+        With `replace`, it takes the place of the previous ones of its app.
+        """
+        notification = notification_box.notification
+        app_name = notification.app_name
+        if replace:
             self.clear_history_for_app(app_name)
 
-        if len(self.containers) >= 50:
-            oldest_container = self.containers.pop()
-            if (hasattr(oldest_container, "notification_box") and hasattr(
-                    oldest_container.notification_box, "cached_image_path") and
-                    oldest_container.notification_box.cached_image_path and
-                    os.path.exists(
-                        oldest_container.notification_box.cached_image_path)):
-                try:
-                    os.remove(
-                        oldest_container.notification_box.cached_image_path)
-                    logger.info(
-                        f"Deleted cached image of oldest notification due to history limit: {oldest_container.notification_box.cached_image_path}"
-                    )
-                except Exception as e:
-                    logger.error(
-                        f"Error deleting cached image of oldest notification: {e}"
-                    )
-            oldest_container.destroy()
-
-        container = Box(
-            name="notification-container",
-            orientation="v",
-            h_align="fill",
-            h_expand=True,
-        )
-
-        def on_container_destroy(container, notification_box):
-            if (hasattr(container, "_timestamp_timer_id") and
-                    container._timestamp_timer_id):
-                GLib.source_remove(container._timestamp_timer_id)
-            self.delete_historical_notification(notification_box.uuid,
-                                                container)
-            self.rebuild_with_separators()
-
-        container.arrival_time = datetime.now()
-
-        def compute_time_label(arrival_time):
-            return arrival_time.strftime("%H:%M")
-
-        self.current_time_label = Label(
-            name="notification-timestamp",
-            markup=compute_time_label(container.arrival_time),
-        )
-        pixbuf = load_scaled_pixbuf(notification_box, 48, 48)
-        self.current_notif_image_box = Box(
-            name="notification-image",
-            orientation="v",
-            children=[
-                Image(pixbuf=pixbuf),
-                Box(v_expand=True, v_align="fill"),
-            ],
-        )
-        self.current_notif_summary_label = Label(
-            name="notification-summary",
-            markup=notification_box.notification.summary,
-            h_align="start",
-            ellipsization="end",
+        record = HistoryRecord(
+            id=notification_box.uuid,
+            app_icon=notification.app_icon,
+            summary=notification.summary,
+            body=notification.body,
+            app_name=app_name,
+            timestamp=datetime.now().isoformat(),
+            cached_image_path=notification_box.cached_image_path,
+            notification_id=notification.id,
         )
-        self.current_notif_app_name_label = Label(
-            name="notification-app-name",
-            markup=f"{notification_box.notification.app_name}",
-            h_align="start",
-            ellipsization="end",
-        )
-        self.current_notif_body_label = (Label(
-            name="notification-body",
-            markup=notification_box.notification.body,
-            h_align="start",
-            ellipsization="end",
-            line_wrap="word-char",
-        ) if notification_box.notification.body else Box())
-        (self.current_notif_body_label.set_single_line_mode(True)
-         if notification_box.notification.body else None)
-        self.current_notif_summary_box = Box(
-            name="notification-summary-box",
-            orientation="h",
-            children=[
-                self.current_notif_summary_label,
-                Box(
-                    name="notif-sep",
-                    h_expand=False,
-                    v_expand=False,
-                    h_align="center",
-                    v_align="center",
-                ),
-                self.current_notif_app_name_label,
-                Box(
-                    name="notif-sep",
-                    h_expand=False,
-                    v_expand=False,
-                    h_align="center",
-                    v_align="center",
-                ),
-                self.current_time_label,
-            ],
-        )
-        self.current_notif_text_box = Box(
-            name="notification-text",
-            orientation="v",
-            v_align="center",
-            h_expand=True,
-            children=[
-                self.current_notif_summary_box,
-                self.current_notif_body_label,
-            ],
-        )
-        self.current_notif_close_button = Button(
-            name="notif-close-button",
-            child=Label(name="notif-close-label", markup=icons.cancel),
-            on_clicked=lambda *_: on_container_destroy(container,
-                                                       notification_box),
-        )
-        self.current_notif_close_button_box = Box(
-            orientation="v",
-            children=[
-                self.current_notif_close_button,
-                Box(v_expand=True),
-            ],
-        )
-        content_box = Box(
-            name="notification-content",
-            children=[
-                self.current_notif_image_box if pixbuf else Box(h_expand=False),
-                self.current_notif_text_box,
-                self.current_notif_close_button_box,
-            ],
-        )
-        container.notification_box = notification_box
-        hist_box = Box(
-            name="notification-box-hist",
-            orientation="v",
-            h_align="fill",
-            h_expand=True,
-        )
-        hist_box.add(content_box)
-        container.add(hist_box)
-        self.containers.insert(0, container)
-        self.rebuild_with_separators()
-        self._append_persistent_notification(notification_box,
-                                             container.arrival_time)
+        self._insert_record(record)
+        self._append_persistent_notification(record)
+        if notification_box.image_pending:
+            notification_box.when_image_cached(
+                lambda path: self._set_record_image(record, path))
         self.emit("notification-added")
 
-    def _append_persistent_notification(self, notification_box, arrival_time):
-        note = {
-            "id": notification_box.uuid,
-            "app_icon": notification_box.notification.app_icon,
-            "summary": notification_box.notification.summary,
-            "body": notification_box.notification.body,
-            "app_name": notification_box.notification.app_name,
-            "timestamp": arrival_time.isoformat(),
-            "cached_image_path": notification_box.cached_image_path,
-        }
-        self.persistent_notifications.insert(0, note)
-        self.persistent_notifications = self.persistent_notifications[:50]
-        self._save_persistent_history()
-
-    def _cleanup_orphan_cached_images(self):
-        logger.debug("Starting orphan cached image cleanup.")
-        if not os.path.exists(PERSISTENT_DIR):
-            logger.debug("Cache directory does not exist, skipping cleanup.")
+    def _set_record_image(self, record: HistoryRecord, path: str | None) -> None:
+        """Attach an image cached after its notification entered the history."""
+        if path is None or self.records.get(record.id) is not record:
             return
+        record.cached_image_path = path
+        image_cache.acquire(path)
+        try:
+            self.store.set_image(record.id, path)
+        except Exception as e:
+            logger.error(f"Error saving notification image in history: {e}")
+        self.scrolled_window.refresh()
 
-        cached_files = [
-            f for f in os.listdir(PERSISTENT_DIR)
-            if f.startswith("notification_") and f.endswith(".png")
-        ]
-        if not cached_files:
-            logger.debug("No cached image files found, skipping cleanup.")
+    def _append_persistent_notification(self, record: HistoryRecord) -> None:
+        try:
+            evicted = self.store.add(record.to_note())
+        except Exception as e:
+            logger.error(f"Error saving persistent history: {e}")
             return
+        # The oldest notifications are dropped by the store past the history size
+        for evicted_note in evicted:
+            evicted_record = self.records.get(str(evicted_note.get("id")))
+            if evicted_record is not None:
+                self._remove_record(evicted_record)
 
-        history_uuids = {
-            note.get("id")
-            for note in self.persistent_notifications
-            if note.get("id")
-        }
-        deleted_count = 0
-        for cached_file in cached_files:
-            try:
-                uuid_from_filename = cached_file[len("notification_"
-                                                    ):-len(".png")]
-                if uuid_from_filename not in history_uuids:
-                    cache_file_path = os.path.join(PERSISTENT_DIR, cached_file)
-                    os.remove(cache_file_path)
-                    logger.info(
-                        f"Deleted orphan cached image: {cache_file_path}")
-                    deleted_count += 1
-                else:
-                    logger.debug(
-                        f"Cached image {cached_file} found in history, keeping it."
-                    )
-            except Exception as e:
-                logger.error(
-                    f"Error processing cached file {cached_file} during cleanup: {e}"
-                )
+    def clear_history_for_app(self, app_name):
+        """Clears all notifications in history for a specific app."""
+        try:
+            deleted = self.store.delete_app(app_name)
+        except Exception as e:
+            logger.error(
+                f"Error deleting {app_name} from persistent history: {e}")
+            return
 
-        if deleted_count > 0:
+        for note in deleted:
+            record = self.records.get(str(note.get("id")))
+            if record is not None:
+                self._remove_record(record)
             logger.info(
-                f"Orphan cached image cleanup finished. Deleted {deleted_count} images."
+                f"Removed replaced history notification {note.get('id')} of {app_name}"
             )
-        else:
-            logger.info(
-                "Orphan cached image cleanup finished. No orphan images found.")
-
-    def clear_history_for_app(self, app_name):
-        """Clears all notifications in history for a specific app."""
-        containers_to_remove = []
-        persistent_notes_to_remove_ids = set()
-        for container in list(self.containers):
-            if (hasattr(container, "notification_box") and
-                    container.notification_box.notification.app_name
-                    == app_name):
-                containers_to_remove.append(container)
-                persistent_notes_to_remove_ids.add(
-                    container.notification_box.uuid)
-
-        for container in containers_to_remove:
-            if (hasattr(container, "notification_box") and
-                    hasattr(container.notification_box, "cached_image_path") and
-                    container.notification_box.cached_image_path and
-                    os.path.exists(
-                        container.notification_box.cached_image_path)):
-                try:
-                    os.remove(container.notification_box.cached_image_path)
-                    logger.info(
-                        f"Deleted cached image of replaced history notification: {container.notification_box.cached_image_path}"
-                    )
-                except Exception as e:
-                    logger.error(
-                        f"Error deleting cached image of replaced history notification: {e}"
-                    )
-            self.containers.remove(container)
-            self.notifications_list.remove(container)
-            container.notification_box.destroy(from_history_delete=True)
-            container.destroy()
-
-        self.persistent_notifications = [
-            note for note in self.persistent_notifications
-            if note.get("id") not in persistent_notes_to_remove_ids
-        ]
-        self._save_persistent_history()
-        self.rebuild_with_separators()
 
 
 class NotificationHistoryIndicator(Button):
@@ -1143,14 +929,14 @@ class NotificationHistoryIndicator(Button):
         self.add(self.icon)
 
         # Track notification count
-        self.notification_count = len(
-            self.notification_history.persistent_notifications)
+        self.notification_count = (
+            self.notification_history.get_notification_count())
         self.update_counter()
 
     def on_notification_history_event(self, signal_name: str, *args) -> None:
         """Handle notification history events with proper count management."""
-        self.notification_count = len(
-            self.notification_history.persistent_notifications)
+        self.notification_count = (
+            self.notification_history.get_notification_count())
         match signal_name:
             case "notification-added":
                 self.update_counter()
@@ -1196,7 +982,6 @@ class NotificationHistoryIndicator(Button):
 
 class NotificationContainer(Box):
     """Main container for displaying notifications."""
-    LIMITED_APPS = ["Spotify"]
 
     def __init__(
         self,
@@ -1241,26 +1026,66 @@ class NotificationContainer(Box):
         self.notifications = []
         self._destroyed_notifications = set()
         self.visible_notifications = []
+        self._boxes_by_key = {}
+        self.throttle = NotificationThrottle(
+            burst=config.get('NOTIFICATION', 'RATE_LIMIT', 'BURST'),
+            rate=config.get('NOTIFICATION', 'RATE_LIMIT', 'PER_SECOND'),
+            coalesce_window=config.get('NOTIFICATION', 'COALESCE_WINDOW'),
+            replace_apps=config.get('NOTIFICATION', 'REPLACE_APPS'),
+        )
 
     def on_new_notification(self, fabric_notif, id: str, *args) -> None:
         """Handle new notification from the server."""
         notification_history_instance = self.notification_history
+        notification = fabric_notif.get_notification_from_id(id)
+        app_name = notification.app_name
+        synchronous_hint = notification.do_get_hint_entry(
+            "x-canonical-private-synchronous")
+        key = self.throttle.replace_key(
+            app_name, notification.summary,
+            str(synchronous_hint) if synchronous_hint else None)
+        repeat = self.throttle.is_repeat(
+            key, f"{notification.summary}\n{notification.body}")
+
         if notification_history_instance.do_not_disturb_enabled:
+            if repeat or not self.throttle.allow(app_name):
+                logger.debug(
+                    f"Dropping notification {notification.id} of {app_name} (repeated or rate limited)"
+                )
+                notification.close("expired")
+                return
             logger.info(
                 "Do Not Disturb mode enabled: adding notification directly to history."
             )
-            notification = fabric_notif.get_notification_from_id(id)
             new_box = NotificationBox(
                 notification,
                 timeout_ms=notification.timeout,
             )
-            if notification.image_pixbuf:
-                cache_notification_pixbuf(new_box)
+            notification_history_instance.add_notification(
+                new_box, replace=app_name in self.throttle.replace_apps)
+            new_box.destroy()
+            return
 
-            notification_history_instance.add_notification(new_box)
+        # An identical notification is already displayed, only bump its counter
+        existing_box = self._boxes_by_key.get(key)
+        if existing_box not in self.notifications:
+            existing_box = None
+        if existing_box is not None and repeat:
+            existing_box.increment_count()
+            notification.close("expired")
+            return
+
+        # Past its rate, an app's notifications are collapsed into its last one
+        if not self.throttle.allow(app_name):
+            latest_box = next((box for box in reversed(self.notifications)
+                               if box.notification.app_name == app_name), None)
+            if latest_box is not None:
+                latest_box.increment_count()
+            logger.debug(
+                f"Rate limiting notification {notification.id} of {app_name}")
+            notification.close("expired")
             return
 
-        notification = fabric_notif.get_notification_from_id(id)
         new_box = NotificationBox(
             notification,
             timeout_ms=notification.timeout,
@@ -1268,25 +1093,15 @@ class NotificationContainer(Box):
         new_box.set_container(self)
         notification.connect("closed", self.on_notification_closed)
 
-        app_name = notification.app_name
-        if app_name in self.LIMITED_APPS:
-            notification_history_instance.clear_history_for_app(app_name)
-
-            # Remove existing notification for this LIMITED_APP if present
-            existing_notification_index = -1
-            for index, existing_box in enumerate(self.notifications):
-                if existing_box.notification.app_name == app_name:
-                    existing_notification_index = index
-                    break
-
-            if existing_notification_index != -1:
-                old_notification_box = self.notifications.pop(
-                    existing_notification_index)
-                if old_notification_box in self.visible_notifications:
-                    self.visible_notifications.remove(old_notification_box)
-                    self._animate_notification_removal(old_notification_box)
-                else:
-                    old_notification_box.destroy()
+        # Replace the notification displayed for the same key, if any
+        if existing_box is not None:
+            self.notifications.remove(existing_box)
+            if existing_box in self.visible_notifications:
+                self.visible_notifications.remove(existing_box)
+                self._animate_notification_removal(existing_box)
+            else:
+                existing_box.destroy()
+        self._boxes_by_key[key] = new_box
 
         # Add the new notification
         self.notifications.append(new_box)
@@ -1377,17 +1192,11 @@ class NotificationContainer(Box):
 
                 # Don't add dismissed notifications to history
                 # And make sure they're not in history already (could have been added by another process)
-                notification_id = notification.id
-                for container in list(notification_history_instance.containers):
-                    if (hasattr(container, 'notification_box') and hasattr(
-                            container.notification_box, 'notification') and
-                            hasattr(container.notification_box.notification,
-                                    'id') and
-                            str(container.notification_box.notification.id)
-                            == str(notification_id)):
-                        notification_history_instance.delete_historical_notification(
-                            notification_id, container)
-                        break
+                record = notification_history_instance.find_record(
+                    notification.id)
+                if record is not None:
+                    notification_history_instance.delete_historical_notification(
+                        record.id)
 
             elif (reason_str == "NotificationCloseReason.EXPIRED"):
                 logger.info(
@@ -1405,7 +1214,13 @@ class NotificationContainer(Box):
 
                 # Add the notification to history
                 if not transient:
-                    notification_history_instance.add_notification(notif_box)
+                    notification_history_instance.add_notification(
+                        notif_box,
+                        replace=notification.app_name in
+                        self.throttle.replace_apps)
+                # A queued popup that was never shown isn't animated out
+                if notif_box.get_parent() is None:
+                    notif_box.destroy()
 
             elif (reason_str == "NotificationCloseReason.CLOSED" or
                   reason_str == "NotificationCloseReason.UNDEFINED"):
@@ -1450,8 +1265,14 @@ class NotificationContainer(Box):
     def _destroy_container(self) -> bool:
         """Clean up the notification container."""
         try:
+            # Queued popups that arrived while hiding were never shown
+            for notification_box in self.notifications:
+                if notification_box.get_parent() is None:
+                    notification_box.destroy()
             self.notifications.clear()
             self._destroyed_notifications.clear()
+            self._boxes_by_key.clear()
+            self.throttle.prune()
             for child in self.notifications_box.get_children():
                 self.notifications_box.remove(child)
                 child.destroy()
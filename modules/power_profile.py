@@ -1,11 +1,9 @@
-from fabric.core.fabricator import Fabricator
-from fabric.utils import exec_shell_command, exec_shell_command_async
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.label import Label
-from gi.repository import GLib  # type: ignore
 
 import modules.icons as icons
+from services.hub import hub
 
 
 class PowerProfile(Box):
@@ -27,12 +25,12 @@ class PowerProfile(Box):
                 "icon": icons.balanced
             },
             {
-                "name": "throughput-performance",
+                "name": "performance",
                 "label": "Performance",
                 "icon": icons.performance,
             },
             {
-                "name": "powersave",
+                "name": "power-saver",
                 "label": "Eco",
                 "icon": icons.eco
             },
@@ -75,31 +73,33 @@ class PowerProfile(Box):
         )
         self.add(self.button)
 
-        self.power_profile_fabricator = Fabricator(
-            poll_from=lambda v: self.get_profile(),
-            on_changed=lambda f, v: self.update_ui,
-            interval=1000,
-            stream=False,
-            default_value=0,
-        )
-        self.power_profile_fabricator.connect("changed", self.update_ui)
-        GLib.idle_add(self.update_ui, None, self.get_profile())
+        self.service = hub.get("power_profile")
+        hub.subscribe("power_profile",
+                      "changed",
+                      lambda _, name: self.on_profile_changed(name),
+                      owner=self)
+        self.update_ui()
+        self.on_profile_changed(self.service.get_profile())
 
     def update_ui(self, *args: object) -> None:
         """Update the UI to reflect the current power profile."""
         self.profile_icon.set_markup(self.active_profile["icon"])
         self.profile_name.set_label(self.active_profile["label"])
+        for profile in self.profiles:
+            self.remove_style_class(profile["name"])
         self.add_style_class(self.active_profile["name"])
 
-    def get_profile(self) -> str | None:
-        res = exec_shell_command("tuned-adm active")
-        if res:
-            profile_name = res.split(":")[1].strip()
-            for profile in self.profiles:
-                if profile["name"] == profile_name:
+    def on_profile_changed(self, profile_name: str | None) -> None:
+        """Reflect the profile reported by the power profile daemon"""
+        for profile in self.profiles:
+            if profile["name"] == profile_name:
+                if profile is not self.active_profile:
                     self.active_profile = profile
-                    return profile_name
-        return None  # Return None if no profile matches or command fails
+                    self.update_ui()
+                return
+
+    def get_profile(self) -> str | None:
+        return self.service.get_profile()
 
     def rotate_profile(self) -> None:
         """Rotate through the available power profiles."""
@@ -110,8 +110,5 @@ class PowerProfile(Box):
         # Update the UI to reflect the new profile
         self.update_ui()
 
-        # Apply the new profile using tuned-adm
-        exec_shell_command_async(
-            f"tuned-adm profile {self.active_profile['name']}",
-            lambda _: None,
-        )
+        # Apply the new profile through the power profile daemon
+        self.service.set_profile(self.active_profile["name"])
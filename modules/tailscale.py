@@ -1,10 +1,9 @@
-from fabric.core.fabricator import Fabricator
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.label import Label
 
 import modules.icons as icons
-from services.tailscale import TailscaleProvider
+from services.hub import hub
 
 
 class Tailscale(Button):
@@ -44,16 +43,9 @@ class Tailscale(Button):
                 ],
                 orientation="h",
             ))
-        self.provider = TailscaleProvider()
-        self.tailscale_fabricator = Fabricator(
-            poll_from=lambda v: self.provider.get_status(),
-            on_changed=lambda f, v: self._update_ui,
-            interval=1000,
-            stream=False,
-            default_value=0,
-        )
-        self.tailscale_fabricator.connect("changed", self._update_ui)
-        self._update_ui(self, self.status)
+        self.provider = hub.get("tailscale")
+        hub.subscribe("tailscale", "changed", self._update_ui, owner=self)
+        self._update_ui(self, self.provider.get_status())
 
     def _update_ui(self, sender, status: str) -> None:
         """Update the UI to reflect the current power profile."""
@@ -2,15 +2,14 @@ import calendar
 import time
 from datetime import datetime
 
-from fabric.core.service import Property
-from fabric.utils.helpers import invoke_repeater
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.label import Label
-from gi.repository import Gdk, GLib, Gtk  # type: ignore
+from gi.repository import Gdk, Gtk  # type: ignore
 
 import modules.icons as icons
 from services.config import config
+from services.hub import hub
 
 
 class CalendarBox(Box):
@@ -167,26 +166,9 @@ class CalendarBox(Box):
 
 
 class Time(Button):
-    """A button that displays the current time and date, updating at a set interval."""
-
-    @Property(int, "read-write")
-    def interval(self):  # type: ignore
-        return self._interval
-
-    @interval.setter
-    def interval(self, value: int):
-        self._interval = value
-        if self._repeater_id:
-            GLib.source_remove(self._repeater_id)
-        self._repeater_id = invoke_repeater(self._interval, self.do_update_time)
-        self.do_update_time()
-        return
+    """A button that displays the current time and date, updating on every tick of the shared clock."""
 
-    def __init__(
-        self,
-        interval: int = 1000,
-        **kwargs,
-    ):
+    def __init__(self, **kwargs):
         super().__init__(
             style_classes=[
                 "bar-item",
@@ -224,9 +206,9 @@ class Time(Button):
             ))
 
         self.add_events(Gdk.EventMask.SCROLL_MASK)
-        self._interval: int = interval
-        self._repeater_id: int | None = None
-        self.interval = interval
+        hub.subscribe("clock", "tick", lambda *_: self.do_update_time(),
+                      owner=self)
+        self.do_update_time()
 
     def set_button_label(self) -> None:
         """Set the button label to the current time and date."""
@@ -0,0 +1,179 @@
+import bisect
+import itertools
+from typing import Any, Callable, Hashable
+
+from fabric.widgets.box import Box
+from fabric.widgets.scrolledwindow import ScrolledWindow
+from gi.repository import GLib, Gtk  # type: ignore
+
+# Height used for the rows of a kind until one of them has been measured
+ESTIMATED_ROW_HEIGHT = 48
+
+
+class VirtualList(ScrolledWindow):
+    """
+    Scrolled list only instantiating the rows in (or close to) the viewport.
+
+    The list is bound to a sequence of lightweight items. Rows are created per kind
+    of item, bound to an item while it is visible and recycled for another item of
+    the same kind once it is scrolled out, so the widget count stays proportional
+    to the viewport height instead of the number of items. The space of the items
+    out of the viewport is filled by two spacers, sized from the measured height of
+    every kind of row.
+    """
+
+    def __init__(self,
+                 create_row: Callable[[Hashable], Gtk.Widget],
+                 bind_row: Callable[[Gtk.Widget, Any], None],
+                 kind_of: Callable[[Any], Hashable],
+                 overscan: int = 4,
+                 **kwargs):
+        """
+        Parameters:
+          create_row (callable): Build a new row for a kind of item
+          bind_row (callable): Display an item in a row of its kind
+          kind_of (callable): Return the kind of an item, rows of a kind share the same height
+          overscan (int): Number of rows kept bound above and below the viewport
+        """
+        super().__init__(**kwargs)
+        self._create_row = create_row
+        self._bind_row = bind_row
+        self._kind_of = kind_of
+        self.overscan = overscan
+
+        self._items: list = []
+        self._offsets: list[int] = [0]
+        self._offsets_dirty = False
+        self._heights: dict[Hashable, int] = {}
+        self._free_rows: dict[Hashable, list[Gtk.Widget]] = {}
+        # Visible rows, keyed by the identity of their item
+        self._bound_rows: dict[int, tuple[Any, Gtk.Widget]] = {}
+        self._update_handler: int | None = None
+
+        self._top_spacer = Box()
+        self._bottom_spacer = Box()
+        self._content = Box(
+            orientation="v",
+            h_expand=True,
+            v_expand=True,
+            h_align="fill",
+            v_align="start",
+            children=[self._top_spacer, self._bottom_spacer],
+        )
+        self.add_with_viewport(self._content)
+
+        adjustment = self.get_vadjustment()
+        # Scrolling rebinds the rows right away, so the next frame has no blank space
+        adjustment.connect("value-changed", lambda *_: self._update())
+        adjustment.connect("changed", lambda *_: self._schedule_update())
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index: int) -> Any:
+        return self._items[index]
+
+    def set_items(self, items: list) -> None:
+        """Replace every item of the list"""
+        self._items = list(items)
+        self._invalidate()
+
+    def insert(self, index: int, item: Any) -> None:
+        self._items.insert(index, item)
+        self._invalidate()
+
+    def remove(self, index: int) -> Any:
+        item = self._items.pop(index)
+        self._invalidate()
+        return item
+
+    def refresh(self) -> None:
+        """Rebind the visible rows, for when the displayed items changed in place"""
+        for item, row in self._bound_rows.values():
+            self._bind_row(row, item)
+
+    def _invalidate(self) -> None:
+        self._offsets_dirty = True
+        self._schedule_update()
+
+    def _schedule_update(self) -> None:
+        """Update the rows once per burst of changes, before the next frame is drawn"""
+        if self._update_handler is None:
+            self._update_handler = GLib.idle_add(
+                self._on_update_idle, priority=GLib.PRIORITY_HIGH_IDLE)
+
+    def _on_update_idle(self) -> bool:
+        self._update_handler = None
+        self._update()
+        return False
+
+    def _compute_offsets(self) -> None:
+        heights = (self._heights.get(self._kind_of(item), ESTIMATED_ROW_HEIGHT)
+                   for item in self._items)
+        self._offsets = list(itertools.accumulate(heights, initial=0))
+        self._offsets_dirty = False
+
+    def _visible_range(self) -> tuple[int, int]:
+        adjustment = self.get_vadjustment()
+        top = adjustment.get_value()
+        # Before the first allocation there is no page size, bind a few rows anyway
+        bottom = top + (adjustment.get_page_size() or
+                        ESTIMATED_ROW_HEIGHT * self.overscan)
+        first = max(bisect.bisect_right(self._offsets, top) - 1, 0)
+        last = bisect.bisect_left(self._offsets, bottom)
+        return (max(first - self.overscan, 0),
+                min(last + self.overscan, len(self._items)))
+
+    def _acquire_row(self, kind: Hashable) -> Gtk.Widget:
+        free_rows = self._free_rows.setdefault(kind, [])
+        if free_rows:
+            row = free_rows.pop()
+        else:
+            row = self._create_row(kind)
+            row.kind = kind
+            self._content.add(row)
+            row.show_all()
+        row.set_visible(True)
+        return row
+
+    def _release_row(self, row: Gtk.Widget) -> None:
+        # Free rows stay in the box, hidden, to avoid re-parenting them
+        row.set_visible(False)
+        self._free_rows[row.kind].append(row)
+
+    def _update(self) -> None:
+        if self._offsets_dirty:
+            self._compute_offsets()
+        first, last = self._visible_range()
+        window = self._items[first:last]
+        window_ids = {id(item) for item in window}
+
+        for key in [key for key in self._bound_rows if key not in window_ids]:
+            self._release_row(self._bound_rows.pop(key)[1])
+
+        measured = False
+        for position, item in enumerate(window, start=1):
+            bound = self._bound_rows.get(id(item))
+            if bound is None:
+                kind = self._kind_of(item)
+                row = self._acquire_row(kind)
+                self._bind_row(row, item)
+                self._bound_rows[id(item)] = (item, row)
+                # Rows of a kind share the height of the first one measured
+                height = row.get_preferred_height()[1]
+                if height > 0 and self._heights.get(kind) != height:
+                    self._heights[kind] = height
+                    measured = True
+            else:
+                row = bound[1]
+            self._content.reorder_child(row, position)
+        self._content.reorder_child(self._bottom_spacer, len(window) + 1)
+
+        if measured:
+            self._compute_offsets()
+        self._top_spacer.set_size_request(-1, self._offsets[first])
+        self._bottom_spacer.set_size_request(
+            -1, self._offsets[-1] - self._offsets[last])
+        if measured:
+            # The measured heights move the rows, check the viewport is still covered
+            self._schedule_update()
@@ -1,7 +1,6 @@
 import os
-import threading
+from collections.abc import Iterator
 
-from fabric.utils import exec_shell_command_async
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.entry import Entry
@@ -10,8 +9,82 @@ from fabric.widgets.label import Label
 from fabric.widgets.scrolledwindow import ScrolledWindow
 from gi.repository import Gdk, GdkPixbuf, Gio, GLib, Gtk  # type: ignore
 
+from services.config import config
 from services.interfaces import NotchWidgetInterface
 from services.logger import logger
+from services.palettes import palette_cache
+from services.pixbuf_cache import PixbufCache
+from services.search_scheduler import SearchScheduler
+from services.thumbnail_loader import ThumbnailLoader
+from services.thumbnails import scale_to_fit, thumbnail_cache
+
+PREVIEW_WIDTH = 240
+PREVIEW_HEIGHT = 135
+# Upper bound of the memory taken by a preview (RGBA)
+PREVIEW_BYTES = PREVIEW_WIDTH * PREVIEW_HEIGHT * 4
+ESTIMATED_TILE_HEIGHT = 300
+WALLPAPER_EXTENSIONS = (".jpg", ".png", ".jpeg", ".webp")
+# Directory events within this delay are applied at once (e.g. copying a folder)
+MONITOR_DEBOUNCE = 300  # in milliseconds
+
+
+class WallpaperTile(Button):
+    """Grid tile of a wallpaper, kept as long as its file exists"""
+
+    def __init__(self, path: str, filename: str, **kwargs):
+        self.path = path
+        self.filename = filename
+        self.search_key = filename.lower()
+        self.has_preview = False
+
+        image_width = 330
+        image_height = image_width * 3 // 4  # 16:9 aspect ratio
+
+        # Shown until the preview is loaded (gray rectangle)
+        self.placeholder = Gtk.Box()
+        self.placeholder.set_size_request(image_width, image_height)
+        self.placeholder.get_style_context().add_class("wallpaper-placeholder")
+
+        self.image = Image(style_classes=["wallpaper-button-image"])
+        self.image.set_no_show_all(True)
+        self.image.hide()
+
+        super().__init__(
+            child=Box(
+                children=[
+                    self.placeholder,
+                    self.image,
+                    Label(
+                        label=filename,
+                        name="wallpaper-button-label",
+                        h_align="center",
+                        v_align="center",
+                    ),
+                ],
+                spacing=8,
+                orientation="v",
+                h_align="fill",
+                v_align="fill",
+            ),
+            style_classes=["wallpaper-button"],
+            **kwargs,
+        )
+        self.show_all()
+        # Visibility is driven by the search, not by show_all on the parents
+        self.set_no_show_all(True)
+
+    def set_preview(self, pixbuf: GdkPixbuf.Pixbuf) -> None:
+        self.image.set_from_pixbuf(pixbuf)
+        self.placeholder.hide()
+        self.image.show()
+        self.has_preview = True
+
+    def clear_preview(self) -> None:
+        """Show the placeholder again, e.g. when the file was replaced"""
+        self.image.clear()
+        self.image.hide()
+        self.placeholder.show()
+        self.has_preview = False
 
 
 class WallpaperManager(Box, NotchWidgetInterface):
@@ -30,9 +103,28 @@ class WallpaperManager(Box, NotchWidgetInterface):
 
         self.columns = 2
         self.wallpaper_location = os.path.expanduser("~/Pictures/wallpapers")
-        self.image_cache = {}
-        self.loaded_images = set()
-        self.load_thread_active = False
+        # Decoded previews, bounded in memory
+        self.preview_cache = PixbufCache(
+            config.get("NOTCH", "PAGES", "WALLPAPER", "PREVIEW_CACHE_MB") *
+            1024 * 1024,
+            on_evict=self._on_preview_evicted)
+        # Tiles are created once per file, searches only move and hide them
+        self.tiles: dict[str, WallpaperTile] = {}
+        self._sorted_tiles: list[WallpaperTile] = []
+        self._shown_tiles: list[WallpaperTile] = []
+        self._changed_paths: set[str] = set()
+        self._monitor_id: int | None = None
+        # Previews are decoded in parallel, the tiles in the viewport first
+        self.thumbnail_loader = ThumbnailLoader(self._load_preview,
+                                                self._on_previews_loaded)
+        self._reprioritize_id: int | None = None
+        self.search_scheduler = SearchScheduler(
+            search=self._search_wallpapers,
+            render=self._render_wallpaper,
+            begin=self._begin_refresh,
+            finish=self._finish_refresh,
+            first_batch=self.columns * 3,
+        )
 
         if not os.path.exists(self.wallpaper_location):
             os.makedirs(self.wallpaper_location)
@@ -44,6 +136,13 @@ class WallpaperManager(Box, NotchWidgetInterface):
             column_spacing=12,
             row_spacing=12,
         )
+        self.empty_label = Label(
+            name="no-wallpapers-label",
+            h_align="center",
+            v_align="center",
+        )
+        self.empty_label.set_no_show_all(True)
+        self.buttons_grid.attach(self.empty_label, 0, 0, self.columns, 1)
         self.scrollable_area = ScrolledWindow(
             name="notch-scrolled-window",
             spacing=10,
@@ -64,9 +163,17 @@ class WallpaperManager(Box, NotchWidgetInterface):
             name="search-entry",
         )
         self.entry.props.xalign = 0.5  # type: ignore
+        self.scrollable_area.get_vadjustment().connect(
+            "value-changed", lambda *_: self._schedule_reprioritize())
         self.add(self.entry)
         self.add(self.scrollable_area)
 
+        for path, filename in self._list_wallpapers():
+            self._add_tile(path, filename)
+        self._sort_tiles()
+        if config.get("NOTCH", "PAGES", "WALLPAPER", "PRECOMPUTE_PALETTES"):
+            palette_cache.precompute(self.tiles)
+        self.show_all()
         self._refresh_wallpapers()
         self.setup_file_monitor()
         self.connect("key-press-event", self.on_key_press)
@@ -82,7 +189,7 @@ class WallpaperManager(Box, NotchWidgetInterface):
     def notify_text(self, entry: Entry, *args: object) -> None:
         """Handle text changes in the search entry"""
         text = entry.get_text()
-        self._refresh_wallpapers(text)
+        self.search_scheduler.submit(text)
 
     def on_key_press(self, widget: Entry, event: Gdk.EventKey) -> bool:
         """Handle keyboard navigation"""
@@ -101,169 +208,189 @@ class WallpaperManager(Box, NotchWidgetInterface):
         gfile = Gio.File.new_for_path(self.wallpaper_location)
         self.file_monitor = gfile.monitor_directory(Gio.FileMonitorFlags.NONE,
                                                     None)
-        self.file_monitor.connect("changed",
-                                  lambda *_: self._refresh_wallpapers())
+        self.file_monitor.connect("changed", self._on_directory_changed)
+
+    def _on_directory_changed(self, monitor: Gio.FileMonitor, file: Gio.File,
+                              other_file: Gio.File | None,
+                              event: Gio.FileMonitorEvent) -> None:
+        """Collect the changed paths, applied once the directory is quiet"""
+        for changed in (file, other_file):
+            path = changed.get_path() if changed is not None else None
+            if path is not None:
+                self._changed_paths.add(path)
+        if self._monitor_id is not None:
+            GLib.source_remove(self._monitor_id)
+        self._monitor_id = GLib.timeout_add(MONITOR_DEBOUNCE,
+                                            self._apply_directory_changes)
+
+    def _apply_directory_changes(self) -> bool:
+        """Add, remove or reload only the tiles of the changed files"""
+        self._monitor_id = None
+        changed_paths, self._changed_paths = self._changed_paths, set()
+        added = False
+        for path in changed_paths:
+            directory, filename = os.path.split(path)
+            if directory != self.wallpaper_location:
+                continue
+            tile = self.tiles.get(path)
+            if os.path.isfile(path) and filename.endswith(
+                    WALLPAPER_EXTENSIONS):
+                if tile is None:
+                    self._add_tile(path, filename)
+                    added = True
+                    if config.get("NOTCH", "PAGES", "WALLPAPER",
+                                  "PRECOMPUTE_PALETTES"):
+                        palette_cache.precompute([path])
+                else:
+                    # Modified or replaced, its preview is outdated
+                    self.preview_cache.discard(path)
+                    tile.clear_preview()
+            elif tile is not None:
+                self._remove_tile(tile)
+        if added:
+            self._sort_tiles()
+        self._refresh_wallpapers(self.entry.get_text())
+        return False
+
+    def _add_tile(self, path: str, filename: str) -> None:
+        tile = WallpaperTile(path,
+                             filename,
+                             on_clicked=lambda *_: self.set_wallpaper(path))
+        tile.hide()
+        self.tiles[path] = tile
+        self.buttons_grid.attach(tile, 0, 0, 1, 1)
+
+    def _remove_tile(self, tile: WallpaperTile) -> None:
+        del self.tiles[tile.path]
+        self._sorted_tiles.remove(tile)
+        if tile in self._shown_tiles:
+            self._shown_tiles.remove(tile)
+        self.preview_cache.discard(tile.path)
+        tile.destroy()
+
+    def _sort_tiles(self) -> None:
+        self._sorted_tiles = sorted(self.tiles.values(),
+                                    key=lambda tile: tile.search_key)
 
     def _refresh_wallpapers(self, search: str = "") -> None:
         """
-        Refresh the list of wallpapers and update the buttons.
+        Show the tiles matching the search, in grid order.
         """
-        # Remove existing children
-        for child in self.buttons_grid.get_children():
-            self.buttons_grid.remove(child)
-
-        wallpapers = self._list_wallpapers()
-        if not wallpapers:
+        self.search_scheduler.run(search)
+
+    def _search_wallpapers(self, search: str) -> Iterator[WallpaperTile]:
+        """Yield the tiles whose file name matches the search"""
+        search = search.lower()
+        return (tile for tile in self._sorted_tiles
+                if not search or search in tile.search_key)
+
+    def _begin_refresh(self, search: str) -> None:
+        for tile in self._shown_tiles:
+            tile.hide()
+        self._shown_tiles = []
+        self.empty_label.hide()
+
+    def _render_wallpaper(self, tile: WallpaperTile) -> None:
+        position = len(self._shown_tiles)
+        self.buttons_grid.child_set_property(tile, "left-attach",
+                                             position % self.columns)
+        self.buttons_grid.child_set_property(tile, "top-attach",
+                                             position // self.columns)
+        tile.show()
+        self._shown_tiles.append(tile)
+
+    def _finish_refresh(self, search: str) -> None:
+        if not self._shown_tiles:
             # Add a message when no wallpapers are found
-            label = Label(
-                name="no-wallpapers-label",
-                text=f"No wallpapers found in {self.wallpaper_location}",
-                h_align="center",
-                v_align="center",
-            )
-            self.buttons_grid.attach(label, 0, 0, self.columns, 1)
-        else:
-            # Create all buttons with placeholder images first
-            grid_position = 0  # Separate counter for grid positions
-            filtered_wallpapers = []
-
-            for abs_path, filename in wallpapers:
-                # Filter wallpapers based on search text
-                if search and search.lower() not in filename.lower():
-                    continue
-
-                # Add wallpaper to grid using the grid_position counter
-                row = grid_position // self.columns
-                col = grid_position % self.columns
-                self._add_wallpaper_button_placeholder(abs_path, filename, col,
-                                                       row)
-
-                # Add to filtered list for background loading
-                filtered_wallpapers.append((abs_path, filename))
-
-                # Only increment grid position when we actually add a wallpaper
-                grid_position += 1
-
-            # If no wallpapers match the search
-            if grid_position == 0 and search:
-                label = Label(
-                    name="no-wallpapers-label",
-                    text=f"No wallpapers matching '{search}'",
-                    h_align="center",
-                    v_align="center",
-                )
-                self.buttons_grid.attach(label, 0, 0, self.columns, 1)
-                label.show()
-
-            # Load actual images in the background - only for filtered wallpapers
-            self._load_images_in_background(filtered_wallpapers)
-
-        # Ensure everything is visible
-        self.show_all()
-
-    def _add_wallpaper_button_placeholder(self, path: str, filename: str,
-                                          col: int, row: int) -> None:
-        """Add a wallpaper button with a placeholder image."""
-        image_width = 330
-        image_height = image_width * 3 // 4  # 16:9 aspect ratio
-
-        # Create a placeholder image (gray rectangle)
-        placeholder = Gtk.Box()
-        placeholder.set_size_request(image_width, image_height)
-        placeholder.get_style_context().add_class("wallpaper-placeholder")
-
-        # Create image widget that will be updated later
-        image = Image(style_classes=["wallpaper-button-image"])
-
-        image.path = path
-
-        contents = Box(
-            children=[
-                placeholder,  # Add placeholder first
-                image,  # Add image (hidden initially)
-                Label(
-                    label=filename,
-                    name="wallpaper-button-label",
-                    h_align="center",
-                    v_align="center",
-                ),
-            ],
-            spacing=8,
-            orientation="v",
-            h_align="fill",
-            v_align="fill",
-        )
-
-        # Hide the actual image until it's loaded
-        image.set_no_show_all(True)
-        image.hide()
-
-        button = Button(
-            child=contents,
-            on_clicked=lambda btn, wp=path: self.set_wallpaper(wp),
-            style_classes=["wallpaper-button"],
-        )
-
-        # Use the provided row and column positions
-        self.buttons_grid.attach(button, col, row, 1, 1)
-
-    def _load_images_in_background(self, wallpapers: list) -> None:
-        """Load images in a background thread to avoid UI freezes."""
-        if self.load_thread_active:
-            return
-
-        def load_worker():
-            self.load_thread_active = True
-            for path, filename in wallpapers:
-                # Skip if already cached
-                if path in self.image_cache:
-                    pixbuf = self.image_cache[path]
-                    GLib.idle_add(self._update_image, path, pixbuf)
-                    continue
-
-                try:
-                    # Load and scale the image
-                    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
-                        path, 240, 135, True)
-                    # Cache the pixbuf
-                    self.image_cache[path] = pixbuf
-                    # Update the UI in the main thread
-                    GLib.idle_add(self._update_image, path, pixbuf)
-                except Exception as e:
-                    logger.error(f"Error loading image {path}: {e}")
-
-            self.load_thread_active = False
-
-        # Start the worker thread
-        thread = threading.Thread(target=load_worker)
-        thread.daemon = True
-        thread.start()
-
-    def _update_image(self, path: str, pixbuf: GdkPixbuf.Pixbuf) -> None:
-        """Update the image widget with the loaded pixbuf."""
-        # Mark this image as loaded
-        self.loaded_images.add(path)
-
-        # Find all image widgets with this path
-        for child in self.buttons_grid.get_children():
-            if not isinstance(child, Button):
+            self.empty_label.set_label(
+                f"No wallpapers matching '{search}'" if search else
+                f"No wallpapers found in {self.wallpaper_location}")
+            self.empty_label.show()
+        self._load_images_in_background(self._shown_tiles)
+        logger.debug(f"Wallpaper previews: {self.preview_cache.stats()}")
+
+    def _load_images_in_background(self, tiles: list[WallpaperTile]) -> None:
+        """Show the cached previews right away, load the others on the worker pool"""
+        for tile in tiles:
+            if not tile.has_preview:
+                pixbuf = self.preview_cache.get(tile.path)
+                if pixbuf is not None:
+                    tile.set_preview(pixbuf)
+        # Estimated positions, the moved tiles are not allocated yet
+        self._update_loads(allocated=False)
+        self._schedule_reprioritize()
+
+    def _load_preview(self, path: str) -> GdkPixbuf.Pixbuf | None:
+        """Called from the loader workers"""
+        # Scaled from the shared thumbnail, only decoded in full when it changed
+        thumbnail = thumbnail_cache.get(path)
+        return scale_to_fit(thumbnail, PREVIEW_WIDTH,
+                            PREVIEW_HEIGHT) if thumbnail else None
+
+    def _on_previews_loaded(
+            self, previews: list[tuple[str, GdkPixbuf.Pixbuf | None]]) -> None:
+        for path, pixbuf in previews:
+            if pixbuf is None or path not in self.tiles:
                 continue
+            self.preview_cache.put(path, pixbuf)
+            self._update_image(path, pixbuf)
+
+    def _on_preview_evicted(self, path: str) -> None:
+        # The tile holds the pixbuf too, it is only freed once both let it go
+        tile = self.tiles.get(path)
+        if tile is not None:
+            tile.clear_preview()
+
+    def _schedule_reprioritize(self) -> None:
+        if self._reprioritize_id is None:
+            self._reprioritize_id = GLib.idle_add(self._reprioritize)
+
+    def _reprioritize(self) -> bool:
+        self._reprioritize_id = None
+        self._update_loads()
+        return False
 
-            box = child.get_child()
-
-            for widget in box.get_children():
-                if isinstance(widget, Image) and hasattr(
-                        widget, 'path') and widget.path == path:
-                    # Update the image
-                    widget.set_from_pixbuf(pixbuf)
+    def _tile_distance(self, tile: WallpaperTile, position: int, top: float,
+                       bottom: float, allocated: bool) -> float:
+        """Distance in pixels from a tile to the viewport, 0 when it is in it"""
+        allocation = tile.get_allocation()
+        if allocated and allocation.height > 1:
+            y, height = allocation.y, allocation.height
+        else:
+            y = position // self.columns * ESTIMATED_TILE_HEIGHT
+            height = ESTIMATED_TILE_HEIGHT
+        return max(top - (y + height), y - bottom, 0)
 
-                    # Hide the placeholder and show the actual image
-                    placeholder = box.get_children()[0]
-                    placeholder.hide()
-                    widget.show()
+    def _update_loads(self, allocated: bool = True) -> None:
+        """
+        Load the previews nearest to the viewport, the nearest first, as many as
+        the cache holds: loading more would evict nearer ones.
+        """
+        adjustment = self.scrollable_area.get_vadjustment()
+        top = adjustment.get_value()
+        bottom = top + adjustment.get_page_size()
+        distances = sorted(
+            ((self._tile_distance(tile, position, top, bottom, allocated),
+              position, tile)
+             for position, tile in enumerate(self._shown_tiles)),
+            key=lambda distance: distance[:2])
+        window = distances[:max(self.preview_cache.max_bytes //
+                                PREVIEW_BYTES, 1)]
+        # Farthest first, so the previews off-screen are the first evicted
+        for distance, _, tile in reversed(window):
+            if tile.has_preview:
+                self.preview_cache.touch(tile.path)
+            else:
+                self.thumbnail_loader.request(tile.path, distance)
+        # Tiles filtered out by the search or far from the viewport are not loaded
+        self.thumbnail_loader.retain(tile.path for _, _, tile in window
+                                     if not tile.has_preview)
 
-                    # Exit the loop after finding the matching image
-                    return
+    def _update_image(self, path: str, pixbuf: GdkPixbuf.Pixbuf) -> None:
+        """Update the tile of a wallpaper with its loaded preview."""
+        tile = self.tiles.get(path)
+        if tile is not None:
+            tile.set_preview(pixbuf)
 
     def _list_wallpapers(self) -> list:
         """
@@ -275,7 +402,7 @@ class WallpaperManager(Box, NotchWidgetInterface):
 
         return [(os.path.join(wallpapers_dir, f), f)
                 for f in os.listdir(wallpapers_dir)
-                if f.endswith((".jpg", ".png", ".jpeg", ".webp"))]
+                if f.endswith(WALLPAPER_EXTENSIONS)]
 
     def set_wallpaper(self, path: str) -> None:
         """
@@ -299,6 +426,6 @@ class WallpaperManager(Box, NotchWidgetInterface):
 
             os.symlink(path, current_wall)
 
-            exec_shell_command_async(f'matugen image "{current_wall}"')
+            palette_cache.apply(current_wall)
         except Exception as e:
             logger.error(f"Failed to set wallpaper: {e}")
@@ -1,9 +1,3 @@
-import threading
-
-import requests
-from fabric import Property, Service
-from fabric.core.fabricator import Fabricator
-from fabric.core.service import Property
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.label import Label
@@ -11,68 +5,7 @@ from gi.repository import GLib  # type: ignore
 
 import modules.icons as icons
 from services.config import config
-from services.logger import logger
-
-
-class Weather:
-    """Class to represent weather data with icon and temperature."""
-
-    def __init__(self, icon=None, temperature=None):
-        self.icon = icon
-        self.temperature = temperature
-
-    def get_weather(self):
-        return {"icon": self.icon, "temperature": self.temperature}
-
-    def set_weather(self, icon, temperature):
-        self.icon = icon
-        self.temperature = temperature
-
-    def __str__(self):
-        return f"Weather(icon={self.icon}, temperature={self.temperature})"
-
-
-class WeatherWorker(Service):
-    """Service to fetch and update weather data."""
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self._weather = Weather()
-        self.update_thread_active = False
-
-    @Property(Weather, "read-write")
-    def weather(self):
-        return self._weather
-
-    def update_weather(self) -> None:
-        """Fetch weather data from an external API and update the weather property."""
-        if self.update_thread_active:
-            return
-
-        def worker():
-            self.update_thread_active = True
-            uri = "https://wttr.in/?format=%c+%t"
-            res = requests.get(uri)
-            if not res.ok:
-                logger.error(f"Failed to fetch weather data: {res.status_code}")
-                self._weather.set_weather(icon=None, temperature=None)
-                self.update_thread_active = False
-                return
-            elements_list = [el for el in res.text.split(" ") if el != ""]
-            if (not all(isinstance(item, str) for item in elements_list) or
-                    len(elements_list) != 2):
-                logger.error("Weather data format is incorrect.")
-                self._weather.set_weather(icon=None, temperature=None)
-            else:
-                self._weather.set_weather(icon=elements_list[0],
-                                          temperature=elements_list[1].replace(
-                                              "+", ""))
-                logger.info(f"Weather updated: {self._weather}")
-            self.update_thread_active = False
-
-        thread = threading.Thread(target=worker)
-        thread.daemon = True
-        thread.start()
+from services.hub import hub
 
 
 class WeatherButton(Button):
@@ -88,7 +21,7 @@ class WeatherButton(Button):
             ],
             **kwargs,
         )
-        self.weather_worker = WeatherWorker()
+        self.weather_worker = hub.get("weather")
         self.main_container = Box(
             orientation="h"
             if config['BAR']['POSITION'] in ["top", "bottom"] else "v",
@@ -111,15 +44,8 @@ class WeatherButton(Button):
         self.main_container.add(self.icon)
         self.main_container.add(self.temperature)
         self.add(self.main_container)
-        self.weather_fabricator = Fabricator(
-            poll_from=lambda v: self.weather_worker.update_weather(),
-            on_changed=lambda f, v: self._build(),
-            interval=1000 * 60 *
-            config['BAR']['MODULES']['WEATHER']['REFRESH_INTERVAL'],
-            stream=False,
-            default_value=0,
-        )
-        GLib.idle_add(self._build, None, self.weather_worker.update_weather())
+        hub.subscribe("weather", "changed", self._build, owner=self)
+        GLib.idle_add(self._build)
 
     def update_weather(self) -> None:
         """Trigger the weather update process."""
@@ -138,16 +64,13 @@ class WeatherButton(Button):
             self.icon.show()
             self.temperature.show()
 
-    def _build(self, *args: object) -> bool:
+    def _build(self, *args: object) -> None:
         """Build the weather button with the current weather data."""
         weather = self.weather_worker.weather
         self._set_loading(False)
         if weather.icon is None or weather.temperature is None:
             self.set_visible(False)
-            return False
+            return
         self.set_visible(True)
         self.icon.set_label(weather.icon)
         self.temperature.set_label(weather.temperature)
-        self.main_container.add(self.icon)
-        self.main_container.add(self.temperature)
-        return True
@@ -0,0 +1,378 @@
+import json
+import os
+from collections import OrderedDict
+from typing import Callable
+
+from fabric.core.service import Service, Signal
+from gi.repository import GdkPixbuf, Gio, GLib, Gtk  # type: ignore
+
+from services.config import config
+from services.logger import logger
+
+CACHE_FILE = os.path.join(GLib.get_user_cache_dir(), config['APP_NAME'],
+                          "app_index.json")
+CACHE_VERSION = 1
+# Delay letting package managers write every file before re-parsing them
+RESCAN_DELAY = 500  # in milliseconds
+APP_FIELDS = ("id", "path", "name", "display_name", "generic_name",
+              "description", "window_class", "executable", "command_line",
+              "icon_name", "hidden")
+MAX_CACHED_ICONS = 256
+
+
+def get_application_dirs() -> list[str]:
+    """Return the XDG application directories, by order of precedence"""
+    return [
+        os.path.join(data_dir, "applications")
+        for data_dir in [GLib.get_user_data_dir(), *GLib.get_system_data_dirs()]
+    ]
+
+
+class IconCache:
+    """
+    LRU of the icon pixbufs by (icon name, size), shared by every widget showing
+    app icons so each icon is only looked up and decoded once. Cleared when the
+    icon theme changes.
+    """
+
+    def __init__(self, max_icons: int = MAX_CACHED_ICONS):
+        """
+        Parameters:
+          max_icons (int): Number of pixbufs kept in memory
+        """
+        self.max_icons = max_icons
+        self._pixbufs: OrderedDict[tuple[str, int],
+                                   GdkPixbuf.Pixbuf | None] = OrderedDict()
+        self._theme_handler: int | None = None
+
+    def get(self, icon_name: str, size: int) -> GdkPixbuf.Pixbuf | None:
+        """Return an icon (name or absolute path) at the given size, None when it can't be loaded"""
+        key = (icon_name, size)
+        if key in self._pixbufs:
+            self._pixbufs.move_to_end(key)
+            return self._pixbufs[key]
+        pixbuf = self._load(icon_name, size)
+        self._pixbufs[key] = pixbuf
+        while len(self._pixbufs) > self.max_icons:
+            self._pixbufs.popitem(last=False)
+        return pixbuf
+
+    def clear(self) -> None:
+        self._pixbufs.clear()
+
+    def _load(self, icon_name: str, size: int) -> GdkPixbuf.Pixbuf | None:
+        icon_theme = Gtk.IconTheme.get_default()
+        if self._theme_handler is None:
+            self._theme_handler = icon_theme.connect("changed",
+                                                     lambda *_: self.clear())
+        try:
+            if os.path.isabs(icon_name):
+                return GdkPixbuf.Pixbuf.new_from_file_at_size(
+                    icon_name, size, size)
+            return icon_theme.load_icon(icon_name, size,
+                                        Gtk.IconLookupFlags.FORCE_SIZE)
+        except GLib.Error:
+            return None
+
+
+icon_cache = IconCache()
+
+
+class IndexedApp:
+    """
+    Desktop application parsed from its .desktop file, exposing the same attributes
+    as fabric's DesktopApp. The GIO app info is only loaded to launch the app.
+    """
+
+    def __init__(self, id: str, path: str, name: str | None,
+                 display_name: str | None, generic_name: str | None,
+                 description: str | None, window_class: str | None,
+                 executable: str | None, command_line: str | None,
+                 icon_name: str | None, hidden: bool):
+        self.id = id
+        self.path = path
+        self.name = name
+        self.display_name = display_name
+        self.generic_name = generic_name
+        self.description = description
+        self.window_class = window_class
+        self.executable = executable
+        self.command_line = command_line
+        self.icon_name = icon_name
+        self.hidden = hidden
+        # Computed once here instead of on every keystroke of the launcher
+        self.search_key = ((display_name or "") + " " + (name or "") + " " +
+                           (generic_name or "")).casefold()
+        self.sort_key = (display_name or "").casefold()
+
+    @classmethod
+    def from_app_info(cls, id: str, path: str,
+                      info: Gio.DesktopAppInfo) -> "IndexedApp":
+        icon = info.get_icon()
+        return cls(
+            id=id,
+            path=path,
+            name=info.get_name(),
+            display_name=info.get_display_name(),
+            generic_name=info.get_generic_name(),
+            description=info.get_description(),
+            window_class=info.get_startup_wm_class(),
+            executable=info.get_executable(),
+            command_line=info.get_commandline(),
+            icon_name=icon.to_string() if icon is not None else None,
+            hidden=not info.should_show(),
+        )
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in APP_FIELDS}
+
+    def get_icon_pixbuf(self,
+                        size: int = 48,
+                        default_icon: str | None = "image-missing"
+                       ) -> GdkPixbuf.Pixbuf | None:
+        pixbuf = icon_cache.get(self.icon_name, size) if self.icon_name else None
+        if pixbuf is None and default_icon is not None:
+            pixbuf = icon_cache.get(default_icon, size)
+        return pixbuf
+
+    def launch(self) -> bool:
+        info = Gio.DesktopAppInfo.new_from_filename(self.path)
+        if info is None:
+            logger.error(f"Unable to load {self.path} to launch {self.id}")
+            return False
+        return info.launch([], None)
+
+
+def substring_matcher(query: str) -> Callable[[IndexedApp], bool]:
+    """Match the apps whose search key contains the (casefolded) query"""
+    return lambda app: query in app.search_key
+
+
+class AppFilter:
+    """
+    Filter over a presorted list of apps. When a query contains the previous one,
+    only the previous matches are filtered again, and the results keep the order
+    of the list so they never have to be sorted.
+    """
+
+    def __init__(self,
+                 apps: list[IndexedApp],
+                 matcher: Callable[[str], Callable[[IndexedApp], bool]] = substring_matcher):
+        """
+        Parameters:
+          apps (list): The apps to filter, in display order
+          matcher (callable): Build the predicate matching the apps for a casefolded
+            query. An app matching a query must match any part of it.
+        """
+        self.apps = apps
+        self._matcher = matcher
+        self._query: str | None = None
+        self._matches: list[IndexedApp] = apps
+
+    def filter(self, query: str) -> list[IndexedApp]:
+        query = query.casefold()
+        # Every app matching the query also matches any part of it
+        candidates = (self._matches if self._query is not None and
+                      self._query in query else self.apps)
+        self._matches = list(filter(self._matcher(query), candidates))
+        self._query = query
+        return self._matches
+
+
+class AppIndex(Service):
+    """
+    Index of the desktop applications shared by the launcher and the notch.
+
+    The .desktop files are parsed once and the result is saved in the cache
+    directory along with their modification times, so a restart only parses the
+    files that changed since. The application directories are then watched and
+    only the files reported by the monitors are parsed again, so reading the
+    index never touches the disk.
+    """
+
+    @Signal
+    def changed(self) -> None:
+        ...
+
+    def __init__(self, cache_file: str = CACHE_FILE, **kwargs):
+        """
+        Parameters:
+          cache_file (string): Where the parsed index is saved
+        """
+        super().__init__(**kwargs)
+        self.cache_file = cache_file
+        self.apps: list[IndexedApp] = []
+        # Every .desktop file found, by path: (mtime, parsed app or None when it can't be shown)
+        self._files: dict[str, tuple[float, IndexedApp | None]] = {}
+        self._monitors: dict[str, Gio.FileMonitor] = {}
+        self._dirty_paths: set[str] = set()
+        self._rescan_id: int | None = None
+
+        self._load_cache()
+        if self._scan():
+            self._save_cache()
+        self._rebuild()
+        for directory in get_application_dirs():
+            self._watch(directory)
+
+    def get_apps(self, include_hidden: bool = False) -> list[IndexedApp]:
+        """Return the indexed applications sorted by display name, without the ones hidden from menus by default"""
+        if include_hidden:
+            return list(self.apps)
+        return [app for app in self.apps if not app.hidden]
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self.cache_file, "r") as f:
+                cache = json.load(f)
+            if cache.get("version") != CACHE_VERSION:
+                return
+            self._files = {
+                path: (entry["mtime"], IndexedApp(**entry["app"])
+                       if entry["app"] else None)
+                for path, entry in cache["files"].items()
+            }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring the application index cache: {e}")
+            self._files = {}
+
+    def _save_cache(self) -> None:
+        cache = {
+            "version": CACHE_VERSION,
+            "files": {
+                path: {
+                    "mtime": mtime,
+                    "app": app.to_dict() if app else None
+                } for path, (mtime, app) in self._files.items()
+            },
+        }
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temporary_path = f"{self.cache_file}.tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(cache, f)
+            os.replace(temporary_path, self.cache_file)
+        except Exception as e:
+            logger.error(f"Failed to save the application index: {e}")
+
+    def _list_desktop_files(self) -> dict[str, float]:
+        """Return the mtime of every .desktop file of the application directories"""
+        files = {}
+        for directory in get_application_dirs():
+            for root, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    if not filename.endswith(".desktop"):
+                        continue
+                    path = os.path.join(root, filename)
+                    try:
+                        files[path] = os.stat(path).st_mtime
+                    except OSError:
+                        continue
+        return files
+
+    def _scan(self) -> bool:
+        """Parse the new and modified files and forget the deleted ones, returning whether anything changed"""
+        files = self._list_desktop_files()
+        changed = False
+        for path in list(self._files):
+            if path not in files:
+                del self._files[path]
+                changed = True
+        for path, mtime in files.items():
+            if path not in self._files or self._files[path][0] != mtime:
+                self._files[path] = (mtime, self._parse(path))
+                changed = True
+        return changed
+
+    def _desktop_id(self, path: str) -> str:
+        """Return the desktop file id (path relative to its applications directory, with / as -)"""
+        for directory in get_application_dirs():
+            if path.startswith(directory + os.sep):
+                return os.path.relpath(path, directory).replace(os.sep, "-")
+        return os.path.basename(path)
+
+    def _parse(self, path: str) -> IndexedApp | None:
+        try:
+            info = Gio.DesktopAppInfo.new_from_filename(path)
+        except Exception as e:
+            logger.warning(f"Failed to parse {path}: {e}")
+            return None
+        # Hidden=true entries can't be loaded, they still shadow other directories
+        if info is None:
+            return None
+        return IndexedApp.from_app_info(self._desktop_id(path), path, info)
+
+    def _rebuild(self) -> None:
+        """Resolve the apps, a desktop id in a directory shadowing the ones in the next directories"""
+        directories = get_application_dirs()
+
+        def precedence(path: str) -> int:
+            return next((i for i, directory in enumerate(directories)
+                         if path.startswith(directory + os.sep)),
+                        len(directories))
+
+        apps: dict[str, IndexedApp | None] = {}
+        for path in sorted(self._files, key=precedence):
+            app = self._files[path][1]
+            desktop_id = app.id if app else self._desktop_id(path)
+            if desktop_id not in apps:
+                apps[desktop_id] = app
+        # Kept sorted, so filtering it keeps the display order
+        self.apps = sorted((app for app in apps.values() if app is not None),
+                           key=lambda app: app.sort_key)
+
+    def _watch(self, directory: str) -> None:
+        # Monitors are not recursive, watch the sub-directories too. A missing
+        # directory is still watched, in case it gets created.
+        for root in [root for root, _, _ in os.walk(directory)] or [directory]:
+            if root in self._monitors:
+                continue
+            try:
+                monitor = Gio.File.new_for_path(root).monitor_directory(
+                    Gio.FileMonitorFlags.WATCH_MOVES, None)
+            except GLib.Error as e:
+                logger.warning(f"Unable to watch {root}: {e}")
+                continue
+            monitor.connect("changed", self._on_directory_changed)
+            self._monitors[root] = monitor
+
+    def _on_directory_changed(self, monitor: Gio.FileMonitor, file: Gio.File,
+                              other_file: Gio.File | None,
+                              event: Gio.FileMonitorEvent) -> None:
+        for changed_file in (file, other_file):
+            path = changed_file.get_path() if changed_file else None
+            if path is None:
+                continue
+            if path.endswith(".desktop"):
+                self._dirty_paths.add(path)
+            elif (event == Gio.FileMonitorEvent.CREATED and
+                  os.path.isdir(path)):
+                # New sub-directory (e.g. vendor directories)
+                self._dirty_paths.update(
+                    os.path.join(root, filename)
+                    for root, _, filenames in os.walk(path)
+                    for filename in filenames
+                    if filename.endswith(".desktop"))
+                self._watch(path)
+        if self._dirty_paths and self._rescan_id is None:
+            self._rescan_id = GLib.timeout_add(RESCAN_DELAY,
+                                               self._on_rescan)
+
+    def _on_rescan(self) -> bool:
+        """Parse again only the files reported by the monitors"""
+        self._rescan_id = None
+        dirty_paths, self._dirty_paths = self._dirty_paths, set()
+        for path in dirty_paths:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                self._files.pop(path, None)
+                continue
+            self._files[path] = (mtime, self._parse(path))
+        logger.debug(f"Re-indexed {len(dirty_paths)} desktop files")
+        self._save_cache()
+        self._rebuild()
+        self.emit("changed")
+        return False
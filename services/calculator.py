@@ -0,0 +1,280 @@
+import ast
+import functools
+import math
+import operator
+import re
+import time
+from typing import Any, Callable
+
+import numpy as np
+
+MAX_EXPRESSION_LENGTH = 256
+MAX_NODES = 128
+# Limits keeping a single evaluation from freezing the shell
+TIME_LIMIT = 0.5  # in seconds
+PREVIEW_TIME_LIMIT = 0.05  # in seconds
+MAX_ARRAY_SIZE = 1_000_000
+# Integers past this size can't be printed
+MAX_INTEGER_BITS = 8192
+MAX_FACTORIAL = 500
+
+REPLACEMENTS = {
+    "^": "**",
+    "×": "*",
+    "÷": "/",
+    "π": "pi",
+    "[": "(",
+    "]": ")",
+    "{": "(",
+    "}": ")",
+}
+
+
+class CalculatorError(Exception):
+    """Raised for expressions that can't be evaluated"""
+
+
+def _factorial(n: Any) -> int:
+    if not float(n).is_integer() or not 0 <= n <= MAX_FACTORIAL:
+        raise CalculatorError(
+            f"Factorial is only defined here for integers from 0 to {MAX_FACTORIAL}"
+        )
+    return math.factorial(int(n))
+
+
+def _check_array_size(size: float) -> None:
+    if size > MAX_ARRAY_SIZE:
+        raise CalculatorError(
+            f"Arrays are limited to {MAX_ARRAY_SIZE} elements")
+
+
+def _arange(*args: Any) -> np.ndarray:
+    if not 1 <= len(args) <= 3:
+        raise CalculatorError("arange takes 1 to 3 arguments")
+    start, stop, step = ((0, args[0], 1) if len(args) == 1 else
+                         (*args, 1) if len(args) == 2 else args)
+    if step == 0:
+        raise CalculatorError("arange step can't be zero")
+    _check_array_size(math.ceil((stop - start) / step))
+    return np.arange(start, stop, step)
+
+
+def _linspace(start: Any, stop: Any, num: Any = 50) -> np.ndarray:
+    _check_array_size(num)
+    return np.linspace(start, stop, int(num))
+
+
+def _array(values: Any) -> np.ndarray:
+    return np.array(values)
+
+
+FUNCTIONS: dict[str, Callable] = {
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "log": np.log10,
+    "ln": np.log,
+    "sqrt": np.sqrt,
+    "abs": np.abs,
+    "exp": np.exp,
+    "factorial": _factorial,
+    "arange": _arange,
+    "linspace": _linspace,
+    "array": _array,
+}
+CONSTANTS: dict[str, Any] = {"pi": np.pi, "e": np.e}
+# np.<name> and math.<name> keep their own meaning (np.log is the natural log)
+MODULE_MEMBERS: dict[str, dict[str, Any]] = {
+    "np": {
+        name: getattr(np, name)
+        for name in ("sin", "cos", "tan", "arcsin", "arccos", "arctan",
+                     "sinh", "cosh", "tanh", "log", "log10", "log2", "exp",
+                     "sqrt", "abs", "floor", "ceil", "round", "pi", "e")
+    } | {
+        "arange": _arange,
+        "linspace": _linspace,
+        "array": _array
+    },
+    "math": {
+        name: getattr(math, name)
+        for name in ("sin", "cos", "tan", "asin", "acos", "atan", "sinh",
+                     "cosh", "tanh", "log", "log10", "log2", "exp", "sqrt",
+                     "floor", "ceil", "pi", "e", "tau")
+    } | {"factorial": _factorial},
+}
+
+
+def _power(base: Any, exponent: Any) -> Any:
+    # Integer powers are exact, their size has to be bounded
+    if (isinstance(base, (int, np.integer)) and
+            isinstance(exponent, (int, np.integer)) and exponent > 0 and
+            abs(int(base)).bit_length() * int(exponent) > MAX_INTEGER_BITS):
+        raise CalculatorError("Result too large")
+    return operator.pow(base, exponent)
+
+
+BINARY_OPERATORS: dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _power,
+}
+UNARY_OPERATORS: dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+def normalize(expression: str) -> str:
+    """Rewrite the calculator notation (^, ×, π, n!, brackets) as Python"""
+    expression = expression.lstrip("=").strip()
+    for old, new in REPLACEMENTS.items():
+        expression = expression.replace(old, new)
+    return re.sub(r"(\d+)!", r"factorial(\1)", expression)
+
+
+def _compile_node(node: ast.AST) -> Callable[[float], Any]:
+    """
+    Turn a node into a function of the evaluation deadline, rejecting anything that
+    isn't arithmetic on numbers, known constants and known functions.
+    """
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+
+    if isinstance(node, ast.Constant):
+        if type(node.value) not in (int, float, complex):
+            raise CalculatorError(f"Unsupported value: {node.value!r}")
+        value = node.value
+        return lambda deadline: value
+
+    if isinstance(node, ast.Name):
+        if node.id not in CONSTANTS:
+            raise CalculatorError(f"Unknown name: {node.id}")
+        value = CONSTANTS[node.id]
+        return lambda deadline: value
+
+    if isinstance(node, ast.Attribute):
+        members = (MODULE_MEMBERS.get(node.value.id, {}) if isinstance(
+            node.value, ast.Name) else {})
+        if node.attr not in members or callable(members[node.attr]):
+            raise CalculatorError(f"Unknown name: {ast.unparse(node)}")
+        value = members[node.attr]
+        return lambda deadline: value
+
+    if isinstance(node, ast.BinOp):
+        if type(node.op) not in BINARY_OPERATORS:
+            raise CalculatorError(f"Unsupported operator: {ast.unparse(node)}")
+        apply_binary = BINARY_OPERATORS[type(node.op)]
+        left, right = _compile_node(node.left), _compile_node(node.right)
+
+        def binary(deadline: float) -> Any:
+            if time.monotonic() > deadline:
+                raise CalculatorError("Evaluation took too long")
+            return apply_binary(left(deadline), right(deadline))
+
+        return binary
+
+    if isinstance(node, ast.UnaryOp):
+        if type(node.op) not in UNARY_OPERATORS:
+            raise CalculatorError(f"Unsupported operator: {ast.unparse(node)}")
+        apply_unary = UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda deadline: apply_unary(operand(deadline))
+
+    if isinstance(node, ast.Call):
+        if isinstance(node.func, ast.Name):
+            function = FUNCTIONS.get(node.func.id)
+        elif isinstance(node.func, ast.Attribute) and isinstance(
+                node.func.value, ast.Name):
+            function = MODULE_MEMBERS.get(node.func.value.id,
+                                          {}).get(node.func.attr)
+        else:
+            function = None
+        if not callable(function) or node.keywords:
+            raise CalculatorError(
+                f"Unknown function: {ast.unparse(node.func)}")
+        # Tuples are only allowed as arguments, e.g. array((1, 2, 3))
+        arguments = [
+            _compile_tuple(argument)
+            if isinstance(argument, ast.Tuple) else _compile_node(argument)
+            for argument in node.args
+        ]
+
+        def call(deadline: float) -> Any:
+            if time.monotonic() > deadline:
+                raise CalculatorError("Evaluation took too long")
+            return function(*(argument(deadline) for argument in arguments))
+
+        return call
+
+    raise CalculatorError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+def _compile_tuple(node: ast.Tuple) -> Callable[[float], tuple]:
+    elements = [
+        _compile_tuple(element)
+        if isinstance(element, ast.Tuple) else _compile_node(element)
+        for element in node.elts
+    ]
+    return lambda deadline: tuple(element(deadline) for element in elements)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_expression(expression: str) -> Callable[[float], Any]:
+    """
+    Parse and validate a calculator expression once, returning a function of the
+    evaluation deadline. Compiled expressions are cached by text, so the live
+    preview and the final evaluation parse it only once.
+    """
+    source = normalize(expression)
+    if not source:
+        raise CalculatorError("Empty expression")
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise CalculatorError("Expression too long")
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError:
+        raise CalculatorError("Invalid expression") from None
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise CalculatorError("Expression too long")
+    return _compile_node(tree)
+
+
+def evaluate(expression: str, time_limit: float = TIME_LIMIT) -> Any:
+    """Evaluate a calculator expression, raising CalculatorError when it can't be"""
+    function = compile_expression(expression)
+    try:
+        with np.errstate(all="ignore"):
+            return function(time.monotonic() + time_limit)
+    except CalculatorError:
+        raise
+    except Exception as e:
+        raise CalculatorError(str(e)) from e
+
+
+def format_result(result: Any) -> str:
+    if isinstance(result, np.ndarray):
+        if result.size > 10:
+            return f"Array of shape {result.shape}"
+        return str(result)
+    if isinstance(result, (int, np.integer)):
+        if int(result).bit_length() > MAX_INTEGER_BITS:
+            raise CalculatorError("Result too large")
+        return str(int(result))
+    if isinstance(result, (float, np.floating)):
+        if float(result).is_integer():
+            return str(int(result))
+        return f"{float(result):.10g}"
+    return str(result)
+
+
+def calculate(expression: str, time_limit: float = TIME_LIMIT) -> str:
+    """Return the formatted result of an expression, or the error it raised"""
+    try:
+        return format_result(evaluate(expression, time_limit))
+    except CalculatorError as e:
+        return f"Error: {e}"
+
@@ -0,0 +1,97 @@
+import atexit
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from gi.repository import GLib  # type: ignore
+
+from services.logger import logger
+
+HISTORY_SIZE = 100
+# Changes to the history within this delay are written at once
+HISTORY_FLUSH_DELAY = 1000  # in milliseconds
+
+
+class CalculatorHistory:
+    """
+    Most recent first list of the evaluated expressions, capped to `max_size`
+    entries. Changes are batched and written to disk from a worker thread, a
+    single one so the writes happen in order.
+    """
+
+    def __init__(self, path: str, max_size: int = HISTORY_SIZE):
+        """
+        Parameters:
+          path (string): The JSON file the history is saved to
+          max_size (int): Number of entries kept
+        """
+        self.path = path
+        self.max_size = max_size
+        # Incremented on every change, to know when a view is outdated
+        self.version = 0
+        self._entries: list[str] = []
+        self._flush_id: int | None = None
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1,
+                                          thread_name_prefix="calc-history")
+        try:
+            with open(path, "r") as f:
+                self._entries = [str(entry) for entry in json.load(f)]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring the calculator history: {e}")
+        if len(self._entries) > max_size:
+            # Histories saved before the cap are trimmed once
+            del self._entries[max_size:]
+            self._schedule_flush()
+        atexit.register(self.flush)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, index: int) -> str:
+        return self._entries[index]
+
+    def add(self, entry: str) -> None:
+        self._entries.insert(0, entry)
+        del self._entries[self.max_size:]
+        self._changed()
+
+    def remove(self, index: int) -> None:
+        del self._entries[index]
+        self._changed()
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_id is None:
+            self._flush_id = GLib.timeout_add(HISTORY_FLUSH_DELAY,
+                                              self._on_flush)
+
+    def _on_flush(self) -> bool:
+        self._flush_id = None
+        self._writer.submit(self._write, list(self._entries))
+        return False
+
+    def flush(self) -> None:
+        """Write the pending changes right away"""
+        if self._flush_id is None:
+            return
+        GLib.source_remove(self._flush_id)
+        self._flush_id = None
+        self._write(list(self._entries))
+
+    def _write(self, entries: list[str]) -> None:
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                temporary_path = f"{self.path}.tmp"
+                with open(temporary_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(temporary_path, self.path)
+            except Exception as e:
+                logger.error(f"Failed to save the calculator history: {e}")
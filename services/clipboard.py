@@ -0,0 +1,426 @@
+import os
+import re
+import subprocess
+import threading
+from typing import Callable
+
+from fabric.core.service import Service, Signal
+from gi.repository import GdkPixbuf, Gio, GLib  # type: ignore
+
+from services.config import config
+from services.logger import logger
+
+LIST_COMMAND = ["cliphist", "list"]
+# Stores every new selection in cliphist and prints its history line
+WATCH_COMMAND = [
+    "wl-paste", "--watch", "sh", "-c", "cliphist store && cliphist list | head -n 1"
+]
+# Followed by the entry id, prints the entry content
+DECODE_COMMAND = ["cliphist", "decode"]
+COPY_COMMAND = ["wl-copy"]
+CLIPHIST_DB = os.path.join(GLib.get_user_cache_dir(), "cliphist", "db")
+# cliphist ends the truncated previews with this character
+TRUNCATION_MARK = "…"
+MIN_BACKOFF = 1  # in seconds
+MAX_BACKOFF = 60  # in seconds
+THUMBNAIL_DIR = os.path.join(GLib.get_user_cache_dir(), config['APP_NAME'],
+                             "clipboard")
+THUMBNAIL_WIDTH = 240
+THUMBNAIL_HEIGHT = 135
+# Preview cliphist gives to images, e.g. "[[ binary data 1.2 MiB png 1920x1080 ]]"
+IMAGE_PREVIEW = re.compile(
+    r"^\[\[ binary data .+ (png|jpe?g|gif|bmp|webp|tiff?) \d+x\d+ \]\]$")
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def parse_entry(line: str) -> tuple[int, str] | None:
+    """Parse a `cliphist list` line ("<id>\\t<preview>"), None for lines to ignore"""
+    entry_id, separator, preview = line.partition("\t")
+    if not separator or not entry_id.isdigit():
+        return None
+    if "<meta http-equiv" in preview:
+        # HTML copied from browsers, its plain text version is stored too
+        return None
+    return int(entry_id), preview
+
+
+def is_image(preview: str) -> bool:
+    return IMAGE_PREVIEW.match(preview) is not None
+
+
+class ClipboardThumbnails:
+    """
+    Thumbnails of the image entries, stored as PNG files named after the entry id
+    (cliphist never reuses ids). Images are decoded straight from the
+    `cliphist decode` output and scaled while decoding, so a large screenshot is
+    never held in memory at full size.
+
+    `load` and `prune` block, they are meant to be called from worker threads.
+    """
+
+    def __init__(self,
+                 directory: str = THUMBNAIL_DIR,
+                 width: int = THUMBNAIL_WIDTH,
+                 height: int = THUMBNAIL_HEIGHT,
+                 decoder: list[str] = DECODE_COMMAND):
+        """
+        Parameters:
+          directory (string): Where the thumbnails are stored
+          width (int): Maximum width of the thumbnails
+          height (int): Maximum height of the thumbnails
+          decoder (list): Command printing the content of the entry id appended to it
+        """
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self._decoder = decoder
+
+    def _path(self, entry_id: str) -> str:
+        return os.path.join(self.directory, f"{entry_id}.png")
+
+    def load(self, entry_id: str) -> GdkPixbuf.Pixbuf | None:
+        """Return the thumbnail of an image entry, decoding it when not stored yet"""
+        path = self._path(entry_id)
+        try:
+            return GdkPixbuf.Pixbuf.new_from_file(path)
+        except GLib.Error:
+            pass
+        pixbuf = self._decode(entry_id)
+        if pixbuf is None:
+            return None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary_path = f"{path}.{threading.get_ident()}.tmp"
+            pixbuf.savev(temporary_path, "png", [], [])
+            os.replace(temporary_path, path)
+        except Exception as e:
+            logger.error(f"Failed to save the clipboard thumbnail {path}: {e}")
+        return pixbuf
+
+    def _decode(self, entry_id: str) -> GdkPixbuf.Pixbuf | None:
+        loader = GdkPixbuf.PixbufLoader()
+
+        def on_size_prepared(loader: GdkPixbuf.PixbufLoader, width: int,
+                             height: int) -> None:
+            scale = min(self.width / width, self.height / height, 1)
+            loader.set_size(max(round(width * scale), 1),
+                            max(round(height * scale), 1))
+
+        loader.connect("size-prepared", on_size_prepared)
+        process = subprocess.Popen([*self._decoder, entry_id],
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL)
+        try:
+            while chunk := process.stdout.read(DECODE_CHUNK_SIZE):  # type: ignore
+                loader.write(chunk)
+            loader.close()
+            return loader.get_pixbuf()
+        except GLib.Error as e:
+            logger.warning(f"Unable to decode clipboard entry {entry_id}: {e}")
+            try:
+                loader.close()
+            except GLib.Error:
+                pass
+            return None
+        finally:
+            process.stdout.close()  # type: ignore
+            process.wait()
+
+    def prune(self, entry_ids: set[int]) -> None:
+        """Delete the thumbnails of the entries not in the history anymore"""
+        # Entries added since the ids were listed are newer than all of them
+        newest = max(entry_ids, default=0)
+        try:
+            with os.scandir(self.directory) as files:
+                for file in files:
+                    entry_id, extension = os.path.splitext(file.name)
+                    if (extension == ".png" and entry_id.isdigit() and
+                            int(entry_id) <= newest and
+                            int(entry_id) not in entry_ids):
+                        os.remove(file.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to prune the clipboard thumbnails: {e}")
+
+
+clipboard_thumbnails = ClipboardThumbnails()
+
+
+class ClipboardHistory(Service):
+    """
+    In-memory index of the clipboard history, so showing or searching it never
+    runs cliphist.
+
+    The whole history is streamed from `cliphist list` once, then every new
+    selection arrives through a long-lived `wl-paste --watch` process printing
+    one history line per copy. The watcher is restarted, with exponential
+    backoff, if it exits. Every command is a parameter, so any process printing
+    "<id>\\t<preview>" lines can stand in for the list and watch ones.
+
+    `changed` is emitted once the history is loaded and after every new entry.
+    """
+
+    @Signal
+    def changed(self) -> None:
+        ...
+
+    def __init__(self,
+                 loader: list[str] = LIST_COMMAND,
+                 producer: list[str] = WATCH_COMMAND,
+                 database: str = CLIPHIST_DB,
+                 decoder: list[str] = DECODE_COMMAND,
+                 copier: list[str] = COPY_COMMAND,
+                 **kwargs):
+        """
+        Parameters:
+          loader (list): Command printing the whole history, newest first
+          producer (list): Long-lived command printing a line per new entry
+          database (string): File changing with the history, reloaded on `refresh` when changed by others
+          decoder (list): Command printing the content of the entry id appended to it
+          copier (list): Command putting its standard input in the clipboard
+        """
+        super().__init__(**kwargs)
+        self.loaded = False
+        self._loader = loader
+        self._producer = producer
+        self._decoder = decoder
+        self._copier = copier
+        self._database = database
+        self._lock = threading.Lock()
+        # (preview, folded preview) by id, in insertion order: oldest first
+        self._entries: dict[int, tuple[str, str]] = {}
+        self._loading: dict[int, tuple[str, str]] | None = None
+        self._database_mtime: float | None = None
+        self._cancellable = Gio.Cancellable()
+        self._watcher: Gio.Subprocess | None = None
+        self._backoff = MIN_BACKOFF
+        self._retry_id: int | None = None
+
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self) -> list[tuple[int, str]]:
+        """Snapshot of the (id, preview) of every entry, newest first. Thread safe."""
+        with self._lock:
+            return [(entry_id, preview)
+                    for entry_id, (preview, _) in reversed(self._entries.items())]
+
+    def search(self,
+               query: str = "",
+               limit: int | None = None) -> list[tuple[int, str]]:
+        """Return the entries containing the query (case insensitive), newest first. Thread safe."""
+        folded_query = query.casefold()
+        results = []
+        with self._lock:
+            for entry_id, (preview,
+                           folded) in reversed(self._entries.items()):
+                if folded_query in folded:
+                    results.append((entry_id, preview))
+                    if limit is not None and len(results) >= limit:
+                        break
+        return results
+
+    def reload(self) -> None:
+        """Load the whole history again in the background, replacing the index when done"""
+        if self._loading is not None:
+            return
+        self._loading = {}
+        self._stream(self._loader, self._on_loaded_line, self._on_loaded)
+
+    def refresh(self) -> None:
+        """Reload if the history was changed by someone else (e.g. `cliphist delete`)"""
+        if self.loaded and self._read_database_mtime() != self._database_mtime:
+            self.reload()
+
+    def copy(self,
+             entry_id: int,
+             callback: Callable[[bool], None] | None = None) -> None:
+        """
+        Copy an entry back to the clipboard without blocking the main loop: the
+        output of `cliphist decode` is spliced into `wl-copy` by GIO, never read
+        into Python. The callback receives whether both commands succeeded.
+        """
+        flags = Gio.SubprocessFlags
+        try:
+            decoder = Gio.Subprocess.new(
+                [*self._decoder, str(entry_id)],
+                flags.STDOUT_PIPE | flags.STDERR_SILENCE)
+        except GLib.Error as e:
+            logger.error(f"Failed to copy clipboard entry {entry_id}: {e}")
+            if callback:
+                callback(False)
+            return
+        try:
+            copier = Gio.Subprocess.new(self._copier,
+                                        flags.STDIN_PIPE | flags.STDERR_SILENCE)
+        except GLib.Error as e:
+            logger.error(f"Failed to copy clipboard entry {entry_id}: {e}")
+            # Reaped by GIO once it exits, its pipe closed with it
+            decoder.force_exit()
+            decoder.get_stdout_pipe().close_async(GLib.PRIORITY_DEFAULT, None,
+                                                  None)
+            if callback:
+                callback(False)
+            return
+
+        def on_copier_exited(copier: Gio.Subprocess,
+                             result: Gio.AsyncResult) -> None:
+            try:
+                copier.wait_finish(result)
+            except GLib.Error:
+                pass
+            successful = decoder.get_successful() and copier.get_successful()
+            if not successful:
+                logger.error(f"Failed to copy clipboard entry {entry_id}")
+            if callback:
+                callback(successful)
+
+        def on_decoder_exited(decoder: Gio.Subprocess,
+                              result: Gio.AsyncResult) -> None:
+            try:
+                decoder.wait_finish(result)
+            except GLib.Error:
+                pass
+            copier.wait_async(None, on_copier_exited)
+
+        def on_spliced(stream: Gio.OutputStream,
+                       result: Gio.AsyncResult) -> None:
+            try:
+                stream.splice_finish(result)
+            except GLib.Error as e:
+                logger.error(f"Failed to copy clipboard entry {entry_id}: {e}")
+            decoder.wait_async(None, on_decoder_exited)
+
+        copier.get_stdin_pipe().splice_async(
+            decoder.get_stdout_pipe(),
+            Gio.OutputStreamSpliceFlags.CLOSE_SOURCE
+            | Gio.OutputStreamSpliceFlags.CLOSE_TARGET,
+            GLib.PRIORITY_DEFAULT,
+            None,
+            on_spliced,
+        )
+
+    def stop(self) -> None:
+        self._cancellable.cancel()
+        if self._watcher is not None:
+            self._watcher.force_exit()
+            self._watcher = None
+        if self._retry_id is not None:
+            GLib.source_remove(self._retry_id)
+            self._retry_id = None
+
+    def _read_database_mtime(self) -> float | None:
+        try:
+            return os.stat(self._database).st_mtime
+        except OSError:
+            return None
+
+    def _on_loaded_line(self, line: str) -> None:
+        entry = parse_entry(line)
+        if entry is not None and self._loading is not None:
+            entry_id, preview = entry
+            self._loading[entry_id] = (preview, preview.casefold())
+
+    def _on_loaded(self, successful: bool) -> None:
+        loading, self._loading = self._loading or {}, None
+        if not successful and not loading:
+            logger.warning("Unable to load the clipboard history")
+        # cliphist ids grow with time, sorted they are in insertion order
+        with self._lock:
+            self._entries = dict(sorted(loading.items()))
+        self._database_mtime = self._read_database_mtime()
+        self.loaded = True
+        self.emit("changed")
+        if successful:
+            threading.Thread(target=clipboard_thumbnails.prune,
+                             args=(set(loading), ),
+                             name="clipboard-thumbnails-prune",
+                             daemon=True).start()
+        if self._watcher is None and self._retry_id is None:
+            self._watch()
+
+    def _watch(self) -> None:
+        self._watcher = self._stream(self._producer, self._on_new_line,
+                                     self._on_watch_ended)
+
+    def _on_new_line(self, line: str) -> None:
+        entry = parse_entry(line)
+        if entry is None:
+            return
+        self._backoff = MIN_BACKOFF
+        entry_id, preview = entry
+        with self._lock:
+            if not preview.endswith(TRUNCATION_MARK):
+                # cliphist drops the previous copies of the same content
+                for duplicate_id in [
+                        other_id
+                        for other_id, (other, _) in self._entries.items()
+                        if other == preview
+                ]:
+                    del self._entries[duplicate_id]
+            self._entries.pop(entry_id, None)
+            self._entries[entry_id] = (preview, preview.casefold())
+        self._database_mtime = self._read_database_mtime()
+        self.emit("changed")
+
+    def _on_watch_ended(self, successful: bool) -> None:
+        self._watcher = None
+        if self._cancellable.is_cancelled():
+            return
+        logger.warning(
+            f"Clipboard watcher exited, restarting it in {self._backoff}s")
+        self._retry_id = GLib.timeout_add_seconds(self._backoff,
+                                                  self._on_retry)
+        self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+
+    def _on_retry(self) -> bool:
+        self._retry_id = None
+        # Entries copied while the watcher was down are picked up by the reload
+        self.reload()
+        return False
+
+    def _stream(self, argv: list[str], on_line: Callable[[str], None],
+                on_end: Callable[[bool], None]) -> Gio.Subprocess | None:
+        """Run a command, passing each line of its stdout to on_line on the main loop, then whether it succeeded to on_end"""
+        try:
+            process = Gio.Subprocess.new(
+                argv,
+                Gio.SubprocessFlags.STDOUT_PIPE
+                | Gio.SubprocessFlags.STDERR_SILENCE,
+            )
+        except GLib.Error as e:
+            logger.error(f"Failed to run {' '.join(argv)}: {e}")
+            GLib.idle_add(lambda: on_end(False))
+            return None
+        stream = Gio.DataInputStream.new(process.get_stdout_pipe())
+
+        def on_waited(process: Gio.Subprocess,
+                      result: Gio.AsyncResult) -> None:
+            try:
+                process.wait_finish(result)
+            except GLib.Error:
+                pass
+            on_end(process.get_successful())
+
+        def on_read(stream: Gio.DataInputStream,
+                    result: Gio.AsyncResult) -> None:
+            try:
+                line, _ = stream.read_line_finish(result)
+            except GLib.Error as e:
+                if not self._cancellable.is_cancelled():
+                    logger.warning(f"Failed to read from {argv[0]}: {e}")
+                line = None
+            if line is None:
+                # End of the output, the process is exiting
+                process.wait_async(None, on_waited)
+                return
+            on_line(line.decode("utf-8", errors="replace"))
+            stream.read_line_async(GLib.PRIORITY_DEFAULT, self._cancellable,
+                                   on_read)
+
+        stream.read_line_async(GLib.PRIORITY_DEFAULT, self._cancellable,
+                               on_read)
+        return process
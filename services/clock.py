@@ -0,0 +1,18 @@
+from fabric.core.service import Service, Signal
+from fabric.utils.helpers import invoke_repeater
+
+
+class ClockProvider(Service):
+    """Shared one second clock, so every time widget redraws off the same timer."""
+
+    @Signal
+    def tick(self) -> None:
+        ...
+
+    def __init__(self, interval: int = 1000, **kwargs):
+        super().__init__(**kwargs)
+        self._repeater_id = invoke_repeater(interval, self._on_tick)
+
+    def _on_tick(self) -> bool:
+        self.emit("tick")
+        return True
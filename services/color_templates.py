@@ -0,0 +1,82 @@
+import colorsys
+import json
+import re
+
+TEMPLATE_EXPRESSION = re.compile(r"\{\{\s*(.*?)\s*\}\}")
+COLOR_FORMATS = {
+    "hex": lambda r, g, b: f"#{r:02x}{g:02x}{b:02x}",
+    "hex_stripped": lambda r, g, b: f"{r:02x}{g:02x}{b:02x}",
+    "red": lambda r, g, b: str(r),
+    "green": lambda r, g, b: str(g),
+    "blue": lambda r, g, b: str(b),
+}
+
+
+class PaletteError(Exception):
+    """Raised when a palette can't be generated or a template can't be rendered"""
+
+
+def parse_palette(output: str) -> dict[str, str]:
+    """Extract the default scheme colors from the JSON printed by matugen"""
+    try:
+        data, _ = json.JSONDecoder().raw_decode(output[output.index("{"):])
+        colors = data["colors"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise PaletteError(f"Unexpected matugen output: {e}") from e
+    if isinstance(colors.get("dark"), dict) and all(
+            isinstance(value, str) for value in colors["dark"].values()):
+        # {"colors": {"dark": {name: hex}, "light": {...}}}
+        return dict(colors["dark"])
+    # {"colors": {name: {"default": {"color": hex}, "dark": ..., "light": ...}}}
+    palette = {}
+    for name, schemes in colors.items():
+        value = schemes.get("default", schemes.get("dark")) if isinstance(
+            schemes, dict) else None
+        if isinstance(value, dict):
+            value = value.get("color")
+        if isinstance(value, str):
+            palette[name] = value
+    if not palette:
+        raise PaletteError("No colors in the matugen output")
+    return palette
+
+
+def set_lightness(rgb: tuple[int, int, int],
+                   amount: float) -> tuple[int, int, int]:
+    """Add amount (in percent) to the HSL lightness, as matugen's filter does"""
+    hue, lightness, saturation = colorsys.rgb_to_hls(*(c / 255 for c in rgb))
+    lightness = min(max(lightness + amount / 100, 0), 1)
+    return tuple(
+        round(c * 255)
+        for c in colorsys.hls_to_rgb(hue, lightness, saturation))  # type: ignore
+
+
+def render_template(template: str, palette: dict[str, str],
+                    image: str) -> str:
+    """
+    Render a matugen template from a palette. Only the syntax used by our
+    templates is supported: {{image}}, {{colors.<name>.default.<format>}} and the
+    set_lightness filter. Anything else raises PaletteError, so the caller can
+    leave the template to matugen.
+    """
+
+    def replace(match: re.Match) -> str:
+        value, *filters = [part.strip() for part in match.group(1).split("|")]
+        if value == "image" and not filters:
+            return image
+        parts = value.split(".")
+        if (len(parts) != 4 or parts[0] != "colors" or
+                parts[2] != "default" or parts[3] not in COLOR_FORMATS):
+            raise PaletteError(f"Unsupported template expression: {value}")
+        color = palette.get(parts[1], "")
+        if not re.fullmatch(r"#[0-9a-fA-F]{6}", color):
+            raise PaletteError(f"Unknown color: {parts[1]}")
+        rgb = tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+        for template_filter in filters:
+            name, _, argument = template_filter.partition(":")
+            if name.strip() != "set_lightness":
+                raise PaletteError(f"Unsupported template filter: {name}")
+            rgb = set_lightness(rgb, float(argument))  # type: ignore
+        return COLOR_FORMATS[parts[3]](*rgb)
+
+    return TEMPLATE_EXPRESSION.sub(replace, template)
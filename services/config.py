@@ -39,11 +39,37 @@ default_config = {
                 "GAMMA": 100
             },
         },
+        "PAGES": {
+            "DEFAULT_EXPANDED": {
+                "PREWARM": True,
+            },
+            "LAUNCHER": {
+                "PREWARM": True,
+            },
+            "WALLPAPER": {
+                "PREWARM": False,
+                "PREVIEW_CACHE_MB": 32,
+                "PRECOMPUTE_PALETTES": False,
+            },
+            "POWER": {
+                "PREWARM": True,
+            },
+            "CLIPBOARD": {
+                "PREWARM": False,
+            },
+        },
     },
     "NOTIFICATION": {
         "VISIBLE": True,
         "TIMEOUT": 5,  # in seconds
         "POSITION": "top-right",
+        "HISTORY_SIZE": 50,
+        "COALESCE_WINDOW": 5,  # in seconds
+        "RATE_LIMIT": {
+            "BURST": 5,
+            "PER_SECOND": 1,
+        },
+        "REPLACE_APPS": ["Spotify"],
     },
     "OSD": {
         "VISIBLE": True,
@@ -74,6 +100,13 @@ default_config = {
         "VISIBLE": True,
         "SIZE": 24,
     },
+    "METRICS": {
+        "HISTORY_MINUTES": 10,
+    },
+    "LAUNCHER": {
+        "PROVIDERS": ["windows", "files", "clipboard", "commands"],
+        "CALC_HISTORY_SIZE": 100,
+    },
 }
 
 class Config:
@@ -117,6 +150,24 @@ class Config:
     def __getitem__(self, key: str):
         return self._config[key]
 
+    def get(self, *keys: str, default=None):
+        """
+        Walks the configuration along the given keys, falling back to the
+        default configuration and then to `default` when a key is missing.
+
+        :param keys: The path of keys to walk (e.g. "NOTCH", "PAGES").
+        :param default: The value returned when no configuration defines the path.
+        """
+        for source in (self._config, default_config):
+            node = source
+            try:
+                for key in keys:
+                    node = node[key]
+                return node
+            except (KeyError, TypeError):
+                continue
+        return default
+
     def _validate(self, config: dict, reference: dict, path: str = "") -> None:
         """
         Validates the structure and types of the user-provided configuration
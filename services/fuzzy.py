@@ -0,0 +1,80 @@
+MATCH_SCORE = 1
+CONSECUTIVE_BONUS = 4
+WORD_START_BONUS = 6
+PREFIX_BONUS = 10
+GAP_PENALTY = 0.5
+MAX_GAP_PENALTY = 3
+LEADING_PENALTY = 0.25
+MAX_LEADING_PENALTY = 2
+MAX_FUZZY_STARTS = 4
+WORD_SEPARATORS = " -_./"
+
+
+def is_subsequence(query: str, text: str, start: int = 0) -> bool:
+    """Return whether the characters of query appear in order in text, from start"""
+    for char in query:
+        start = text.find(char, start) + 1
+        if start == 0:
+            return False
+    return True
+
+
+def _is_word_start(text: str, index: int) -> bool:
+    return index == 0 or text[index - 1] in WORD_SEPARATORS
+
+
+def _score_from(query: str, text: str, start: int) -> float | None:
+    """Score the greedy match of query in text, its first character matched at start"""
+    score = MATCH_SCORE - min(start * LEADING_PENALTY, MAX_LEADING_PENALTY)
+    if _is_word_start(text, start):
+        score += WORD_START_BONUS
+    previous = start
+    for position in range(1, len(query)):
+        char = query[position]
+        index = text.find(char, previous + 1)
+        if index == -1:
+            return None
+        if index != previous + 1 and not _is_word_start(text, index):
+            # Jump to the start of a later word when the rest still matches from there
+            word_start = next(
+                (i for i in range(index + 1, len(text))
+                 if text[i] == char and _is_word_start(text, i)), -1)
+            if word_start != -1 and is_subsequence(query[position + 1:],
+                                                   text, word_start + 1):
+                index = word_start
+        score += MATCH_SCORE
+        if index == previous + 1:
+            score += CONSECUTIVE_BONUS
+        else:
+            score -= min((index - previous - 1) * GAP_PENALTY,
+                         MAX_GAP_PENALTY)
+        if _is_word_start(text, index):
+            score += WORD_START_BONUS
+        previous = index
+    return score
+
+
+def fuzzy_score(query: str, text: str) -> float | None:
+    """
+    Score a casefolded query against a casefolded text it must match as a
+    subsequence, None when it doesn't. Consecutive characters and the start of
+    words earn bonuses, and the characters skipped between matches cost points.
+    """
+    if not query:
+        return 0
+    best = None
+    start = text.find(query[0])
+    tries = 0
+    while start != -1 and tries < MAX_FUZZY_STARTS:
+        # Besides the first occurrence, only try the ones starting a word
+        if tries == 0 or _is_word_start(text, start):
+            score = _score_from(query, text, start)
+            if score is None:
+                # Later starts have even fewer characters left to match
+                break
+            best = score if best is None else max(best, score)
+            tries += 1
+        start = text.find(query[0], start + 1)
+    if best is not None and text.startswith(query):
+        best += PREFIX_BONUS
+    return best
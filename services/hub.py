@@ -0,0 +1,107 @@
+from typing import Callable
+
+from gi.repository import GObject  # type: ignore
+
+from services.logger import logger
+
+
+class ServiceHub:
+    """
+    Per-process registry owning a single instance of each shared data source.
+    Widgets subscribe to provider signals through the hub, so any number of bars
+    share the same timers, subprocess pollers and HTTP clients.
+
+    The live counters can be inspected through the IPC surface:
+    `fabric-cli exec my-shell 'hub.log_stats()'`
+    """
+
+    def __init__(self):
+        self._factories: dict[str, Callable[[], GObject.Object]] = {}
+        self._providers: dict[str, GObject.Object] = {}
+        self._subscriptions: dict[str, set[int]] = {}
+
+    def register(self, name: str, factory: Callable[[],
+                                                    GObject.Object]) -> None:
+        """Register the factory used to build the provider the first time it is requested"""
+        self._factories[name] = factory
+
+    def get(self, name: str) -> GObject.Object:
+        """Return the shared provider registered under `name`, starting it if needed"""
+        if name not in self._providers:
+            if name not in self._factories:
+                raise KeyError(f"No provider registered under '{name}'")
+            self._providers[name] = self._factories[name]()
+            self._subscriptions[name] = set()
+            logger.debug(f"Service hub started provider '{name}'")
+        return self._providers[name]
+
+    def subscribe(self,
+                  name: str,
+                  signal: str,
+                  callback: Callable,
+                  owner: GObject.Object | None = None) -> int:
+        """
+        Connect `callback` to a signal of the shared provider.
+
+        :param name: The name of the provider.
+        :param signal: The provider signal to connect to.
+        :param callback: The callback to connect.
+        :param owner: Widget owning the subscription, released automatically when it is destroyed.
+        :return: The handler id, to be passed to `unsubscribe`.
+        """
+        provider = self.get(name)
+        handler_id = provider.connect(signal, callback)
+        self._subscriptions[name].add(handler_id)
+        if owner is not None:
+            owner.connect("destroy",
+                          lambda *_: self.unsubscribe(name, handler_id))
+        return handler_id
+
+    def unsubscribe(self, name: str, handler_id: int) -> None:
+        """Disconnect a subscription made with `subscribe`"""
+        subscriptions = self._subscriptions.get(name)
+        if not subscriptions or handler_id not in subscriptions:
+            return
+        subscriptions.remove(handler_id)
+        self._providers[name].disconnect(handler_id)
+
+    def stats(self) -> dict:
+        """Return the number of live providers and subscribers"""
+        return {
+            "providers": len(self._providers),
+            "subscribers": sum(len(s) for s in self._subscriptions.values()),
+            "by_provider": {
+                name: len(subscriptions)
+                for name, subscriptions in self._subscriptions.items()
+            },
+        }
+
+    def log_stats(self) -> dict:
+        """Log and return the number of live providers and subscribers"""
+        stats = self.stats()
+        logger.info(
+            f"Service hub: {stats['providers']} providers, {stats['subscribers']} subscribers {stats['by_provider']}"
+        )
+        return stats
+
+
+def _register_default_providers(hub: ServiceHub) -> None:
+    from services.app_index import AppIndex
+    from services.clipboard import ClipboardHistory
+    from services.clock import ClockProvider
+    from services.metrics import MetricsProvider
+    from services.power_profile import PowerProfileService
+    from services.tailscale import TailscaleProvider
+    from services.weather import WeatherWorker
+
+    hub.register("app_index", AppIndex)
+    hub.register("clipboard", ClipboardHistory)
+    hub.register("clock", ClockProvider)
+    hub.register("metrics", MetricsProvider)
+    hub.register("power_profile", PowerProfileService)
+    hub.register("tailscale", TailscaleProvider)
+    hub.register("weather", WeatherWorker)
+
+
+hub = ServiceHub()
+_register_default_providers(hub)
@@ -1,14 +1,138 @@
-import psutil
+import glob
+import os
+
+import numpy as np
+from fabric.core.service import Service, Signal
 from gi.repository import GLib
 
+from services.config import config
+from services.logger import logger
+
+# hwmon drivers exposing the CPU temperature, by order of preference, with the labels to average
+CPU_HWMON_SENSORS = {
+    "coretemp": ("Core", ),
+    "k10temp": ("Tdie", "Tctl"),
+    "zenpower": ("Tdie", "Tctl"),
+    "cpu_thermal": (),
+}
+CPU_THERMAL_ZONES = ("x86_pkg_temp", "cpu-thermal", "cpu_thermal", "acpitz")
+
+
+class MetricHistory:
+    """Fixed-size ring buffer keeping the last samples of a metric"""
+
+    def __init__(self, size: int):
+        self._values = np.full(max(size, 1), np.nan, dtype=np.float32)
+        self._index = 0
+        self._count = 0
+
+    def append(self, value: float) -> None:
+        self._values[self._index] = value
+        self._index = (self._index + 1) % len(self._values)
+        self._count = min(self._count + 1, len(self._values))
+
+    def values(self) -> np.ndarray:
+        """Return the recorded samples, oldest first"""
+        if self._count < len(self._values):
+            return self._values[:self._count].copy()
+        return np.roll(self._values, -self._index)
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class SysFile:
+    """A /proc or /sys file opened once and re-read from the start on every sample"""
 
-class MetricsProvider:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY)
+
+    def read(self, size: int = 4096) -> str:
+        return os.pread(self._fd, size, 0).decode()
+
+    def read_int(self) -> int:
+        return int(self.read(64))
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def _open_optional(path: str) -> SysFile | None:
+    try:
+        return SysFile(path)
+    except OSError:
+        return None
+
+
+def _read_text(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def resolve_cpu_temperature_files() -> list[SysFile]:
+    """
+    Find the files holding the CPU temperature, trying the coretemp, k10temp and
+    zenpower hwmon drivers first and the thermal zones last.
+    """
+    hwmons = {
+        _read_text(os.path.join(hwmon, "name")): hwmon
+        for hwmon in sorted(glob.glob("/sys/class/hwmon/hwmon*"))
+    }
+    for driver, labels in CPU_HWMON_SENSORS.items():
+        if driver not in hwmons:
+            continue
+        inputs = sorted(glob.glob(os.path.join(hwmons[driver],
+                                               "temp*_input")))
+        labelled = {
+            _read_text(path.replace("_input", "_label")): path
+            for path in inputs
+        }
+        paths = []
+        for label in labels:
+            paths = [
+                path for name, path in labelled.items()
+                if name.startswith(label)
+            ]
+            if paths:
+                break
+        files = [f for f in map(_open_optional, paths or inputs[:1]) if f]
+        if files:
+            return files
+
+    zones = sorted(glob.glob("/sys/class/thermal/thermal_zone*"))
+    by_type = {_read_text(os.path.join(zone, "type")): zone for zone in zones}
+    for zone_type in CPU_THERMAL_ZONES:
+        if zone_type in by_type:
+            f = _open_optional(os.path.join(by_type[zone_type], "temp"))
+            if f:
+                return [f]
+    if zones:
+        f = _open_optional(os.path.join(zones[0], "temp"))
+        if f:
+            return [f]
+    logger.warning("No CPU temperature sensor found")
+    return []
+
+
+class MetricsProvider(Service):
     """
     Class responsible for obtaining centralized CPU, memory and battery metrics.
     It updates periodically so that all widgets querying it display the same values.
+
+    The sources are opened once and re-read with `pread` on every tick, and the last
+    METRICS.HISTORY_MINUTES of every metric are kept in a ring buffer (see `get_history`).
     """
 
-    def __init__(self):
+    @Signal
+    def changed(self) -> None:
+        ...
+
+    def __init__(self, interval: int = 1, **kwargs):
+        super().__init__(**kwargs)
         self.cpu = 0.0
         self.mem = 0.0
         self.temp = 0.0
@@ -16,24 +140,98 @@ class MetricsProvider:
         self.bat_percent = 0.0
         self.bat_charging = None
 
-        GLib.timeout_add_seconds(1, self._update)
+        history_size = int(
+            config.get('METRICS', 'HISTORY_MINUTES', default=10) * 60 /
+            interval)
+        self.history = {
+            name: MetricHistory(history_size)
+            for name in ("cpu", "mem", "temp", "battery")
+        }
 
-    def _update(self):
-        self.cpu = psutil.cpu_percent(interval=0)
-        self.mem = psutil.virtual_memory().percent
-        self.temp = psutil.sensors_temperatures()["coretemp"][0]
-        temps = psutil.sensors_temperatures()["coretemp"]
-        core_temps = [t.current for t in temps if t.label.startswith("Core")]
-        self.temp = sum(core_temps) / len(core_temps)
-
-        battery = psutil.sensors_battery()
-        if battery is None:
+        self._stat = SysFile("/proc/stat")
+        self._meminfo = SysFile("/proc/meminfo")
+        self._temperatures = resolve_cpu_temperature_files()
+        (self._battery, self._battery_status,
+         self._ac_online) = self._resolve_power_supply()
+        self._cpu_times = self._read_cpu_times()
+
+        GLib.timeout_add_seconds(interval, self._update)
+
+    def _resolve_power_supply(
+            self) -> tuple[SysFile | None, SysFile | None, SysFile | None]:
+        battery = status = ac_online = None
+        for supply in sorted(glob.glob("/sys/class/power_supply/*")):
+            supply_type = _read_text(os.path.join(supply, "type"))
+            if supply_type == "Battery" and battery is None:
+                battery = _open_optional(os.path.join(supply, "capacity"))
+                status = _open_optional(os.path.join(supply, "status"))
+            elif supply_type == "Mains" and ac_online is None:
+                ac_online = _open_optional(os.path.join(supply, "online"))
+        return battery, status, ac_online
+
+    def _read_cpu_times(self) -> tuple[int, int]:
+        """Return the (busy, total) jiffies of the aggregated cpu line of /proc/stat"""
+        cpu_line = self._stat.read(512).split("\n", 1)[0]
+        fields = [int(v) for v in cpu_line.split()[1:]]
+        # guest and guest_nice are already accounted in user and nice
+        total = sum(fields[:8])
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+        return total - idle, total
+
+    def _read_memory_percent(self) -> float:
+        meminfo = {}
+        for line in self._meminfo.read(8192).splitlines():
+            key, _, value = line.partition(":")
+            if key in ("MemTotal", "MemAvailable"):
+                meminfo[key] = int(value.split()[0])
+                if len(meminfo) == 2:
+                    break
+        total = meminfo.get("MemTotal", 0)
+        if not total:
+            return 0.0
+        return (total - meminfo.get("MemAvailable", total)) / total * 100
+
+    def _read_temperature(self) -> float:
+        values = []
+        for f in self._temperatures:
+            try:
+                values.append(f.read_int() / 1000)
+            except (OSError, ValueError):
+                continue
+        return sum(values) / len(values) if values else 0.0
+
+    def _read_battery(self) -> None:
+        if self._battery is None:
+            self.bat_percent = 0.0
+            self.bat_charging = None
+            return
+        try:
+            self.bat_percent = float(self._battery.read_int())
+            if self._ac_online is not None:
+                self.bat_charging = self._ac_online.read_int() == 1
+            elif self._battery_status is not None:
+                self.bat_charging = self._battery_status.read().strip() in (
+                    "Charging", "Full")
+        except (OSError, ValueError):
             self.bat_percent = 0.0
             self.bat_charging = None
-        else:
-            self.bat_percent = battery.percent
-            self.bat_charging = battery.power_plugged
 
+    def _update(self):
+        busy, total = self._read_cpu_times()
+        previous_busy, previous_total = self._cpu_times
+        self._cpu_times = (busy, total)
+        if total > previous_total:
+            self.cpu = (busy - previous_busy) / (total - previous_total) * 100
+        self.mem = self._read_memory_percent()
+        self.temp = self._read_temperature()
+        self._read_battery()
+
+        self.history["cpu"].append(self.cpu)
+        self.history["mem"].append(self.mem)
+        self.history["temp"].append(self.temp)
+        self.history["battery"].append(self.bat_percent)
+
+        self.emit("changed")
         return True
 
     def get_metrics(self) -> tuple[float, float, float]:
@@ -42,5 +240,6 @@ class MetricsProvider:
     def get_battery(self) -> tuple[float, bool]:
         return (self.bat_percent, self.bat_charging or False)
 
-
-shared_provider = MetricsProvider()
+    def get_history(self, metric: str) -> np.ndarray:
+        """Return the recorded samples of a metric (cpu, mem, temp or battery), oldest first"""
+        return self.history[metric].values()
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from gi.repository import GdkPixbuf, GLib  # type: ignore
+
+from services.config import config
+from services.logger import logger
+
+CACHE_DIR = os.path.join(GLib.get_user_cache_dir(), config['APP_NAME'],
+                         "notifications", "images")
+# Images used to be cached per notification there, they are still cleaned up when released
+LEGACY_CACHE_DIR = f"/tmp/{config['APP_NAME']}/notifications"
+IMAGE_SIZE = 48
+MAX_DECODED_IMAGES = 128
+WORKERS = 2
+
+
+class NotificationImageCache:
+    """
+    Off the main thread pipeline for the notification images.
+
+    Images are hashed by content and stored once, scaled down, in the XDG cache
+    directory, so an avatar sent by hundreds of notifications is a single file.
+    Decoding happens on a worker pool and the last decoded pixbufs are kept in an
+    LRU. Results are always delivered on the main loop.
+
+    Cached files are reference counted (`acquire`/`release`) by the popups and the
+    history entries using them, and deleted when the last one lets them go. The
+    persisted history takes a reference on each of its images when it loads, so
+    they are deleted once their entries are deleted or evicted.
+    """
+
+    def __init__(self,
+                 directory: str = CACHE_DIR,
+                 max_decoded: int = MAX_DECODED_IMAGES,
+                 workers: int = WORKERS):
+        """
+        Parameters:
+          directory (string): Where the scaled images are stored
+          max_decoded (int): Number of decoded pixbufs kept in memory
+          workers (int): Number of threads hashing, encoding and decoding images
+        """
+        self.directory = directory
+        self.max_decoded = max_decoded
+        self._decoded: OrderedDict[tuple[str, int],
+                                   GdkPixbuf.Pixbuf | None] = OrderedDict()
+        self._pending: dict[tuple[str, int], list[Callable]] = {}
+        self._refcounts: dict[str, int] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="notification-images")
+
+    def store(self, pixbuf: GdkPixbuf.Pixbuf,
+              callback: Callable[[str | None], None]) -> None:
+        """
+        Cache an image in the background. The callback receives its path (None on
+        failure), with a reference already acquired for the caller.
+        """
+        self._executor.submit(self._store_worker, pixbuf, callback)
+
+    def _store_worker(self, pixbuf: GdkPixbuf.Pixbuf,
+                      callback: Callable[[str | None], None]) -> None:
+        try:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(
+                f"{pixbuf.get_width()}x{pixbuf.get_height()}:{pixbuf.get_rowstride()}:{pixbuf.get_has_alpha()}"
+                .encode())
+            digest.update(pixbuf.read_pixel_bytes().get_data())
+            path = os.path.join(self.directory, f"{digest.hexdigest()}.png")
+            scaled = pixbuf.scale_simple(IMAGE_SIZE, IMAGE_SIZE,
+                                         GdkPixbuf.InterpType.BILINEAR)
+            if not os.path.exists(path):
+                os.makedirs(self.directory, exist_ok=True)
+                # Write then rename, so a reader never sees a partial file
+                temporary_path = f"{path}.{threading.get_ident()}.tmp"
+                scaled.savev(temporary_path, "png", [], [])
+                os.replace(temporary_path, path)
+        except Exception as e:
+            logger.error(f"Failed to cache notification image: {e}")
+            GLib.idle_add(self._deliver, callback, None)
+            return
+        GLib.idle_add(self._on_stored, pixbuf, path, scaled, callback)
+
+    def _on_stored(self, pixbuf: GdkPixbuf.Pixbuf, path: str,
+                   scaled: GdkPixbuf.Pixbuf,
+                   callback: Callable[[str | None], None]) -> bool:
+        if not os.path.exists(path):
+            # Released and deleted in the meantime, write it again
+            self.store(pixbuf, callback)
+            return False
+        self.acquire(path)
+        self._remember((path, IMAGE_SIZE), scaled)
+        callback(path)
+        return False
+
+    def _deliver(self, callback: Callable, value) -> bool:
+        callback(value)
+        return False
+
+    def load(self, path: str, size: int,
+             callback: Callable[[GdkPixbuf.Pixbuf | None], None]) -> None:
+        """
+        Pass the decoded image at the given size (None when it can't be loaded) to
+        the callback, right away when it is in memory and from the main loop otherwise.
+        """
+        key = (path, size)
+        if key in self._decoded:
+            self._decoded.move_to_end(key)
+            callback(self._decoded[key])
+            return
+        if key in self._pending:
+            self._pending[key].append(callback)
+            return
+        self._pending[key] = [callback]
+        self._executor.submit(self._load_worker, key)
+
+    def _load_worker(self, key: tuple[str, int]) -> None:
+        path, size = key
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
+                path, size, size, False)
+        except Exception as e:
+            logger.warning(f"Failed to load notification image {path}: {e}")
+            pixbuf = None
+        GLib.idle_add(self._on_loaded, key, pixbuf)
+
+    def _on_loaded(self, key: tuple[str, int],
+                   pixbuf: GdkPixbuf.Pixbuf | None) -> bool:
+        self._remember(key, pixbuf)
+        for callback in self._pending.pop(key, []):
+            callback(pixbuf)
+        return False
+
+    def _remember(self, key: tuple[str, int],
+                  pixbuf: GdkPixbuf.Pixbuf | None) -> None:
+        self._decoded[key] = pixbuf
+        self._decoded.move_to_end(key)
+        while len(self._decoded) > self.max_decoded:
+            self._decoded.popitem(last=False)
+
+    def acquire(self, path: str | None) -> None:
+        """Take a reference on a cached image"""
+        if path:
+            self._refcounts[path] = self._refcounts.get(path, 0) + 1
+
+    def release(self, path: str | None) -> None:
+        """Drop a reference on a cached image, deleting it with the last one"""
+        if not path or path not in self._refcounts:
+            return
+        self._refcounts[path] -= 1
+        if self._refcounts[path] > 0:
+            return
+        del self._refcounts[path]
+        for key in [key for key in self._decoded if key[0] == path]:
+            del self._decoded[key]
+        if os.path.dirname(path) not in (self.directory, LEGACY_CACHE_DIR):
+            return
+        try:
+            os.remove(path)
+            logger.debug(f"Deleted cached image: {path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error deleting cached image {path}: {e}")
+
+
+def app_icon_path(app_icon: str | None) -> str | None:
+    """Return the file of a notification app icon, None when it is an icon name"""
+    if not app_icon:
+        return None
+    if app_icon.startswith("file://"):
+        app_icon = app_icon[7:]
+    return app_icon if os.path.isabs(app_icon) else None
+
+
+image_cache = NotificationImageCache()
@@ -0,0 +1,86 @@
+import bisect
+from datetime import datetime
+from typing import Hashable
+
+
+class HistoryIndex:
+    """
+    Sorted index of the notification history rows (newest first), grouped in date buckets.
+
+    The history list is a flat sequence of date separators and rows: every bucket
+    starts with its separator, followed by its rows. Inserting or removing a row
+    returns where the change happens in that sequence, so the view only has to
+    touch the affected row and at most one separator.
+    """
+
+    def __init__(self):
+        self._keys: list[tuple[float, int]] = []
+        self._days: list[int] = []
+        self._bucket_sizes: dict[int, int] = {}
+        self._entries: dict[Hashable, tuple[tuple[float, int], int]] = {}
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._entries
+
+    @staticmethod
+    def day_of(arrival: datetime) -> int:
+        """Bucket key of a date, sorting the most recent day first"""
+        return -arrival.date().toordinal()
+
+    def insert(self, item: Hashable,
+               arrival: datetime) -> tuple[int, int | None, int]:
+        """
+        Insert a row.
+
+        :param item: The row, must not already be in the index.
+        :param arrival: The arrival time used to order the row.
+        :return: The position of the row in the flat sequence, the position of the
+            separator to create if the row starts a new bucket (None otherwise) and
+            the bucket key.
+        """
+        # Among rows arrived at the same time, the last inserted comes first
+        key = (-arrival.timestamp(), -self._sequence)
+        self._sequence += 1
+        day = self.day_of(arrival)
+
+        row_index = bisect.bisect_left(self._keys, key)
+        self._keys.insert(row_index, key)
+        self._entries[item] = (key, day)
+
+        bucket_index = bisect.bisect_left(self._days, day)
+        separator_position = None
+        if day not in self._bucket_sizes:
+            self._days.insert(bucket_index, day)
+            self._bucket_sizes[day] = 0
+            separator_position = row_index + bucket_index
+        self._bucket_sizes[day] += 1
+        return row_index + bucket_index + 1, separator_position, day
+
+    def remove(self, item: Hashable) -> tuple[int, int, bool]:
+        """
+        Remove a row.
+
+        :param item: The row to remove.
+        :return: The position the row had in the flat sequence, its bucket key and
+            whether the bucket is now empty (meaning its separator, right before
+            the row, has to be removed).
+        """
+        key, day = self._entries.pop(item)
+        row_index = bisect.bisect_left(self._keys, key)
+        bucket_index = bisect.bisect_left(self._days, day)
+        del self._keys[row_index]
+        self._bucket_sizes[day] -= 1
+        position = row_index + bucket_index + 1
+        if self._bucket_sizes[day] > 0:
+            return position, day, False
+        del self._bucket_sizes[day]
+        del self._days[bucket_index]
+        return position, day, True
+
+    def days(self) -> list[int]:
+        """Return the bucket keys, most recent first"""
+        return list(self._days)
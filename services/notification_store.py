@@ -0,0 +1,121 @@
+import json
+import os
+import sqlite3
+
+from services.logger import logger
+
+FIELDS = ("id", "app_icon", "summary", "body", "app_name", "timestamp",
+          "cached_image_path")
+
+
+class NotificationStore:
+    """
+    SQLite (WAL) backed notification history.
+    Every add or delete only touches the affected rows instead of rewriting the
+    whole history, and the number of kept notifications is capped by `retention`.
+    """
+
+    def __init__(self, path: str, retention: int = 50):
+        """
+        Parameters:
+          path (string): Location of the database file
+          retention (int): Maximum number of notifications kept
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.retention = retention
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS notifications (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                app_icon TEXT,
+                summary TEXT,
+                body TEXT,
+                app_name TEXT,
+                timestamp TEXT,
+                cached_image_path TEXT
+            )
+        """)
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS notifications_app_name ON notifications (app_name)"
+        )
+
+    def _to_note(self, row: sqlite3.Row) -> dict:
+        return {field: row[field] for field in FIELDS}
+
+    def all(self) -> list[dict]:
+        """Return every stored notification, newest first"""
+        rows = self._db.execute(
+            f"SELECT {', '.join(FIELDS)} FROM notifications ORDER BY seq DESC")
+        return [self._to_note(row) for row in rows]
+
+    def count(self) -> int:
+        return self._db.execute(
+            "SELECT COUNT(*) FROM notifications").fetchone()[0]
+
+    def add(self, note: dict) -> list[dict]:
+        """Store a notification and return the ones evicted by the retention cap"""
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                f"INSERT OR REPLACE INTO notifications ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                [str(note.get(field)) if field == "id" else note.get(field)
+                 for field in FIELDS],
+            )
+            return self._evict()
+
+    def _evict(self) -> list[dict]:
+        rows = self._db.execute(
+            f"SELECT seq, {', '.join(FIELDS)} FROM notifications ORDER BY seq DESC LIMIT -1 OFFSET ?",
+            (max(self.retention, 0),),
+        ).fetchall()
+        if rows:
+            self._db.execute("DELETE FROM notifications WHERE seq <= ?",
+                             (rows[0]["seq"],))
+        return [self._to_note(row) for row in rows]
+
+    def delete(self, note_id: str) -> bool:
+        """Delete a notification by id, returning whether it was stored"""
+        cursor = self._db.execute("DELETE FROM notifications WHERE id = ?",
+                                  (str(note_id),))
+        return cursor.rowcount > 0
+
+    def set_image(self, note_id: str, cached_image_path: str) -> None:
+        self._db.execute(
+            "UPDATE notifications SET cached_image_path = ? WHERE id = ?",
+            (cached_image_path, str(note_id)))
+
+    def delete_app(self, app_name: str) -> list[dict]:
+        """Delete every notification of an app and return them"""
+        with self._db:
+            self._db.execute("BEGIN")
+            rows = self._db.execute(
+                f"SELECT {', '.join(FIELDS)} FROM notifications WHERE app_name = ?",
+                (app_name,),
+            ).fetchall()
+            self._db.execute("DELETE FROM notifications WHERE app_name = ?",
+                             (app_name,))
+        return [self._to_note(row) for row in rows]
+
+    def clear(self) -> None:
+        self._db.execute("DELETE FROM notifications")
+
+    def ids(self) -> set[str]:
+        return {
+            row[0] for row in self._db.execute("SELECT id FROM notifications")
+        }
+
+    def import_json(self, path: str) -> None:
+        """Import a legacy JSON history file (newest first) and delete it"""
+        try:
+            with open(path, "r") as f:
+                notes = json.load(f)
+            for note in reversed(notes):
+                self.add(note)
+            os.remove(path)
+            logger.info(f"Imported {len(notes)} notifications from {path}")
+        except Exception as e:
+            logger.error(f"Error importing notification history {path}: {e}")
@@ -0,0 +1,105 @@
+import time
+from typing import Callable, Hashable
+
+
+class TokenBucket:
+    """Token bucket allowing `capacity` events at once, then `rate` events per second"""
+
+    def __init__(self, capacity: int, rate: float, now: float):
+        self.capacity = max(capacity, 1)
+        self.rate = rate
+        self.tokens = float(self.capacity)
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        """Consume a token if one is available"""
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class NotificationThrottle:
+    """
+    Decides how an incoming notification is displayed, so a misbehaving app costs
+    a single popup instead of one per notification:
+
+    - Notifications sharing a replace key (the app and its synchronous hint, or
+      its summary) replace each other, every notification of a `replace_apps`
+      app shares the same key.
+    - Identical notifications arriving within `coalesce_window` seconds of each
+      other are collapsed into a counter.
+    - Every app has a token bucket of `burst` notifications, refilled by `rate`
+      per second. Past that, notifications are collapsed into the app's last popup.
+    """
+
+    def __init__(self,
+                 burst: int = 5,
+                 rate: float = 1,
+                 coalesce_window: float = 5,
+                 replace_apps: list[str] | None = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Parameters:
+          burst (int): Number of notifications an app can send at once
+          rate (float): Number of notifications per second an app can send afterwards
+          coalesce_window (float): Delay, in seconds, under which identical notifications are collapsed
+          replace_apps (list): Apps whose notifications always replace the previous one
+          clock (callable): Monotonic time source, in seconds
+        """
+        self.burst = burst
+        self.rate = rate
+        self.coalesce_window = coalesce_window
+        self.replace_apps = set(replace_apps or [])
+        self._clock = clock
+        self._buckets: dict[str, TokenBucket] = {}
+        self._last_seen: dict[Hashable, tuple[str, float]] = {}
+
+    def replace_key(self, app_name: str, summary: str,
+                    synchronous_hint: str | None) -> Hashable:
+        """Return the key shared by the notifications replacing each other"""
+        if app_name in self.replace_apps:
+            return (app_name, )
+        if synchronous_hint:
+            return (app_name, "synchronous", synchronous_hint)
+        return (app_name, "summary", summary)
+
+    def is_repeat(self, key: Hashable, content: str) -> bool:
+        """
+        Record a notification and return whether it repeats the previous one with
+        the same key (same content, within the coalesce window).
+        """
+        now = self._clock()
+        previous = self._last_seen.get(key)
+        self._last_seen[key] = (content, now)
+        return (previous is not None and previous[0] == content and
+                now - previous[1] <= self.coalesce_window)
+
+    def allow(self, app_name: str) -> bool:
+        """Take a token from the bucket of an app, returning False when it is rate limited"""
+        now = self._clock()
+        bucket = self._buckets.get(app_name)
+        if bucket is None:
+            bucket = self._buckets[app_name] = TokenBucket(
+                self.burst, self.rate, now)
+        return bucket.take(now)
+
+    def prune(self) -> None:
+        """Forget the apps and keys that have been quiet long enough to be back to their initial state"""
+        now = self._clock()
+        self._buckets = {
+            app: bucket
+            for app, bucket in self._buckets.items()
+            if not bucket.is_full(now)
+        }
+        self._last_seen = {
+            key: seen
+            for key, seen in self._last_seen.items()
+            if now - seen[1] <= self.coalesce_window
+        }
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from fabric.utils import exec_shell_command_async
+from gi.repository import GLib  # type: ignore
+
+from services.color_templates import (PaletteError, parse_palette,
+                                      render_template)
+from services.config import config
+from services.logger import logger
+
+APP_LOCATION = os.path.expanduser(f"~/.config/{config['APP_NAME']}")
+PALETTE_DIR = os.path.join(GLib.get_user_cache_dir(), config['APP_NAME'],
+                           "palettes")
+# Templates rendered by matugen and by the palette cache, by name: (input, output)
+TEMPLATES = {
+    "hyprland": (
+        os.path.join(APP_LOCATION,
+                     "config/matugen/templates/hyprland-colors.conf"),
+        os.path.join(APP_LOCATION, "config/hypr/colors.conf"),
+    ),
+    config['APP_NAME']: (
+        os.path.join(APP_LOCATION,
+                     f"config/matugen/templates/{config['APP_NAME']}.css"),
+        os.path.join(APP_LOCATION, "styles/colors.mcss"),
+    ),
+    "kitty": (
+        os.path.join(APP_LOCATION, "config/matugen/templates/kitty.conf"),
+        "~/.config/kitty/colors.conf",
+    ),
+}
+WALLPAPER_COMMAND = [
+    "swww", "img", "--transition-type", "grow", "--transition-pos",
+    "0.854,0.033", "--transition-step", "90", "--transition-fps", "60", "-f",
+    "Nearest"
+]
+MATUGEN_TIMEOUT = 30  # in seconds
+
+
+def _write_atomic(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Not ending with the original extension, so the style monitor ignores it
+    temporary_path = os.path.join(os.path.dirname(path),
+                                  f".{os.path.basename(path)}.tmp")
+    with open(temporary_path, "w") as f:
+        f.write(content)
+    os.replace(temporary_path, path)
+
+
+class PaletteCache:
+    """
+    Matugen palettes of the wallpapers, computed once per image content and
+    stored as JSON in the cache directory.
+
+    Applying a wallpaper whose palette is known renders the color templates
+    directly, in milliseconds, instead of running matugen on the whole image.
+    Palettes can also be computed ahead of time, in the background. When a
+    palette or a template can't be handled, `matugen image` runs as before.
+    """
+
+    def __init__(self, directory: str = PALETTE_DIR):
+        """
+        Parameters:
+          directory (string): Where the palettes are stored
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        # Content hashes by real path, valid while (mtime, size) is unchanged
+        self._digests: dict[str, tuple[int, int, str]] = {}
+        # Incremented by every apply, so only the last one writes the templates
+        self._generation = 0
+        self._applier = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix="palettes")
+        self._precomputer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="palettes-precompute")
+
+    def digest(self, path: str) -> str:
+        """SHA-256 of the content of an image, hashed again only when it changes"""
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        with self._lock:
+            known = self._digests.get(path)
+        if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            return known[2]
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        with self._lock:
+            self._digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def get(self, path: str) -> dict[str, str] | None:
+        """Return the stored palette of an image, None when it isn't known yet"""
+        try:
+            with open(os.path.join(self.directory, f"{self.digest(path)}.json"),
+                      "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring the cached palette of {path}: {e}")
+            return None
+
+    def compute(self, path: str) -> dict[str, str]:
+        """Return the palette of an image, running matugen when it isn't known yet"""
+        palette = self.get(path)
+        if palette is not None:
+            return palette
+        try:
+            output = subprocess.run(
+                ["matugen", "image", path, "--dry-run", "--json", "hex"],
+                capture_output=True,
+                check=True,
+                timeout=MATUGEN_TIMEOUT).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            raise PaletteError(f"matugen failed on {path}: {e}") from e
+        palette = parse_palette(output.decode("utf-8", errors="replace"))
+        try:
+            _write_atomic(
+                os.path.join(self.directory, f"{self.digest(path)}.json"),
+                json.dumps(palette))
+        except OSError as e:
+            logger.error(f"Failed to save the palette of {path}: {e}")
+        return palette
+
+    def precompute(self, paths: Iterable[str]) -> None:
+        """Compute the missing palettes in the background, one image at a time"""
+        for path in paths:
+            self._precomputer.submit(self._precompute, path)
+
+    def _precompute(self, path: str) -> None:
+        try:
+            self.compute(path)
+        except Exception as e:
+            logger.warning(f"Failed to precompute the palette of {path}: {e}")
+
+    def apply(self, path: str) -> None:
+        """Set an image as the wallpaper and theme the shell, Hyprland and kitty after it"""
+        self._generation += 1
+        exec_shell_command_async([*WALLPAPER_COMMAND, path])
+        self._applier.submit(self._apply, path, self._generation)
+
+    def _apply(self, path: str, generation: int) -> None:
+        try:
+            palette = self.compute(path)
+            rendered = []
+            for input_path, output_path in TEMPLATES.values():
+                with open(input_path, "r") as f:
+                    rendered.append((os.path.expanduser(output_path),
+                                     render_template(f.read(), palette, path)))
+        except Exception as e:
+            logger.warning(f"Falling back to matugen for {path}: {e}")
+            GLib.idle_add(self._run_matugen, path, generation)
+            return
+        if generation != self._generation:
+            # Another wallpaper was chosen in the meantime
+            return
+        try:
+            for output_path, content in rendered:
+                _write_atomic(output_path, content)
+        except OSError as e:
+            logger.error(f"Failed to write the colors of {path}: {e}")
+            return
+        # The shell reloads its styles when colors.mcss changes, Hyprland its
+        # sourced config, kitty needs a signal
+        GLib.idle_add(self._reload_apps)
+
+    def _reload_apps(self) -> bool:
+        exec_shell_command_async(["pkill", "-USR1", "-x", "kitty"])
+        return False
+
+    def _run_matugen(self, path: str, generation: int) -> bool:
+        # The wallpaper is already set, matugen is configured not to set it again
+        if generation == self._generation:
+            exec_shell_command_async(["matugen", "image", path])
+        return False
+
+
+palette_cache = PaletteCache()
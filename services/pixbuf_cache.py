@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from typing import Callable
+
+from gi.repository import GdkPixbuf  # type: ignore
+
+MAX_BYTES = 32 * 1024 * 1024
+
+
+class PixbufCache:
+    """
+    LRU of decoded pixbufs by key, bounded by the memory taken by their pixels
+    rather than by their count.
+
+    `on_evict` is called with the key of every pixbuf pushed out by the budget,
+    so the widgets showing it can let it go too; the memory is only freed once
+    nothing references it. Keys can be marked recently used without a lookup
+    (`touch`), e.g. for the items on screen so the others are evicted first.
+    """
+
+    def __init__(self,
+                 max_bytes: int = MAX_BYTES,
+                 on_evict: Callable[[str], None] | None = None):
+        """
+        Parameters:
+          max_bytes (int): Size of the pixels kept in memory, in bytes
+          on_evict (callable): Receives the key of each evicted pixbuf
+        """
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._pixbufs: OrderedDict[str, GdkPixbuf.Pixbuf] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._pixbufs)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._pixbufs
+
+    def get(self, key: str) -> GdkPixbuf.Pixbuf | None:
+        pixbuf = self._pixbufs.get(key)
+        if pixbuf is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._pixbufs.move_to_end(key)
+        return pixbuf
+
+    def put(self, key: str, pixbuf: GdkPixbuf.Pixbuf) -> None:
+        self.discard(key)
+        size = pixbuf.get_byte_length()
+        self._pixbufs[key] = pixbuf
+        self._sizes[key] = size
+        self.bytes += size
+        # The pixbuf just added is kept, even if it exceeds the budget alone
+        while self.bytes > self.max_bytes and len(self._pixbufs) > 1:
+            evicted, _ = self._pixbufs.popitem(last=False)
+            self.bytes -= self._sizes.pop(evicted)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+
+    def touch(self, key: str) -> None:
+        """Mark a pixbuf as recently used"""
+        if key in self._pixbufs:
+            self._pixbufs.move_to_end(key)
+
+    def discard(self, key: str) -> None:
+        """Drop a pixbuf, e.g. when its source changed, without calling on_evict"""
+        if self._pixbufs.pop(key, None) is not None:
+            self.bytes -= self._sizes.pop(key)
+
+    def clear(self) -> None:
+        self._pixbufs.clear()
+        self._sizes.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._pixbufs),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,147 @@
+from typing import Callable
+
+from fabric.core.service import Service, Signal
+from gi.repository import Gio, GLib  # type: ignore
+
+from services.logger import logger
+
+# Profiles are exposed with power-profiles-daemon names, mapped to tuned ones when needed
+TUNED_PROFILES = {
+    "power-saver": "powersave",
+    "balanced": "balanced",
+    "performance": "throughput-performance",
+}
+TUNED_BUS = ("com.redhat.tuned", "/Tuned", "com.redhat.tuned.control")
+PPD_BUSES = [
+    ("org.freedesktop.UPower.PowerProfiles",
+     "/org/freedesktop/UPower/PowerProfiles",
+     "org.freedesktop.UPower.PowerProfiles"),
+    ("net.hadess.PowerProfiles", "/net/hadess/PowerProfiles",
+     "net.hadess.PowerProfiles"),
+]
+
+
+class PowerProfileService(Service):
+    """
+    Service tracking the active power profile over D-Bus, using tuned when it
+    runs and power-profiles-daemon otherwise. `changed` is only emitted when
+    the daemon reports a new profile, nothing is polled.
+    """
+
+    @Signal
+    def changed(self, profile: str) -> None:
+        ...
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.profile: str | None = None
+        self.backend: str | None = None
+        self._proxy: Gio.DBusProxy | None = None
+        self._candidates = [("tuned", TUNED_BUS),
+                            *[("ppd", bus) for bus in PPD_BUSES]]
+        self._connect_next()
+
+    def get_profile(self) -> str | None:
+        return self.profile
+
+    def set_profile(self, profile: str) -> None:
+        """Switch to the given profile without blocking, the change is confirmed by the daemon"""
+        if self._proxy is None:
+            logger.warning(
+                f"No power profile daemon available to switch to {profile}")
+            return
+        if self.backend == "tuned":
+            self._call("switch_profile",
+                       GLib.Variant("(s)", (TUNED_PROFILES.get(profile,
+                                                               profile),)))
+        else:
+            self._call(
+                "org.freedesktop.DBus.Properties.Set",
+                GLib.Variant("(ssv)", (self._proxy.get_interface_name(),
+                                       "ActiveProfile",
+                                       GLib.Variant("s", profile))),
+            )
+
+    def _connect_next(self) -> None:
+        """Try the candidate daemons in order until one owns its bus name"""
+        if not self._candidates:
+            logger.warning("Neither tuned nor power-profiles-daemon is running")
+            return
+        backend, (name, path, interface) = self._candidates.pop(0)
+        Gio.DBusProxy.new_for_bus(
+            Gio.BusType.SYSTEM,
+            Gio.DBusProxyFlags.DO_NOT_AUTO_START,
+            None,
+            name,
+            path,
+            interface,
+            None,
+            lambda _, result: self._on_proxy_ready(backend, result),
+        )
+
+    def _on_proxy_ready(self, backend: str, result: Gio.AsyncResult) -> None:
+        try:
+            proxy = Gio.DBusProxy.new_for_bus_finish(result)
+        except GLib.Error as e:
+            logger.debug(f"Power profile backend {backend} unavailable: {e}")
+            self._connect_next()
+            return
+        if proxy.get_name_owner() is None:
+            self._connect_next()
+            return
+
+        self.backend = backend
+        self._proxy = proxy
+        proxy.connect("notify::g-name-owner", lambda *_: self._read_profile())
+        if backend == "tuned":
+            proxy.connect("g-signal", self._on_tuned_signal)
+        else:
+            proxy.connect("g-properties-changed",
+                          lambda *_: self._read_profile())
+        self._read_profile()
+
+    def _read_profile(self) -> None:
+        if self._proxy is None or self._proxy.get_name_owner() is None:
+            return
+        if self.backend == "tuned":
+            self._call("active_profile", None,
+                       lambda value: self._set_profile(value[0]))
+        else:
+            active = self._proxy.get_cached_property("ActiveProfile")
+            if active is not None:
+                self._set_profile(active.unpack())
+
+    def _on_tuned_signal(self, proxy: Gio.DBusProxy, sender: str, signal: str,
+                         parameters: GLib.Variant) -> None:
+        if signal != "profile_changed":
+            return
+        profile, success, _ = parameters.unpack()
+        if success:
+            self._set_profile(profile)
+
+    def _set_profile(self, profile: str) -> None:
+        # Normalize tuned profile names to the power-profiles-daemon ones
+        profile = next(
+            (name for name, tuned in TUNED_PROFILES.items() if tuned == profile),
+            profile)
+        if profile == self.profile:
+            return
+        self.profile = profile
+        self.emit("changed", profile)
+
+    def _call(self,
+              method: str,
+              parameters: GLib.Variant | None,
+              callback: Callable[[tuple], None] | None = None) -> None:
+
+        def on_finished(proxy: Gio.DBusProxy, result: Gio.AsyncResult) -> None:
+            try:
+                value = proxy.call_finish(result)
+            except GLib.Error as e:
+                logger.error(f"Power profile call {method} failed: {e}")
+                return
+            if callback:
+                callback(value.unpack())
+
+        self._proxy.call(method, parameters, Gio.DBusCallFlags.NONE, -1, None,
+                         on_finished)
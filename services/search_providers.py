@@ -0,0 +1,433 @@
+import heapq
+import json
+import os
+import subprocess
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+from urllib.parse import unquote, urlparse
+
+from fabric.hyprland.widgets import get_hyprland_connection
+from fabric.utils import exec_shell_command_async
+from gi.repository import GdkPixbuf, Gio, GLib  # type: ignore
+
+from services.app_index import icon_cache
+from services.fuzzy import fuzzy_score
+from services.hub import hub
+from services.logger import logger
+
+# Results delivered later than this are dropped, the user has moved on
+PROVIDER_TIMEOUT = 0.3  # in seconds
+PROVIDER_RESULTS = 8
+WORKERS = 4
+RECENT_FILES = os.path.join(GLib.get_user_data_dir(), "recently-used.xbel")
+# Hyprland events after which the list of the windows is outdated
+CLIENT_EVENTS = ("openwindow", "closewindow", "windowtitle", "movewindow",
+                 "renameworkspace")
+
+
+class SearchResult:
+    """Entry of the launcher results, whatever provider it comes from"""
+
+    __slots__ = ("title", "subtitle", "score", "activate", "icon_name",
+                 "get_icon")
+
+    def __init__(self,
+                 title: str,
+                 subtitle: str,
+                 score: float,
+                 activate: Callable[[], Any],
+                 icon_name: str | None = None,
+                 get_icon: Callable[[int], GdkPixbuf.Pixbuf | None]
+                 | None = None):
+        """
+        Parameters:
+          title (string): Main label
+          subtitle (string): Secondary label
+          score (float): Rank of the result, the higher the better
+          activate (callable): Called when the result is chosen
+          icon_name (string): Icon name or path
+          get_icon (callable): Return the icon at a given size, instead of icon_name
+        """
+        self.title = title
+        self.subtitle = subtitle
+        self.score = score
+        self.activate = activate
+        self.icon_name = icon_name
+        self.get_icon = get_icon
+
+    def get_icon_pixbuf(self, size: int) -> GdkPixbuf.Pixbuf | None:
+        if self.get_icon is not None:
+            return self.get_icon(size)
+        return icon_cache.get(self.icon_name, size) if self.icon_name else None
+
+
+class SearchProvider:
+    """
+    Source of launcher results besides the applications.
+
+    `search` runs on a worker thread: it must not touch widgets, should check
+    `cancelled` between slow steps, and has `timeout` seconds to return its
+    results before they are dropped. A provider with a prefix is only queried for
+    the queries starting with it, and then replaces the other results.
+    """
+
+    name = ""
+    prefix: str | None = None
+    min_query_length = 1
+    timeout = PROVIDER_TIMEOUT
+    max_results = PROVIDER_RESULTS
+    # Added to the fuzzy score of the results, ranking providers against each other
+    weight = 0.0
+
+    def accepts(self, query: str) -> str | None:
+        """Return the query to search for, None when this provider doesn't handle it"""
+        if self.prefix is not None:
+            if not query.startswith(self.prefix):
+                return None
+            query = query[len(self.prefix):]
+        query = query.strip()
+        return query if len(query) >= self.min_query_length else None
+
+    def search(self, query: str,
+               cancelled: threading.Event) -> list[SearchResult]:
+        raise NotImplementedError
+
+    def top(self, query: str, candidates: Iterable[Any],
+            text_of: Callable[[Any], str],
+            result_of: Callable[[Any, float], SearchResult],
+            cancelled: threading.Event) -> list[SearchResult]:
+        """Score candidates against the query and return the best ones as results"""
+        query = query.casefold()
+
+        def scored():
+            for candidate in candidates:
+                if cancelled.is_set():
+                    return
+                score = fuzzy_score(query, text_of(candidate).casefold())
+                if score is not None:
+                    yield score, candidate
+
+        # nlargest is stable, equal scores keep the candidates order
+        best = heapq.nlargest(self.max_results, scored(), key=lambda s: s[0])
+        return [
+            result_of(candidate, score + self.weight)
+            for score, candidate in best
+        ]
+
+
+class WindowsProvider(SearchProvider):
+    """
+    Open Hyprland windows, focused when chosen.
+
+    The windows are listed once and filtered in memory, then listed again only
+    after a Hyprland event changed them, instead of on every keystroke.
+    """
+
+    name = "windows"
+    weight = -1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: list[dict] = []
+        self._stale = True
+        try:
+            connection = get_hyprland_connection()
+            for event in CLIENT_EVENTS:
+                connection.connect(f"event::{event}", self._invalidate)
+        except Exception as e:
+            # Without events, the windows are listed for every search
+            logger.warning(f"Failed to watch the Hyprland windows: {e}")
+            self._watched = False
+        else:
+            self._watched = True
+
+    def _invalidate(self, *args) -> None:
+        self._stale = True
+
+    def _load(self) -> list[dict]:
+        """List the windows again only when they changed"""
+        with self._lock:
+            if not self._stale:
+                return self._clients
+            # Set first, so a change during the listing isn't missed
+            self._stale = not self._watched
+            try:
+                output = subprocess.run(["hyprctl", "clients", "-j"],
+                                        capture_output=True,
+                                        check=True,
+                                        timeout=self.timeout).stdout
+                self._clients = [
+                    client for client in json.loads(output)
+                    if client.get("mapped") and client.get("title")
+                ]
+            except Exception:
+                self._stale = True
+                raise
+            return self._clients
+
+    def search(self, query: str,
+               cancelled: threading.Event) -> list[SearchResult]:
+        return self.top(
+            query,
+            self._load(),
+            lambda client: f"{client['title']} {client.get('class', '')}",
+            lambda client, score: SearchResult(
+                title=client["title"],
+                subtitle=
+                f"{client.get('class', '')} on workspace {client.get('workspace', {}).get('name', '?')}",
+                score=score,
+                icon_name=(client.get("initialClass") or client.get("class") or
+                           "").lower() or None,
+                activate=lambda address=client["address"]:
+                exec_shell_command_async(
+                    ["hyprctl", "dispatch", "focuswindow", f"address:{address}"]),
+            ),
+            cancelled,
+        )
+
+
+class RecentFilesProvider(SearchProvider):
+    """Recently used files, from the freedesktop recently-used.xbel"""
+
+    name = "files"
+    min_query_length = 2
+    weight = -4
+
+    def __init__(self, path: str = RECENT_FILES):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: float | None = None
+        # (path, uri, mime type), most recent first
+        self._files: list[tuple[str, str, str | None]] = []
+
+    def _load(self) -> list[tuple[str, str, str | None]]:
+        """Parse the bookmarks again only when the file changed"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return []
+            if mtime == self._mtime:
+                return self._files
+            entries = []
+            for bookmark in ET.parse(self.path).getroot().iter("bookmark"):
+                uri = bookmark.get("href", "")
+                if not uri.startswith("file://"):
+                    continue
+                mime = next((element.get("type")
+                             for element in bookmark.iter()
+                             if element.tag.endswith("mime-type")), None)
+                entries.append((bookmark.get("modified", ""), uri, mime))
+            entries.sort(reverse=True)
+            self._files = [(unquote(urlparse(uri).path), uri, mime)
+                           for _, uri, mime in entries]
+            self._mtime = mtime
+            return self._files
+
+    def search(self, query: str,
+               cancelled: threading.Event) -> list[SearchResult]:
+        results = self.top(
+            query,
+            self._load(),
+            lambda file: os.path.basename(file[0]),
+            lambda file, score: SearchResult(
+                title=os.path.basename(file[0]),
+                subtitle=os.path.dirname(file[0]),
+                score=score,
+                icon_name=Gio.content_type_get_generic_icon_name(file[2])
+                if file[2] else "text-x-generic",
+                activate=lambda uri=file[1]: Gio.AppInfo.
+                launch_default_for_uri(uri, None),
+            ),
+            cancelled,
+        )
+        return [
+            result for result in results
+            if os.path.exists(os.path.join(result.subtitle, result.title))
+        ]
+
+
+class ClipboardProvider(SearchProvider):
+    """Full-text search in the cliphist history, copying the entry back when chosen"""
+
+    name = "clipboard"
+    prefix = ";"
+    min_query_length = 0
+    max_results = 20
+
+    def __init__(self):
+        # Searched in memory, kept up to date by the clipboard service
+        self.history = hub.get("clipboard")
+
+    def search(self, query: str,
+               cancelled: threading.Event) -> list[SearchResult]:
+
+        def result_of(entry: tuple[int, str], score: float) -> SearchResult:
+            entry_id, content = entry
+            return SearchResult(
+                title=content,
+                subtitle="Clipboard",
+                score=score,
+                icon_name="edit-paste",
+                activate=lambda: self.history.copy(entry_id),
+            )
+
+        if not query:
+            # Most recent entries first
+            return [
+                result_of(entry, 0)
+                for entry in self.history.search(limit=self.max_results)
+            ]
+        return self.top(
+            query,
+            self.history.search(query),
+            lambda entry: entry[1],
+            result_of,
+            cancelled,
+        )
+
+
+class CommandsProvider(SearchProvider):
+    """Executables of the PATH, run with the arguments typed after them"""
+
+    name = "commands"
+    prefix = ">"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path_mtimes: dict[str, float] = {}
+        self._executables: list[str] = []
+
+    def _load(self) -> list[str]:
+        """List the executables again only when a PATH directory changed"""
+        with self._lock:
+            directories = [
+                directory
+                for directory in os.environ.get("PATH", "").split(os.pathsep)
+                if directory
+            ]
+            mtimes = {}
+            for directory in directories:
+                try:
+                    mtimes[directory] = os.stat(directory).st_mtime
+                except OSError:
+                    continue
+            if mtimes == self._path_mtimes:
+                return self._executables
+            executables = set()
+            for directory in mtimes:
+                try:
+                    with os.scandir(directory) as entries:
+                        executables.update(
+                            entry.name for entry in entries
+                            if entry.is_file() and
+                            os.access(entry.path, os.X_OK))
+                except OSError:
+                    continue
+            # Shorter names first, so an exact command wins ties
+            self._executables = sorted(executables, key=lambda name:
+                                       (len(name), name))
+            self._path_mtimes = mtimes
+            return self._executables
+
+    def search(self, query: str,
+               cancelled: threading.Event) -> list[SearchResult]:
+        command, _, arguments = query.partition(" ")
+
+        def result_of(executable: str, score: float) -> SearchResult:
+            command_line = f"{executable} {arguments}".strip()
+            return SearchResult(
+                title=command_line,
+                subtitle="Run command",
+                score=score,
+                icon_name="utilities-terminal",
+                activate=lambda: subprocess.Popen(
+                    ["sh", "-c", command_line],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    start_new_session=True,
+                ),
+            )
+
+        return self.top(command, self._load(), lambda name: name, result_of,
+                        cancelled)
+
+
+PROVIDERS: dict[str, Callable[[], SearchProvider]] = {
+    "windows": WindowsProvider,
+    "files": RecentFilesProvider,
+    "clipboard": ClipboardProvider,
+    "commands": CommandsProvider,
+}
+
+
+class ProviderSearch:
+    """
+    Run the searches of the providers on a worker pool and deliver their results on
+    the main loop, so a slow provider never blocks typing. Starting a search
+    cancels the previous one, whose results are then never delivered.
+    """
+
+    def __init__(self,
+                 providers: list[SearchProvider],
+                 on_results: Callable[[list[SearchResult]], None],
+                 workers: int = WORKERS):
+        """
+        Parameters:
+          providers (list): The providers queried
+          on_results (callable): Receives the results of a provider, on the main loop
+          workers (int): Number of providers searching at the same time
+        """
+        self.providers = providers
+        self._on_results = on_results
+        self._cancelled = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="search-providers")
+
+    def claims(self, query: str) -> bool:
+        """Return whether a prefixed provider handles the query alone, without the apps"""
+        return any(provider.prefix is not None and
+                   query.startswith(provider.prefix)
+                   for provider in self.providers)
+
+    def search(self, query: str) -> None:
+        self.cancel()
+        cancelled = self._cancelled = threading.Event()
+        claimed = self.claims(query)
+        for provider in self.providers:
+            if claimed and provider.prefix is None:
+                continue
+            provider_query = provider.accepts(query)
+            if provider_query is not None:
+                self._executor.submit(self._run, provider, provider_query,
+                                      cancelled, time.monotonic())
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def _run(self, provider: SearchProvider, query: str,
+             cancelled: threading.Event, started: float) -> None:
+        if cancelled.is_set():
+            return
+        try:
+            results = provider.search(query, cancelled)
+        except Exception as e:
+            logger.warning(f"Search provider {provider.name} failed: {e}")
+            return
+        elapsed = time.monotonic() - started
+        if elapsed > provider.timeout:
+            logger.debug(
+                f"Dropped late results of {provider.name} ({elapsed * 1e3:.0f}ms)")
+            return
+        if results and not cancelled.is_set():
+            GLib.idle_add(self._deliver, cancelled, results)
+
+    def _deliver(self, cancelled: threading.Event,
+                 results: list[SearchResult]) -> bool:
+        if not cancelled.is_set():
+            self._on_results(results)
+        return False
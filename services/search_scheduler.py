@@ -0,0 +1,131 @@
+import time
+from collections.abc import Iterable, Iterator
+from typing import Any, Callable
+
+from gi.repository import GLib  # type: ignore
+
+from services.logger import logger
+
+# Keystrokes closer than this are coalesced into a single search
+DEBOUNCE_DELAY = 80  # in milliseconds
+FIRST_BATCH = 12
+BATCH = 8
+
+
+class SearchScheduler:
+    """
+    Run the searches of a search entry and render their results.
+
+    The first query typed runs right away, then the queries typed within
+    `delay` of the previous search are coalesced and only the last one runs. A
+    search renders its first `first_batch` results synchronously, so the first
+    screenful is drawn in the same frame as the keystroke, then streams the rest
+    by batches from the main loop. A newer query cancels the results still being
+    streamed.
+    """
+
+    def __init__(self,
+                 search: Callable[[str], Iterable],
+                 render: Callable[[Any], None],
+                 begin: Callable[[str], None] | None = None,
+                 finish: Callable[[str], None] | None = None,
+                 delay: int = DEBOUNCE_DELAY,
+                 first_batch: int = FIRST_BATCH,
+                 batch: int = BATCH):
+        """
+        Parameters:
+          search (callable): Return the results of a query, can be a lazy iterable
+          render (callable): Display a result
+          begin (callable): Clear the previous results, before a query is rendered
+          finish (callable): Called once every result of a query is rendered
+          delay (int): Debounce delay, in milliseconds
+          first_batch (int): Number of results rendered synchronously
+          batch (int): Number of results rendered per main loop iteration afterwards
+        """
+        self._search = search
+        self._render = render
+        self._begin = begin
+        self._finish = finish
+        self.delay = delay
+        self.first_batch = first_batch
+        self.batch = batch
+        # Seconds between the last query being submitted and its first result being drawn
+        self.time_to_first_result: float | None = None
+
+        self._pending: tuple[str, float] | None = None
+        self._debounce_id: int | None = None
+        self._stream_id: int | None = None
+
+    def submit(self, query: str) -> None:
+        """Search a query typed by the user, debounced"""
+        submitted_at = time.monotonic()
+        if self._debounce_id is None:
+            self._run(query, submitted_at)
+            self._debounce_id = GLib.timeout_add(self.delay, self._on_quiet)
+        else:
+            self._pending = (query, submitted_at)
+
+    def run(self, query: str) -> None:
+        """Search a query right away"""
+        self._pending = None
+        self._run(query, time.monotonic())
+
+    def cancel(self) -> None:
+        """Drop the pending query and stop rendering the current one"""
+        self._pending = None
+        if self._stream_id is not None:
+            GLib.source_remove(self._stream_id)
+            self._stream_id = None
+
+    def _on_quiet(self) -> bool:
+        if self._pending is None:
+            self._debounce_id = None
+            return False
+        (query, submitted_at), self._pending = self._pending, None
+        self._run(query, submitted_at)
+        # Keep coalescing while the user is typing
+        return True
+
+    def _run(self, query: str, submitted_at: float) -> None:
+        self.cancel()
+        if self._begin:
+            self._begin(query)
+        try:
+            results = iter(self._search(query))
+        except Exception as e:
+            logger.error(f"Search for '{query}' failed: {e}")
+            results = iter(())
+        done = self._render_batch(query, results, self.first_batch)
+        self.time_to_first_result = time.monotonic() - submitted_at
+        logger.debug(
+            f"First results for '{query}' in {self.time_to_first_result * 1e3:.1f}ms"
+        )
+        if done:
+            self._complete(query)
+        else:
+            self._stream_id = GLib.idle_add(self._on_stream, query, results)
+
+    def _render_batch(self, query: str, results: Iterator, count: int) -> bool:
+        """Render up to count results, returning whether there are no more"""
+        for _ in range(count):
+            try:
+                result = next(results)
+            except StopIteration:
+                return True
+            except Exception as e:
+                # A lazy search fails while iterated, keep what was rendered
+                logger.error(f"Search for '{query}' failed: {e}")
+                return True
+            self._render(result)
+        return False
+
+    def _on_stream(self, query: str, results: Iterator) -> bool:
+        if not self._render_batch(query, results, self.batch):
+            return True
+        self._stream_id = None
+        self._complete(query)
+        return False
+
+    def _complete(self, query: str) -> None:
+        if self._finish:
+            self._finish(query)
@@ -1,41 +1,336 @@
 import json
-import subprocess
-from typing import Literal
+import os
+from typing import Callable, Literal
 
-from gi.repository import GLib  # type: ignore
+from fabric.core.service import Service, Signal
+from gi.repository import Gio, GLib  # type: ignore
+
+from services.logger import logger
 
 status = Literal["down", "up"]
 
-class TailscaleProvider:
+TAILSCALED_SOCKETS = [
+    "/run/tailscale/tailscaled.sock",
+    "/var/run/tailscale/tailscaled.sock",
+]
+# Values of tailscale's ipn.State enum, as sent on the IPN bus
+BACKEND_STATES = [
+    "NoState",
+    "InUseOtherUser",
+    "NeedsLogin",
+    "NeedsMachineAuth",
+    "Stopped",
+    "Starting",
+    "Running",
+]
+NOTIFY_INITIAL_STATE = 1 << 1
+MIN_BACKOFF = 1  # in seconds
+MAX_BACKOFF = 60  # in seconds
+
+
+class TailscaleProvider(Service):
     """
-    Class responsible for obtaining centralized CPU, memory and battery metrics.
-    It updates periodically so that all widgets querying it display the same values.
+    Class responsible for obtaining the centralized tailscale status.
+    It streams state changes from tailscaled's LocalAPI socket and falls back to
+    polling the tailscale CLI, with exponential backoff, when the socket is absent.
+    `changed` is only emitted when the backend state actually changes.
     """
 
-    def __init__(self):
-        self.status: status = "down"
+    @Signal
+    def changed(self, status: str) -> None:
+        ...
 
-        GLib.timeout_add_seconds(1, self._update)
+    def __init__(self, socket_path: str | None = None, **kwargs):
+        """
+        Parameters:
+          socket_path (string): Path of the tailscaled socket, defaults to the standard locations
+        """
+        super().__init__(**kwargs)
+        self.status: status = "down"
+        self.backend_state = "NoState"
 
-    def _update(self):
-        res = subprocess.run("tailscale status --json --self --active", capture_output=True, text=True, shell=True)
-        if res.returncode == 0:
-            json_output = json.loads(res.stdout)
-            running = json_output['BackendState'] == "Running"
-            self.status = "up" if running else "down"
-        else:
-            self.status = "down"
+        self._socket_path = socket_path
+        self._cancellable = Gio.Cancellable()
+        self._connection: Gio.SocketConnection | None = None
+        self._backoff = MIN_BACKOFF
+        self._retry_id: int | None = None
 
-        return True
+        self._watch()
 
     def get_status(self) -> status:
         return self.status
 
     def toggle(self) -> status:
-        status = self.status
-        if status == "up":
-            status = "down"
-        else:
-            status = "up"
-        subprocess.run(f"tailscale {status}", shell=True)
+        """Ask tailscaled to go up or down, the new state arrives through the IPN bus"""
+        status = "down" if self.status == "up" else "up"
+        body = json.dumps({
+            "WantRunning": status == "up",
+            "WantRunningSet": True
+        })
+
+        def on_response(status_code: int | None) -> None:
+            if status_code is None or not 200 <= status_code < 300:
+                logger.warning(
+                    f"LocalAPI refused to set tailscale {status} ({status_code}), using the CLI"
+                )
+                self._spawn(["tailscale", status], lambda _: self._refresh())
+
+        self._request("PATCH", "/localapi/v0/prefs", body, on_response)
         return status
+
+    def stop(self) -> None:
+        """Stop watching tailscaled"""
+        self._cancellable.cancel()
+        if self._retry_id is not None:
+            GLib.source_remove(self._retry_id)
+            self._retry_id = None
+
+    def _refresh(self) -> None:
+        """Poll right away when not streaming, instead of waiting for the backoff delay"""
+        if self._connection is not None:
+            return
+        if self._retry_id is not None:
+            GLib.source_remove(self._retry_id)
+            self._retry_id = None
+        self._backoff = MIN_BACKOFF
+        self._watch()
+
+    def _find_socket(self) -> str | None:
+        candidates = [self._socket_path
+                     ] if self._socket_path else TAILSCALED_SOCKETS
+        return next((path for path in candidates if os.path.exists(path)),
+                    None)
+
+    def _set_backend_state(self, backend_state: str) -> None:
+        if backend_state == self.backend_state:
+            return
+        self.backend_state = backend_state
+        self.status = "up" if backend_state == "Running" else "down"
+        # Be reactive again as soon as something happens
+        self._backoff = MIN_BACKOFF
+        self.emit("changed", self.status)
+
+    def _schedule_retry(self) -> None:
+        """Watch again after the current backoff delay, doubling it for the next time"""
+        if self._cancellable.is_cancelled() or self._retry_id is not None:
+            return
+        self._retry_id = GLib.timeout_add_seconds(self._backoff,
+                                                  self._on_retry)
+        self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+
+    def _on_retry(self) -> bool:
+        self._retry_id = None
+        self._watch()
+        return False
+
+    def _watch(self) -> None:
+        """Stream the IPN bus if the socket exists, otherwise poll the CLI once"""
+        if self._find_socket() is None:
+            self._poll_cli()
+            return
+        self._open(
+            f"GET /localapi/v0/watch-ipn-bus?mask={NOTIFY_INITIAL_STATE}",
+            None,
+            self._on_watch_opened,
+        )
+
+    def _on_watch_opened(self, stream: Gio.DataInputStream | None) -> None:
+        if stream is None:
+            self._poll_cli()
+            return
+        self._read_headers(stream, self._on_watch_headers)
+
+    def _on_watch_headers(self, stream: Gio.DataInputStream,
+                          status_code: int | None) -> None:
+        if status_code != 200:
+            logger.warning(
+                f"Unable to watch the tailscale IPN bus ({status_code}), polling the CLI"
+            )
+            self._close()
+            self._poll_cli()
+            return
+        self._backoff = MIN_BACKOFF
+        stream.read_line_async(GLib.PRIORITY_DEFAULT, self._cancellable,
+                               self._on_notify_line)
+
+    def _on_notify_line(self, stream: Gio.DataInputStream,
+                        result: Gio.AsyncResult) -> None:
+        try:
+            line, _ = stream.read_line_finish_utf8(result)
+        except GLib.Error as e:
+            if not self._cancellable.is_cancelled():
+                logger.warning(f"Tailscale IPN bus stream failed: {e}")
+                self._close()
+                self._schedule_retry()
+            return
+        if line is None:
+            # tailscaled closed the stream (restart, shutdown...)
+            self._close()
+            self._set_backend_state("NoState")
+            self._schedule_retry()
+            return
+        if line.strip():
+            try:
+                state = json.loads(line).get("State")
+            except ValueError:
+                state = None
+            if isinstance(state, int) and 0 <= state < len(BACKEND_STATES):
+                self._set_backend_state(BACKEND_STATES[state])
+        stream.read_line_async(GLib.PRIORITY_DEFAULT, self._cancellable,
+                               self._on_notify_line)
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close_async(GLib.PRIORITY_DEFAULT, None, None)
+            self._connection = None
+
+    def _poll_cli(self) -> None:
+        """Fallback used when the LocalAPI socket is absent or unreachable"""
+        if self._cancellable.is_cancelled():
+            return
+
+        def on_output(stdout: str | None) -> None:
+            backend_state = "NoState"
+            if stdout:
+                try:
+                    backend_state = json.loads(stdout).get(
+                        "BackendState", "NoState")
+                except ValueError:
+                    pass
+            self._set_backend_state(backend_state)
+            self._schedule_retry()
+
+        self._spawn(["tailscale", "status", "--json", "--peers=false"],
+                    on_output)
+
+    def _spawn(self, argv: list[str],
+               callback: Callable[[str | None], None] | None) -> None:
+        """Run a command without blocking the main loop, passing its stdout (None on failure) to the callback"""
+        try:
+            process = Gio.Subprocess.new(
+                argv,
+                Gio.SubprocessFlags.STDOUT_PIPE
+                | Gio.SubprocessFlags.STDERR_SILENCE,
+            )
+        except GLib.Error as e:
+            logger.error(f"Failed to run {' '.join(argv)}: {e}")
+            if callback:
+                callback(None)
+            return
+
+        def on_communicated(process: Gio.Subprocess,
+                            result: Gio.AsyncResult) -> None:
+            try:
+                _, stdout, _ = process.communicate_utf8_finish(result)
+            except GLib.Error:
+                stdout = None
+            if callback:
+                callback(stdout if process.get_successful() else None)
+
+        process.communicate_utf8_async(None, self._cancellable,
+                                       on_communicated)
+
+    def _request(self, method: str, path: str, body: str | None,
+                 callback: Callable[[int | None], None]) -> None:
+        """Send a one-shot LocalAPI request and pass the HTTP status code (None on failure) to the callback"""
+        if self._find_socket() is None:
+            callback(None)
+            return
+
+        def on_opened(stream: Gio.DataInputStream | None) -> None:
+            if stream is None:
+                callback(None)
+                return
+
+            def on_headers(stream: Gio.DataInputStream,
+                           status_code: int | None) -> None:
+                # Only the status matters, the connection is done
+                stream.connection.close_async(GLib.PRIORITY_DEFAULT, None,
+                                              None)
+                callback(status_code)
+
+            self._read_headers(stream, on_headers)
+
+        self._open(f"{method} {path}", body, on_opened, keep=False)
+
+    def _open(self,
+              request_line: str,
+              body: str | None,
+              callback: Callable[[Gio.DataInputStream | None], None],
+              keep: bool = True) -> None:
+        """
+        Connect to the socket and send an HTTP/1.0 request, which makes tailscaled
+        stream the body as is (no chunked encoding) and close it when done.
+        """
+        payload = body.encode() if body else b""
+        request = (f"{request_line} HTTP/1.0\r\n"
+                   "Host: local-tailscaled.sock\r\n"
+                   "Sec-Tailscale: localapi\r\n"
+                   "Content-Type: application/json\r\n"
+                   f"Content-Length: {len(payload)}\r\n\r\n").encode() + payload
+
+        def on_written(output: Gio.OutputStream, result: Gio.AsyncResult,
+                       connection: Gio.SocketConnection) -> None:
+            try:
+                output.write_all_finish(result)
+            except GLib.Error as e:
+                logger.warning(f"Failed to write to tailscaled: {e}")
+                if not keep:
+                    connection.close_async(GLib.PRIORITY_DEFAULT, None, None)
+                callback(None)
+                return
+            stream = Gio.DataInputStream.new(connection.get_input_stream())
+            stream.set_newline_type(Gio.DataStreamNewlineType.ANY)
+            # Keep the connection alive for as long as the stream is read
+            stream.connection = connection
+            callback(stream)
+
+        def on_connected(client: Gio.SocketClient,
+                         result: Gio.AsyncResult) -> None:
+            try:
+                connection = client.connect_finish(result)
+            except GLib.Error as e:
+                logger.warning(f"Failed to connect to tailscaled: {e}")
+                callback(None)
+                return
+            if keep:
+                self._connection = connection
+            connection.get_output_stream().write_all_async(
+                request, GLib.PRIORITY_DEFAULT, self._cancellable,
+                lambda output, result: on_written(output, result, connection))
+
+        Gio.SocketClient().connect_async(
+            Gio.UnixSocketAddress.new(self._find_socket()),
+            self._cancellable,
+            on_connected,
+        )
+
+    def _read_headers(
+            self, stream: Gio.DataInputStream,
+            callback: Callable[[Gio.DataInputStream, int | None],
+                               None]) -> None:
+        """Consume the status line and headers, then pass the status code to the callback"""
+        status_code: int | None = None
+
+        def on_line(stream: Gio.DataInputStream,
+                    result: Gio.AsyncResult) -> None:
+            nonlocal status_code
+            try:
+                line, _ = stream.read_line_finish_utf8(result)
+            except GLib.Error:
+                line = None
+            if line is None:
+                callback(stream, None)
+                return
+            if status_code is None:
+                parts = line.split(" ", 2)
+                status_code = int(parts[1]) if len(
+                    parts) > 1 and parts[1].isdigit() else 0
+            elif line == "":
+                callback(stream, status_code)
+                return
+            stream.read_line_async(GLib.PRIORITY_DEFAULT, self._cancellable,
+                                   on_line)
+
+        stream.read_line_async(GLib.PRIORITY_DEFAULT, self._cancellable,
+                               on_line)
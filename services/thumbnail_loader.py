@@ -0,0 +1,114 @@
+import heapq
+import itertools
+import os
+import threading
+from typing import Any, Callable, Iterable
+
+from gi.repository import GLib  # type: ignore
+
+from services.logger import logger
+
+WORKERS = min(os.cpu_count() or 2, 4)
+
+
+class ThumbnailLoader:
+    """
+    Worker pool loading images by priority, the lowest value first.
+
+    Requests can be re-prioritized (e.g. when the tiles in the viewport change) or
+    cancelled (e.g. when a search hides their tiles) while they wait. Images
+    already being decoded can't be interrupted, their result is dropped if they
+    were cancelled in the meantime. Results are delivered on the main loop in
+    batches, a single callback per main loop iteration however many workers
+    finished.
+    """
+
+    def __init__(self,
+                 load: Callable[[str], Any],
+                 on_loaded: Callable[[list[tuple[str, Any]]], None],
+                 workers: int = WORKERS):
+        """
+        Parameters:
+          load (callable): Load the image of a path, called from the workers
+          on_loaded (callable): Receives the (path, image) loaded since the last batch
+          workers (int): Number of images loaded in parallel
+        """
+        self._load = load
+        self._on_loaded = on_loaded
+        self._condition = threading.Condition()
+        # Heap of (priority, sequence, path), with stale entries left behind on updates
+        self._queue: list[tuple[float, int, str]] = []
+        self._priorities: dict[str, float] = {}
+        self._running: set[str] = set()
+        self._sequence = itertools.count()
+        self._results: list[tuple[str, Any]] = []
+        self._flush_id: int | None = None
+
+        for index in range(max(workers, 1)):
+            threading.Thread(target=self._work,
+                             name=f"thumbnail-loader-{index}",
+                             daemon=True).start()
+
+    def request(self, path: str, priority: float = 0) -> None:
+        """Queue the load of an image, or update its priority if it is already queued"""
+        with self._condition:
+            if path in self._running:
+                return
+            if self._priorities.get(path) == priority:
+                return
+            self._priorities[path] = priority
+            heapq.heappush(self._queue, (priority, next(self._sequence), path))
+            self._condition.notify()
+
+    def retain(self, paths: Iterable[str]) -> None:
+        """Cancel the requests of every image not in paths"""
+        keep = set(paths)
+        with self._condition:
+            self._priorities = {
+                path: priority
+                for path, priority in self._priorities.items() if path in keep
+            }
+            self._running &= keep
+            # Drop the stale entries once they outnumber the live ones
+            if len(self._queue) > 2 * len(self._priorities) + 16:
+                self._queue = [(priority, sequence, path)
+                               for priority, sequence, path in self._queue
+                               if self._priorities.get(path) == priority]
+                heapq.heapify(self._queue)
+
+    def _next(self) -> str:
+        with self._condition:
+            while True:
+                while self._queue:
+                    priority, _, path = heapq.heappop(self._queue)
+                    # Skip cancelled requests and outdated priorities
+                    if self._priorities.get(path) == priority:
+                        del self._priorities[path]
+                        self._running.add(path)
+                        return path
+                self._condition.wait()
+
+    def _work(self) -> None:
+        while True:
+            path = self._next()
+            try:
+                image = self._load(path)
+            except Exception as e:
+                logger.error(f"Error loading image {path}: {e}")
+                image = None
+            with self._condition:
+                if path not in self._running:
+                    # Cancelled while loading
+                    continue
+                self._running.discard(path)
+                self._results.append((path, image))
+                if self._flush_id is None:
+                    self._flush_id = GLib.idle_add(self._flush)
+
+    def _flush(self) -> bool:
+        with self._condition:
+            results, self._results = self._results, []
+            self._flush_id = None
+        if results:
+            self._on_loaded(results)
+        return False
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import threading
+
+from gi.repository import GdkPixbuf, GLib  # type: ignore
+
+from services.config import config
+from services.logger import logger
+
+THUMBNAIL_DIR = os.path.join(GLib.get_user_cache_dir(), "thumbnails")
+FLAVOR_SIZES = {"normal": 128, "large": 256, "x-large": 512, "xx-large": 1024}
+VERSION_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                            "VERSION")
+
+
+def _app_version() -> str:
+    try:
+        with open(VERSION_FILE, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return "0"
+
+
+class ThumbnailCache:
+    """
+    Disk cache of image thumbnails following the freedesktop thumbnail
+    specification, so they are shared with file managers and other apps.
+
+    Thumbnails are PNG files named after the MD5 of the source URI, carrying the
+    URI and modification time of the source. A thumbnail is only regenerated when
+    its source changes. Sources that can't be decoded are recorded in the fail
+    directory of this version of the app, so they are not decoded again until they
+    change (or the app is updated).
+
+    Methods are thread safe, they are meant to be called from worker threads.
+    """
+
+    def __init__(self, flavor: str = "large", directory: str = THUMBNAIL_DIR):
+        """
+        Parameters:
+          flavor (string): Thumbnail size directory (normal, large, x-large or xx-large)
+          directory (string): Root of the thumbnail cache
+        """
+        self.size = FLAVOR_SIZES[flavor]
+        self.directory = os.path.join(directory, flavor)
+        self.fail_directory = os.path.join(
+            directory, "fail", f"{config['APP_NAME']}-{_app_version()}")
+
+    def _name(self, uri: str) -> str:
+        return f"{hashlib.md5(uri.encode()).hexdigest()}.png"
+
+    def _is_valid(self, thumbnail: GdkPixbuf.Pixbuf, uri: str,
+                  mtime: int) -> bool:
+        return (thumbnail.get_option("tEXt::Thumb::URI") == uri and
+                thumbnail.get_option("tEXt::Thumb::MTime") == str(mtime))
+
+    def _read(self, path: str, uri: str,
+              mtime: int) -> GdkPixbuf.Pixbuf | None:
+        """Return the thumbnail stored at path if it is up to date with the source"""
+        try:
+            thumbnail = GdkPixbuf.Pixbuf.new_from_file(path)
+        except GLib.Error:
+            return None
+        return thumbnail if self._is_valid(thumbnail, uri, mtime) else None
+
+    def get(self, path: str) -> GdkPixbuf.Pixbuf | None:
+        """Return the thumbnail of an image, generating it when needed. None when the image can't be decoded."""
+        try:
+            mtime = int(os.stat(path).st_mtime)
+        except OSError:
+            return None
+        uri = GLib.filename_to_uri(os.path.abspath(path), None)
+        name = self._name(uri)
+
+        thumbnail = self._read(os.path.join(self.directory, name), uri, mtime)
+        if thumbnail is not None:
+            return thumbnail
+        if self._read(os.path.join(self.fail_directory, name), uri,
+                      mtime) is not None:
+            return None
+
+        try:
+            _, width, height = GdkPixbuf.Pixbuf.get_file_info(path)
+            if 0 < width <= self.size and 0 < height <= self.size:
+                # Smaller images are not scaled up, they are their own thumbnail
+                thumbnail = GdkPixbuf.Pixbuf.new_from_file(path)
+            else:
+                thumbnail = GdkPixbuf.Pixbuf.new_from_file_at_scale(
+                    path, self.size, self.size, True)
+        except GLib.Error as e:
+            logger.warning(f"Unable to generate the thumbnail of {path}: {e}")
+            failure = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8,
+                                           1, 1)
+            failure.fill(0)
+            self._save(failure, self.fail_directory, name, uri, mtime)
+            return None
+        self._save(thumbnail, self.directory, name, uri, mtime)
+        return thumbnail
+
+    def _save(self, thumbnail: GdkPixbuf.Pixbuf, directory: str, name: str,
+              uri: str, mtime: int) -> None:
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            # Written to a private temporary file then renamed, as the spec requires
+            temporary_path = os.path.join(
+                directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            thumbnail.savev(temporary_path, "png",
+                            ["tEXt::Thumb::URI", "tEXt::Thumb::MTime"],
+                            [uri, str(mtime)])
+            os.chmod(temporary_path, 0o600)
+            os.replace(temporary_path, os.path.join(directory, name))
+        except Exception as e:
+            logger.error(f"Failed to save the thumbnail of {uri}: {e}")
+
+
+def scale_to_fit(pixbuf: GdkPixbuf.Pixbuf, width: int,
+                 height: int) -> GdkPixbuf.Pixbuf:
+    """Scale an image to fit in width x height, keeping its aspect ratio"""
+    scale = min(width / pixbuf.get_width(), height / pixbuf.get_height())
+    return pixbuf.scale_simple(max(round(pixbuf.get_width() * scale), 1),
+                               max(round(pixbuf.get_height() * scale), 1),
+                               GdkPixbuf.InterpType.BILINEAR)
+
+
+thumbnail_cache = ThumbnailCache()
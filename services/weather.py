@@ -0,0 +1,87 @@
+import threading
+
+import requests
+from fabric.core.service import Property, Service, Signal
+from gi.repository import GLib  # type: ignore
+
+from services.config import config
+from services.logger import logger
+
+
+class Weather:
+    """Class to represent weather data with icon and temperature."""
+
+    def __init__(self, icon=None, temperature=None):
+        self.icon = icon
+        self.temperature = temperature
+
+    def get_weather(self):
+        return {"icon": self.icon, "temperature": self.temperature}
+
+    def set_weather(self, icon, temperature):
+        self.icon = icon
+        self.temperature = temperature
+
+    def __str__(self):
+        return f"Weather(icon={self.icon}, temperature={self.temperature})"
+
+
+class WeatherWorker(Service):
+    """Service to fetch and update weather data, refreshing at the configured interval."""
+
+    @Signal
+    def changed(self) -> None:
+        ...
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._weather = Weather()
+        self.update_thread_active = False
+        GLib.timeout_add_seconds(
+            60 * config['BAR']['MODULES']['WEATHER']['REFRESH_INTERVAL'],
+            lambda: self.update_weather() or True,
+        )
+        self.update_weather()
+
+    @Property(Weather, "read-write")
+    def weather(self):
+        return self._weather
+
+    def update_weather(self) -> None:
+        """Fetch weather data from an external API and update the weather property."""
+        if self.update_thread_active:
+            return
+
+        def worker():
+            self.update_thread_active = True
+            uri = "https://wttr.in/?format=%c+%t"
+            try:
+                res = requests.get(uri)
+            except requests.RequestException as e:
+                logger.error(f"Failed to fetch weather data: {e}")
+                self._weather.set_weather(icon=None, temperature=None)
+                self.update_thread_active = False
+                GLib.idle_add(self.emit, "changed")
+                return
+            if not res.ok:
+                logger.error(f"Failed to fetch weather data: {res.status_code}")
+                self._weather.set_weather(icon=None, temperature=None)
+                self.update_thread_active = False
+                GLib.idle_add(self.emit, "changed")
+                return
+            elements_list = [el for el in res.text.split(" ") if el != ""]
+            if (not all(isinstance(item, str) for item in elements_list) or
+                    len(elements_list) != 2):
+                logger.error("Weather data format is incorrect.")
+                self._weather.set_weather(icon=None, temperature=None)
+            else:
+                self._weather.set_weather(icon=elements_list[0],
+                                          temperature=elements_list[1].replace(
+                                              "+", ""))
+                logger.info(f"Weather updated: {self._weather}")
+            self.update_thread_active = False
+            GLib.idle_add(self.emit, "changed")
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
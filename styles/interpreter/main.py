@@ -7,6 +7,8 @@ class StylesInterpreter:
         self._variables = variables
         self._input_dir = input_dir
         self._stylesheet = ""
+        # Processed content by file, reused while the file and variables are unchanged
+        self._processed: Dict[str, tuple[int, str]] = {}
         self.process_directory()
 
     def evaluate_expression(self, expression: str) -> str:
@@ -53,18 +55,28 @@ class StylesInterpreter:
 
     def set_variables(self, variables: Dict[str, str]) -> None:
         """Sets the variables for the interpreter."""
+        if variables != self._variables:
+            self._processed.clear()
         self._variables = variables
 
     def process_directory(self) -> None:
-        """Processes all .css files in the input directory."""
+        """Processes all .css files in the input directory, only the changed ones again."""
         processed_content = ""
+        processed = {}
         for root, _, files in os.walk(self._input_dir):
             for file in files:
                 if file.endswith(".mcss"):
                     full_path = os.path.join(root, file)
-                    with open(full_path, "r") as f:
-                        content = f.read()
-                    processed_content += self.process_string(content)
+                    mtime = os.stat(full_path).st_mtime_ns
+                    cached = self._processed.get(full_path)
+                    if cached is not None and cached[0] == mtime:
+                        content = cached[1]
+                    else:
+                        with open(full_path, "r") as f:
+                            content = self.process_string(f.read())
+                    processed[full_path] = (mtime, content)
+                    processed_content += content
+        self._processed = processed
         self._stylesheet = processed_content
 
     def get_stylesheet(self) -> str:
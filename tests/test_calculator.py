@@ -0,0 +1,84 @@
+import math
+import time
+
+import numpy as np
+import pytest
+
+from services.calculator import (MAX_ARRAY_SIZE, MAX_FACTORIAL,
+                                 CalculatorError, calculate, compile_expression,
+                                 evaluate, format_result)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    compile_expression.cache_clear()
+    yield
+    compile_expression.cache_clear()
+
+
+def test_exp_and_e_are_independent():
+    assert evaluate("exp(1)") == pytest.approx(math.e)
+    assert evaluate("e") == pytest.approx(math.e)
+    assert evaluate("exp(1) - e") == pytest.approx(0)
+    assert evaluate("e*exp(1)") == pytest.approx(math.e**2)
+    assert evaluate("exp(e)") == pytest.approx(math.exp(math.e))
+    assert evaluate("np.log(e)") == pytest.approx(1)
+
+
+def test_factorial():
+    assert calculate("5!") == "120"
+    assert calculate("0!") == "1"
+    assert evaluate(f"factorial({MAX_FACTORIAL})") == math.factorial(
+        MAX_FACTORIAL)
+    for expression in (f"factorial({MAX_FACTORIAL + 1})", "factorial(2.5)",
+                       "factorial(-1)"):
+        with pytest.raises(CalculatorError):
+            evaluate(expression)
+
+
+@pytest.mark.parametrize("expression", [
+    "arange(1e12)",
+    "9**9**9",
+    "linspace(0, 1, 1e9)",
+    f"array(arange({MAX_ARRAY_SIZE + 1}))",
+])
+def test_huge_results_are_errors(expression):
+    start = time.monotonic()
+    assert calculate(expression).startswith("Error: ")
+    assert time.monotonic() - start < 1
+
+
+def test_evaluation_past_the_deadline_is_an_error():
+    with pytest.raises(CalculatorError, match="too long"):
+        evaluate("1+2*3", time_limit=-1)
+    assert calculate("1+2*3") == "7"
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os')",
+    "(1).real",
+    "lambda: 1",
+    "np.ndarray",
+    "'a' * 3",
+])
+def test_unsupported_expressions_are_rejected(expression):
+    with pytest.raises(CalculatorError):
+        compile_expression(expression)
+
+
+def test_format_result():
+    assert format_result(np.array([1, 2, 3])) == "[1 2 3]"
+    assert format_result(np.arange(20)) == "Array of shape (20,)"
+    assert format_result(np.float64(3.0)) == "3"
+    assert format_result(0.1 + 0.2) == "0.3"
+    assert format_result(10**100) == "1" + "0" * 100
+    with pytest.raises(CalculatorError, match="too large"):
+        format_result(2**9000)
+    assert calculate("2**9000").startswith("Error: ")
+
+
+def test_compiled_expressions_are_cached():
+    function = compile_expression("2^10 + π")
+    assert compile_expression("2^10 + π") is function
+    assert evaluate("2^10 + π") == pytest.approx(1024 + math.pi)
+    assert compile_expression.cache_info().hits == 2
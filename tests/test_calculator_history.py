@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("gi")
+
+from gi.repository import GLib  # type: ignore  # noqa: E402
+
+import services.calculator_history as calculator_history  # noqa: E402
+from services.calculator_history import CalculatorHistory  # noqa: E402
+
+TIMEOUT = 5000  # in milliseconds
+
+
+def run_until(condition, timeout: int = TIMEOUT) -> None:
+    loop = GLib.MainLoop()
+    GLib.timeout_add(timeout, loop.quit)
+
+    def check() -> bool:
+        if condition():
+            loop.quit()
+            return False
+        return True
+
+    GLib.timeout_add(10, check)
+    loop.run()
+
+
+def read(path: str) -> list[str] | None:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def test_keeps_the_most_recent_entries(tmp_path):
+    history = CalculatorHistory(str(tmp_path / "history.json"), max_size=3)
+    for entry in ("1+1", "2+2", "3+3", "4+4", "5+5"):
+        history.add(entry)
+
+    assert len(history) == 3
+    assert [history[i] for i in range(len(history))] == ["5+5", "4+4", "3+3"]
+    history.remove(1)
+    assert [history[i] for i in range(len(history))] == ["5+5", "3+3"]
+    history.flush()
+
+
+def test_trims_a_history_saved_before_the_cap(tmp_path):
+    path = str(tmp_path / "history.json")
+    with open(path, "w") as f:
+        json.dump([f"{i}*2" for i in range(10)], f)
+
+    history = CalculatorHistory(path, max_size=4)
+    assert [history[i] for i in range(len(history))] == [
+        "0*2", "1*2", "2*2", "3*2"
+    ]
+    history.flush()
+    assert read(path) == ["0*2", "1*2", "2*2", "3*2"]
+
+
+def test_batches_the_changes_into_one_atomic_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(calculator_history, "HISTORY_FLUSH_DELAY", 50)
+    path = str(tmp_path / "history.json")
+    history = CalculatorHistory(path)
+    writes = []
+    write = history._write
+
+    def counting_write(entries: list[str]) -> None:
+        writes.append(entries)
+        write(entries)
+
+    monkeypatch.setattr(history, "_write", counting_write)
+    for entry in ("1+1", "2+2", "3+3"):
+        history.add(entry)
+    # Nothing is written before the delay
+    assert read(path) is None
+
+    run_until(lambda: read(path) is not None)
+    history._writer.shutdown(wait=True)
+
+    assert writes == [["3+3", "2+2", "1+1"]]
+    assert read(path) == ["3+3", "2+2", "1+1"]
+    assert os.listdir(tmp_path) == ["history.json"]
@@ -0,0 +1,162 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+pytest.importorskip("fabric")
+
+from gi.repository import GLib  # type: ignore  # noqa: E402
+
+import services.clipboard as clipboard  # noqa: E402
+from services.clipboard import (ClipboardHistory,  # noqa: E402
+                                ClipboardThumbnails, parse_entry)
+
+TIMEOUT = 5000  # in milliseconds
+# Newest first, as `cliphist list` prints it
+LOADER = [
+    "sh", "-c",
+    "for i in $(seq 60 -1 1); do printf '%s\\tentry %s\\n' $i $i; done"
+]
+PRODUCER = [
+    "sh", "-c",
+    "printf '61\\tfoo\\n62\\tbar\\n63\\tentry 5\\nnot an entry\\n64\\tfoo\\n'"
+]
+
+
+def run_until(condition, timeout: int = TIMEOUT) -> None:
+    loop = GLib.MainLoop()
+    GLib.timeout_add(timeout, loop.quit)
+
+    def check() -> bool:
+        if condition():
+            loop.quit()
+            return False
+        return True
+
+    GLib.timeout_add(10, check)
+    loop.run()
+
+
+def test_parse_entry():
+    assert parse_entry("12\tsome text") == (12, "some text")
+    assert parse_entry("12\ttab\tinside") == (12, "tab\tinside")
+    assert parse_entry("not an entry") is None
+    assert parse_entry("x\ttext") is None
+
+
+def test_new_entries_are_indexed_as_they_are_copied(tmp_path, monkeypatch):
+    monkeypatch.setattr(clipboard, "clipboard_thumbnails",
+                        ClipboardThumbnails(directory=str(tmp_path)))
+    history = ClipboardHistory(loader=LOADER,
+                               producer=PRODUCER,
+                               database=str(tmp_path / "db"))
+    changes = []
+    history.connect("changed", lambda *_: changes.append(len(history)))
+    try:
+        # The producer exits after its lines, its restart is then scheduled
+        run_until(lambda: history.loaded and history._retry_id is not None)
+    finally:
+        history.stop()
+
+    # Loaded once, then one change per new entry
+    assert changes == [60, 61, 62, 62, 62]
+    entries = history.entries()
+    assert len(entries) == 62
+    # Newest first, the copies replacing their previous occurrences
+    assert entries[:5] == [(64, "foo"), (63, "entry 5"), (62, "bar"),
+                           (60, "entry 60"), (59, "entry 59")]
+    assert (61, "foo") not in entries
+    assert (5, "entry 5") not in entries
+    assert entries[-1] == (1, "entry 1")
+
+    # Searched in the whole history, not only the first screenful
+    assert len(history.search("ENTRY")) == 60
+    assert history.search("entry 1") == [(i, f"entry {i}")
+                                          for i in range(19, 9, -1)] + [
+                                              (1, "entry 1")
+                                          ]
+    assert history.search("entry", limit=3) == [(63, "entry 5"),
+                                                 (60, "entry 60"),
+                                                 (59, "entry 59")]
+    assert history.search() == entries
+
+
+def make_history(tmp_path, monkeypatch, decoder: list[str],
+                 copier: list[str]) -> ClipboardHistory:
+    monkeypatch.setattr(clipboard, "clipboard_thumbnails",
+                        ClipboardThumbnails(directory=str(tmp_path)))
+    return ClipboardHistory(loader=["true"],
+                            producer=["true"],
+                            database=str(tmp_path / "db"),
+                            decoder=decoder,
+                            copier=copier)
+
+
+def test_copy_streams_the_decoded_entry_without_blocking(
+        tmp_path, monkeypatch):
+    output = tmp_path / "clipboard"
+    size = 8 * 1024 * 1024
+    # Slow to start and larger than a pipe buffer, the id is appended as $0
+    decoder = [
+        "sh", "-c",
+        f"sleep 0.3; printf 'entry %s\\n' \"$0\"; head -c {size} /dev/zero"
+    ]
+    history = make_history(tmp_path, monkeypatch, decoder,
+                           ["sh", "-c", f"cat > '{output}'"])
+    results = []
+    try:
+        start = time.monotonic()
+        history.copy(7, results.append)
+        assert time.monotonic() - start < 0.2
+        assert results == []
+        run_until(lambda: results)
+    finally:
+        history.stop()
+
+    assert results == [True]
+    with open(output, "rb") as f:
+        assert f.readline() == b"entry 7\n"
+    assert output.stat().st_size == len(b"entry 7\n") + size
+
+
+def test_copy_reports_a_failed_decode(tmp_path, monkeypatch):
+    history = make_history(tmp_path, monkeypatch, ["sh", "-c", "exit 1"],
+                           ["sh", "-c", "cat > /dev/null"])
+    results = []
+    try:
+        history.copy(7, results.append)
+        run_until(lambda: results)
+    finally:
+        history.stop()
+
+    assert results == [False]
+
+
+def test_copy_reports_a_copier_that_cant_start(tmp_path, monkeypatch):
+    history = make_history(tmp_path, monkeypatch,
+                           ["sh", "-c", "exec sleep 60"],
+                           [str(tmp_path / "missing-wl-copy")])
+    results = []
+    try:
+        # The decoder is stopped, the failure reported right away
+        history.copy(7, results.append)
+    finally:
+        history.stop()
+
+    assert results == [False]
+
+
+def test_prune_keeps_the_entries_newer_than_the_listed_ones(tmp_path):
+    for name in ("1.png", "2.png", "3.png", "5.png", "9.png", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    thumbnails = ClipboardThumbnails(directory=str(tmp_path))
+
+    # 2 was deleted from the history, 9 was added after it was listed
+    thumbnails.prune({1, 3, 5})
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "1.png", "3.png", "5.png", "9.png", "notes.txt"
+    ]
+    thumbnails.prune(set())
+    assert len(os.listdir(tmp_path)) == 5
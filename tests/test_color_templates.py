@@ -0,0 +1,113 @@
+import json
+import os
+import re
+
+import pytest
+
+from services.color_templates import (TEMPLATE_EXPRESSION, PaletteError,
+                                      parse_palette, render_template,
+                                      set_lightness)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                             "config", "matugen", "templates")
+PALETTE = {"primary": "#ff0000", "surface": "#101418", "on_surface": "#e0e2e8"}
+
+
+def test_parse_palette_of_the_scheme_shape():
+    output = json.dumps({
+        "image": "/tmp/wall.png",
+        "colors": {
+            "dark": {"primary": "#aabbcc", "surface": "#101418"},
+            "light": {"primary": "#112233", "surface": "#f8f9ff"},
+        },
+    })
+    assert parse_palette(output) == {
+        "primary": "#aabbcc",
+        "surface": "#101418"
+    }
+
+
+def test_parse_palette_of_the_color_shape():
+    output = json.dumps({
+        "colors": {
+            "primary": {
+                "default": {"color": "#aabbcc"},
+                "dark": {"color": "#aabbcc"},
+                "light": {"color": "#112233"},
+            },
+            # Without a default, the dark scheme is used
+            "surface": {
+                "dark": {"color": "#101418"},
+                "light": {"color": "#f8f9ff"},
+            },
+        }
+    })
+    # matugen may print a log line before the JSON
+    assert parse_palette(f"Generating colors\n{output}\n") == {
+        "primary": "#aabbcc",
+        "surface": "#101418"
+    }
+
+
+@pytest.mark.parametrize("output", [
+    "",
+    "not json",
+    json.dumps({"image": "/tmp/wall.png"}),
+    json.dumps({"colors": {}}),
+])
+def test_parse_palette_rejects_unexpected_output(output):
+    with pytest.raises(PaletteError):
+        parse_palette(output)
+
+
+def test_set_lightness():
+    assert set_lightness((255, 0, 0), -10) == (204, 0, 0)
+    assert set_lightness((255, 0, 0), 10) == (255, 51, 51)
+    assert set_lightness((18, 52, 86), 0) == (18, 52, 86)
+    # Clamped to black and white
+    assert set_lightness((128, 128, 128), 80) == (255, 255, 255)
+    assert set_lightness((128, 128, 128), -80) == (0, 0, 0)
+
+
+def test_render_template():
+    template = ("image {{image}}\n"
+                "bg {{ colors.surface.default.hex }}\n"
+                "fg {{colors.on_surface.default.hex_stripped}}\n"
+                "rgb {{colors.primary.default.red}},"
+                "{{colors.primary.default.green}},"
+                "{{colors.primary.default.blue}}\n"
+                "dim {{colors.primary.default.hex | set_lightness: -10.0}}\n")
+    assert render_template(template, PALETTE, "/tmp/wall.png") == (
+        "image /tmp/wall.png\n"
+        "bg #101418\n"
+        "fg e0e2e8\n"
+        "rgb 255,0,0\n"
+        "dim #cc0000\n")
+
+
+@pytest.mark.parametrize("template", [
+    "{{colors.missing.default.hex}}",
+    "{{colors.primary.dark.hex}}",
+    "{{colors.primary.default.hsl}}",
+    "{{colors.primary.default.hex | invert}}",
+    "{{mode}}",
+])
+def test_render_template_rejects_what_it_cant_handle(template):
+    with pytest.raises(PaletteError):
+        render_template(template, PALETTE, "/tmp/wall.png")
+
+
+@pytest.mark.parametrize("name", sorted(os.listdir(TEMPLATES_DIR)))
+def test_render_the_shipped_templates(name):
+    with open(os.path.join(TEMPLATES_DIR, name), "r") as f:
+        template = f.read()
+    names = {
+        expression.split("|")[0].strip().split(".")[1]
+        for expression in TEMPLATE_EXPRESSION.findall(template)
+        if expression.startswith("colors.")
+    }
+    palette = {color: "#336699" for color in names}
+
+    rendered = render_template(template, palette, "/tmp/wall.png")
+    assert "{{" not in rendered
+    assert re.search(r"#336699|336699", rendered)
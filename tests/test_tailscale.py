@@ -0,0 +1,88 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+
+import pytest
+
+pytest.importorskip("gi")
+pytest.importorskip("fabric")
+
+from gi.repository import GLib  # type: ignore  # noqa: E402
+
+from services.tailscale import TailscaleProvider  # noqa: E402
+
+TIMEOUT = 5000  # in milliseconds
+
+
+class FakeTailscaled:
+    """Unix socket server answering the IPN bus watch with the given NDJSON lines"""
+
+    def __init__(self, path: str, notifications: list[dict]):
+        self.requests: list[str] = []
+        self._notifications = notifications
+        self._done = threading.Event()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen(1)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        connection, _ = self._server.accept()
+        with connection:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                request += connection.recv(4096)
+            self.requests.append(request.decode().split("\r\n", 1)[0])
+            connection.sendall(b"HTTP/1.0 200 OK\r\n"
+                               b"Content-Type: application/json\r\n\r\n")
+            for notification in self._notifications:
+                connection.sendall(json.dumps(notification).encode() + b"\n")
+            # The stream stays open, as tailscaled's does
+            self._done.wait(TIMEOUT / 1000)
+
+    def close(self) -> None:
+        self._done.set()
+        self._thread.join()
+        self._server.close()
+
+
+def run_until(condition, timeout: int = TIMEOUT) -> None:
+    loop = GLib.MainLoop()
+    GLib.timeout_add(timeout, loop.quit)
+
+    def check() -> bool:
+        if condition():
+            loop.quit()
+            return False
+        return True
+
+    GLib.timeout_add(10, check)
+    loop.run()
+
+
+def test_changed_only_fires_when_the_backend_state_changes():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tailscaled.sock")
+        server = FakeTailscaled(path, [
+            {"State": 6},  # Running
+            {"State": 6},
+            {"Engine": {"RBytes": 1}},
+            {"State": 4},  # Stopped
+        ])
+        provider = TailscaleProvider(socket_path=path)
+        emitted = []
+        provider.connect("changed", lambda _, status: emitted.append(status))
+        try:
+            run_until(lambda: provider.backend_state == "Stopped")
+            # Let any late emission through
+            run_until(lambda: False, timeout=200)
+        finally:
+            provider.stop()
+            server.close()
+
+    assert server.requests[0].startswith("GET /localapi/v0/watch-ipn-bus")
+    assert emitted == ["up", "down"]
+    assert provider.get_status() == "down"